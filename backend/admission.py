@@ -0,0 +1,108 @@
+"""
+Admission control: per-route-class concurrency limits with a bounded wait queue.
+
+Each request is classified (`route_class`) as a full-table `bulk` transfer, an
+`aggregate` scan or a cheap `read`. A class runs at most `concurrency` requests at
+once. Up to `queue` more wait for a slot, for at most `timeout` seconds. Anything
+beyond that is answered at once with 503 and Retry-After. Exports can then no
+longer take every worker thread away from /kpis. A slot is held until the response
+body has been sent, so streamed exports count for their whole duration.
+
+Unclassified routes (the SSE feed, docs) are not limited. Limits are per process.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from .metrics import register_collector
+
+
+def route_class(scope):
+    path = scope["path"]
+    if path in ("/aggregate", "/histogram"):
+        return "aggregate"
+    if path == "/kpis":
+        return "read"
+    if path == "/patients/bulk":
+        return "bulk"
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if path == "/patients":
+        # Without a page size, /patients streams the whole (filtered) table
+        return "read" if "limit" in query else "bulk"
+    if path == "/patients/changes":
+        # since=0 is always answered with a full snapshot
+        return "read" if query.get("since", ["0"])[0] not in ("", "0") else "bulk"
+    return None
+
+
+class RouteLimiter:
+    def __init__(self, concurrency, queue, timeout):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queue = queue
+        self.timeout = timeout
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if there is room; False when the request is shed."""
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        if self.waiting >= self.queue:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.semaphore.release()
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, limits, timeout=10.0, retry_after=2, classify=route_class):
+        self.app = app
+        self.limiters = {name: RouteLimiter(concurrency, queue, timeout) for name, (concurrency, queue) in limits.items()}
+        self.retry_after = retry_after
+        self.classify = classify
+        register_collector(self.samples)
+
+    def samples(self):
+        return [
+            ("medintel_admission_waiting", "gauge", "Requests queued for an admission slot",
+             [((("class", name),), limiter.waiting) for name, limiter in self.limiters.items()]),
+            ("medintel_admission_rejected_total", "counter", "Requests shed with 503",
+             [((("class", name),), limiter.rejected) for name, limiter in self.limiters.items()]),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiters.get(self.classify(scope)) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            await self.reject(scope, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def reject(self, scope, send):
+        body = json.dumps({"detail": f"Too many concurrent {self.classify(scope)} requests, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
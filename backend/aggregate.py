@@ -0,0 +1,275 @@
+"""
+Compiles /aggregate requests (dimensions, metrics, filters) into one SQL GROUP BY.
+
+Requests that only touch the rollup dimensions and metrics are answered from
+`patient_rollup` (see backend.rollup) instead of scanning patients.
+"""
+import math
+from sqlalchemy import Column, Float, Integer, case, cast, func, null, or_, select
+from sqlalchemy.sql.visitors import iterate, replacement_traverse
+from starlette.concurrency import run_in_threadpool
+from .config import ROLLUP_ENABLED
+from .database import get_analytics_engine, is_sqlite
+from .models import Patient, PatientRollup
+
+# Same bins as the dashboard's pd.cut(age, [0, 18, 35, 50, 65, 100]): right-closed,
+# and NULL ages or ages outside (0, 100] get no band
+AGE_BANDS = [(18, "<18"), (35, "18-35"), (50, "35-50"), (65, "50-65")]
+AGE_BAND_OVERFLOW = "65+"
+AGE_BAND_RANGE = (0, 100)
+
+age_band = case(
+    (or_(Patient.age.is_(None), Patient.age <= AGE_BAND_RANGE[0], Patient.age > AGE_BAND_RANGE[1]), null()),
+    *[(Patient.age <= upper, label) for upper, label in AGE_BANDS],
+    else_=AGE_BAND_OVERFLOW,
+)
+
+DIMENSIONS = {
+    "department": Patient.department,
+    "gender": Patient.gender,
+    "outcome": Patient.outcome,
+    "readmission": Patient.readmission,
+    "age": Patient.age,
+    "age_band": age_band,
+}
+
+readmitted = case((Patient.readmission == "Yes", 1), else_=0)
+
+MEASURES = {
+    "treatment_cost": Patient.treatment_cost,
+    "age": Patient.age,
+    "readmitted": readmitted,
+}
+
+
+def variance(expr):
+    # Population variance; run_aggregate takes the square root for "std"
+    return func.avg(expr * expr) - func.avg(expr) * func.avg(expr)
+
+
+FUNCTIONS = {
+    "sum": func.sum,
+    "mean": func.avg,
+    "min": func.min,
+    "max": func.max,
+    "std": variance,
+}
+
+
+def ratio(numerator, denominator):
+    return cast(func.sum(numerator), Float) / func.nullif(func.sum(denominator), 0)
+
+
+ROLLUP_DIMENSIONS = {
+    "department": PatientRollup.department,
+    "gender": PatientRollup.gender,
+    "outcome": PatientRollup.outcome,
+    "age_band": PatientRollup.age_band,
+}
+
+ROLLUP_FILTERS = {"department", "gender", "outcome"}
+
+ROLLUP_METRICS = {
+    ("count", None): func.coalesce(func.sum(PatientRollup.patients), 0),
+    ("sum", "treatment_cost"): case((func.sum(PatientRollup.cost_count) > 0, func.sum(PatientRollup.cost_sum))),
+    ("mean", "treatment_cost"): ratio(PatientRollup.cost_sum, PatientRollup.cost_count),
+    ("min", "treatment_cost"): func.min(PatientRollup.cost_min),
+    ("max", "treatment_cost"): func.max(PatientRollup.cost_max),
+    ("std", "treatment_cost"): (
+        ratio(PatientRollup.cost_sumsq, PatientRollup.cost_count)
+        - ratio(PatientRollup.cost_sum, PatientRollup.cost_count)
+        * ratio(PatientRollup.cost_sum, PatientRollup.cost_count)
+    ),
+    ("sum", "readmitted"): func.sum(PatientRollup.readmissions),
+    ("mean", "readmitted"): ratio(PatientRollup.readmissions, PatientRollup.patients),
+    ("sum", "age"): case((func.sum(PatientRollup.age_count) > 0, func.sum(PatientRollup.age_sum))),
+    ("mean", "age"): ratio(PatientRollup.age_sum, PatientRollup.age_count),
+}
+
+
+def split_metric(metric):
+    if metric == "count":
+        return "count", None
+    name, _, measure = metric.partition(":")
+    if name not in FUNCTIONS or measure not in MEASURES:
+        raise ValueError(
+            f"Unknown metric '{metric}'. Use 'count' or '<{'|'.join(FUNCTIONS)}>:<{'|'.join(MEASURES)}>'"
+        )
+    return name, measure
+
+
+def metric_label(name, measure):
+    return name if measure is None else f"{name}_{measure}"
+
+
+def parse_metric(metric):
+    name, measure = split_metric(metric)
+    if measure is None:
+        return "count", func.count()
+    return metric_label(name, measure), FUNCTIONS[name](MEASURES[measure])
+
+
+def build_aggregate_query(group_by, metrics, conditions):
+    unknown = [dim for dim in group_by if dim not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension(s): {', '.join(unknown)}")
+    if not metrics:
+        raise ValueError("At least one metric is required")
+
+    dimensions = [DIMENSIONS[dim].label(dim) for dim in group_by]
+    measures = [expr.label(label) for label, expr in map(parse_metric, metrics)]
+    stmt = select(*dimensions, *measures).select_from(Patient).where(*conditions)
+    if dimensions:
+        stmt = stmt.group_by(*dimensions).order_by(*dimensions)
+    return stmt
+
+
+def patient_columns_in(condition):
+    return {
+        element.key for element in iterate(condition)
+        if isinstance(element, Column) and element.table is Patient.__table__
+    }
+
+
+def rollup_condition(condition):
+    def replace(element):
+        if isinstance(element, Column) and element.table is Patient.__table__:
+            return getattr(PatientRollup, element.key)
+        return None
+    return replacement_traverse(condition, {}, replace)
+
+
+def build_rollup_query(group_by, metrics, conditions):
+    """The same GROUP BY over patient_rollup, or None if the request needs raw rows."""
+    if not (ROLLUP_ENABLED and is_sqlite):
+        return None
+    keys = [split_metric(metric) for metric in metrics]
+    if (
+        any(dim not in ROLLUP_DIMENSIONS for dim in group_by)
+        or any(key not in ROLLUP_METRICS for key in keys)
+        or any(not patient_columns_in(condition) <= ROLLUP_FILTERS for condition in conditions)
+    ):
+        return None
+
+    cells = [ROLLUP_DIMENSIONS[dim] for dim in group_by]
+    dimensions = [func.nullif(cell, "").label(dim) for cell, dim in zip(cells, group_by)]
+    measures = [ROLLUP_METRICS[key].label(metric_label(*key)) for key in keys]
+    stmt = select(*dimensions, *measures).select_from(PatientRollup)
+    stmt = stmt.where(*[rollup_condition(condition) for condition in conditions])
+    if cells:
+        stmt = stmt.group_by(*cells).order_by(*cells)
+    return stmt
+
+
+def finish_row(mapping):
+    record = dict(mapping)
+    for label, value in record.items():
+        if label.startswith("std_") and value is not None:
+            record[label] = math.sqrt(max(value, 0.0))
+    return record
+
+
+def run_aggregate(db, group_by, metrics, conditions):
+    stmt = build_aggregate_query(group_by, metrics, conditions)
+    rollup = build_rollup_query(group_by, metrics, conditions)
+    if rollup is not None:
+        return [finish_row(row._mapping) for row in db.execute(rollup)]
+    analytics = get_analytics_engine()
+    if analytics is not None:
+        return [finish_row(row) for row in analytics.mappings(stmt)]
+    return [finish_row(row._mapping) for row in db.execute(stmt)]
+
+
+async def run_aggregate_async(db, group_by, metrics, conditions):
+    stmt = build_aggregate_query(group_by, metrics, conditions)
+    rollup = build_rollup_query(group_by, metrics, conditions)
+    if rollup is not None:
+        return [finish_row(row._mapping) for row in await db.execute(rollup)]
+    analytics = get_analytics_engine()
+    if analytics is not None:
+        return [finish_row(row) for row in await run_in_threadpool(analytics.mappings, stmt)]
+    return [finish_row(row._mapping) for row in await db.execute(stmt)]
+
+
+HISTOGRAM_COLUMNS = {
+    "age": Patient.age,
+    "treatment_cost": Patient.treatment_cost,
+}
+
+
+def histogram_edges(low, high, bins):
+    # Same bins as np.histogram, including its widening of an empty range
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    width = (high - low) / bins
+    return [low + width * index for index in range(bins)] + [high]
+
+
+def histogram_range_query(column, conditions):
+    expr = HISTOGRAM_COLUMNS[column]
+    return select(func.min(expr), func.max(expr)).select_from(Patient).where(*conditions)
+
+
+def truncate_integer(expr):
+    return cast(expr, Integer)
+
+
+def histogram_query(column, edges, conditions, truncate=truncate_integer):
+    expr = HISTOGRAM_COLUMNS[column]
+    low, high, bins = edges[0], edges[-1], len(edges) - 1
+    bucket = case((expr >= high, bins - 1), else_=truncate((expr - low) / float((high - low) / bins)))
+    return (
+        select(bucket.label("bucket"), func.count())
+        .where(expr.is_not(None), expr >= low, expr <= high, *conditions)
+        .group_by(bucket)
+    )
+
+
+def histogram_response(column, edges, counts):
+    return {"column": column, "edges": edges, "counts": counts}
+
+
+def resolve_histogram_range(column, bins, bounds, low, high):
+    low = bounds[0] if low is None else low
+    high = bounds[1] if high is None else high
+    if low is None or high is None:
+        return None
+    if low > high:
+        raise ValueError("range_min must not exceed range_max")
+    return histogram_edges(float(low), float(high), bins)
+
+
+def bucket_counts(rows, bins):
+    counts = [0] * bins
+    for bucket, count in rows:
+        counts[int(bucket)] = count
+    return counts
+
+
+def run_histogram(db, column, bins, conditions, low=None, high=None):
+    analytics = get_analytics_engine()
+    if analytics is not None:
+        rows, truncate = analytics.rows, analytics.truncate
+    else:
+        rows, truncate = (lambda stmt: db.execute(stmt).all()), truncate_integer
+    bounds = (None, None)
+    if low is None or high is None:
+        bounds = rows(histogram_range_query(column, conditions))[0]
+    edges = resolve_histogram_range(column, bins, bounds, low, high)
+    if edges is None:
+        return histogram_response(column, [], [])
+    counts = bucket_counts(rows(histogram_query(column, edges, conditions, truncate)), bins)
+    return histogram_response(column, edges, counts)
+
+
+async def run_histogram_async(db, column, bins, conditions, low=None, high=None):
+    if get_analytics_engine() is not None:
+        return await run_in_threadpool(run_histogram, None, column, bins, conditions, low, high)
+    bounds = (None, None)
+    if low is None or high is None:
+        bounds = (await db.execute(histogram_range_query(column, conditions))).one()
+    edges = resolve_histogram_range(column, bins, bounds, low, high)
+    if edges is None:
+        return histogram_response(column, [], [])
+    rows = await db.execute(histogram_query(column, edges, conditions))
+    return histogram_response(column, edges, bucket_counts(rows, bins))
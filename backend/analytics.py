@@ -0,0 +1,169 @@
+"""
+DuckDB engine for the read-only analytics queries (/aggregate, /histogram).
+
+Selected with MEDINTEL_ANALYTICS_ENGINE (see database.get_analytics_engine):
+
+    duckdb          scan medintel.db in place through DuckDB's sqlite extension
+    duckdb-parquet  scan a Parquet export of patients. When data_version has moved
+                    since the last export, a background thread re-exports it while
+                    queries keep reading the previous file; their responses are
+                    marked stale (no ETag, not cached) until the new file is in place
+
+The statements are the same SQLAlchemy selects the SQLite path runs. They are
+compiled with the SQLite dialect, which DuckDB accepts for these GROUP BYs. Writes
+always go to SQLite. Export a snapshot by hand with:
+
+    python -m backend.analytics --export
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+import duckdb
+from sqlalchemy import func
+from sqlalchemy.dialects import sqlite
+
+from .formats import ParquetEncoder, load_pyarrow
+from .metrics import record_query
+from .queries import PATIENT_COLUMN_NAMES, patient_rows
+from .versioning import mark_stale, version_query
+
+EXPORT_BATCH_SIZE = 100_000  # rows per Parquet row group
+
+dialect = sqlite.dialect()
+logger = logging.getLogger(__name__)
+
+
+def quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def compile_statement(stmt):
+    # Inline the (string and number) parameters: DuckDB only matches a GROUP BY
+    # expression to its SELECT twin when both are literally the same
+    return str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def export_parquet(connection, path):
+    """Write every patient to `path` (atomically replaced) and return the row count."""
+    pa = load_pyarrow()
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the duckdb-parquet analytics engine")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    staging = f"{path}.tmp"
+    result = connection.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(patient_rows(0))
+    encoder = ParquetEncoder(pa, PATIENT_COLUMN_NAMES)
+    rows = 0
+    with open(staging, "wb") as sink:
+        for batch in result.partitions():
+            rows += len(batch)
+            sink.write(encoder.encode(batch))
+        sink.write(encoder.finish())
+    os.replace(staging, path)
+    return rows
+
+
+class DuckDBEngine:
+    def __init__(self, mode, source, parquet_path, threads=0):
+        self.mode = mode
+        self.source = source
+        self.parquet_path = parquet_path
+        self.connection = duckdb.connect()
+        # SQLite sorts NULL below every value; DuckDB puts NULLs last by default
+        self.connection.execute("SET default_null_order = 'nulls_first_on_asc_last_on_desc'")
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+        self.lock = threading.Lock()
+        self.version = None
+        self.exporting = None
+        if mode == "duckdb":
+            self.connection.execute(f"ATTACH {quote(source.url.database)} AS medintel (TYPE sqlite, READ_ONLY)")
+            self.connection.execute("CREATE VIEW patients AS SELECT * FROM medintel.patients")
+
+    def export(self):
+        with self.source.connect() as connection:
+            # Version first, so the export is at least that new
+            version = tuple(connection.execute(version_query).first() or ())
+            export_parquet(connection, self.parquet_path)
+        return version
+
+    def export_in_background(self):
+        try:
+            version = self.export()
+            with self.lock:
+                self.version = version
+        except Exception:
+            logger.exception("Parquet export for the analytics engine failed")
+        finally:
+            with self.lock:
+                self.exporting = None
+
+    def refresh(self):
+        if self.mode != "duckdb-parquet":
+            return
+        with self.source.connect() as connection:
+            version = tuple(connection.execute(version_query).first() or ())
+        if version == self.version:
+            return
+        with self.lock:
+            if self.version is None:
+                # Nothing to read yet: the first export runs inline
+                self.version = self.export()
+                self.connection.execute(
+                    f"CREATE OR REPLACE VIEW patients AS SELECT * FROM read_parquet({quote(self.parquet_path)})"
+                )
+                return
+            if self.exporting is None:
+                # The view reads the file by path, so the atomic replace swaps it in
+                self.exporting = threading.Thread(target=self.export_in_background, daemon=True)
+                self.exporting.start()
+        mark_stale()
+
+    def execute(self, stmt):
+        self.refresh()
+        cursor = self.connection.cursor()
+        started = time.perf_counter()
+        try:
+            cursor.execute(compile_statement(stmt))
+            return [column[0] for column in cursor.description], cursor.fetchall()
+        finally:
+            cursor.close()
+            record_query(time.perf_counter() - started)
+
+    def rows(self, stmt):
+        return self.execute(stmt)[1]
+
+    def mappings(self, stmt):
+        names, rows = self.execute(stmt)
+        return [dict(zip(names, row)) for row in rows]
+
+    @staticmethod
+    def truncate(expr):
+        # CAST(x AS INTEGER) rounds in DuckDB but truncates in SQLite
+        return func.trunc(expr)
+
+
+def main():
+    from .config import ANALYTICS_PARQUET_PATH
+    from .database import engine
+    from .startup import init_database
+
+    parser = argparse.ArgumentParser(description="Export patients to Parquet for the duckdb-parquet engine")
+    parser.add_argument("--export", action="store_true", help="write the Parquet snapshot")
+    parser.add_argument("--path", default=ANALYTICS_PARQUET_PATH)
+    args = parser.parse_args()
+    if not args.export:
+        parser.print_help()
+        return
+
+    init_database(engine)
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        rows = export_parquet(connection, args.path)
+    print(f"Exported {rows:,} patients to {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+`async def` variants of the read endpoints, served from the async engine when
+MEDINTEL_DB_ASYNC is enabled so requests are not capped by the threadpool size.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from . import columnar
+from .aggregate import run_aggregate_async, run_histogram_async
+from .async_database import AsyncSessionLocal, get_async_db
+from .cache import cached_response_async
+from .config import PAGE_SIZE_MAX, STREAM_BATCH_SIZE
+from .filters import patient_filters
+from .formats import FastJSONResponse, encode_stream_async
+from .profiling import phase
+from .queries import (
+    PATIENT_COLUMN_NAMES, add_next_page_links, page_fields, patient_rows, resolve_format, row_dicts, select_fields,
+    streaming_response,
+)
+from .schemas import AggregateRow, Histogram, Kpis, PatientRecord
+from .summary import read_kpis_async
+from .versioning import current_etag_async, not_modified, tag_response
+
+router = APIRouter()
+
+
+async def iter_patient_batches(after, limit=None, fields=PATIENT_COLUMN_NAMES, conditions=()):
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(patient_rows(after, limit, fields, conditions))
+        async for batch in result.partitions(STREAM_BATCH_SIZE):
+            yield batch
+
+
+@router.get("/patients", response_model=List[PatientRecord])
+async def get_patients(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    after: int = Query(0, ge=0),
+    stream: bool = False,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|arrow|parquet)$"),
+    fields: Optional[List[str]] = Query(None),
+    conditions: list = Depends(patient_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    fmt = resolve_format(request, stream, format)
+    fields = select_fields(fields)
+    etag = await current_etag_async(db, fmt)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    if fmt != "json" or limit is None:
+        batches = iter_patient_batches(after, limit, fields, conditions)
+        return tag_response(streaming_response(fmt, encode_stream_async, batches, fields), etag)
+
+    async def build():
+        columns = page_fields(fields, limit)
+        with phase("hydrate"):
+            rows = (await db.execute(patient_rows(after, limit, columns, conditions))).all()
+            content = row_dicts(rows, fields, columns)
+        # Returned directly so FastAPI skips jsonable_encoder over every row
+        response = FastJSONResponse(content)
+        add_next_page_links(request, response, rows, limit)
+        return response
+
+    return await cached_response_async(request, etag, build)
+
+
+@router.get("/kpis", response_model=Kpis)
+async def get_kpis(request: Request, db: AsyncSession = Depends(get_async_db)):
+    etag = await current_etag_async(db, "json")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    async def build():
+        with phase("hydrate"):
+            result = await run_in_threadpool(columnar.answer, columnar.kpis)
+            if result is None:
+                result = await read_kpis_async(db)
+        return FastJSONResponse(result)
+
+    return await cached_response_async(request, etag, build)
+
+
+@router.get("/aggregate", response_model=List[AggregateRow])
+async def get_aggregate(
+    request: Request,
+    group_by: List[str] = Query([]),
+    metrics: List[str] = Query(["count"]),
+    conditions: list = Depends(patient_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    etag = await current_etag_async(db, "json")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    async def build():
+        try:
+            with phase("hydrate"):
+                result = await run_in_threadpool(columnar.answer, columnar.aggregate, group_by, metrics, conditions)
+                if result is None:
+                    result = await run_aggregate_async(db, group_by, metrics, conditions)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(result)
+
+    return await cached_response_async(request, etag, build)
+
+
+@router.get("/histogram", response_model=Histogram)
+async def get_histogram(
+    request: Request,
+    column: str = Query(..., pattern="^(age|treatment_cost)$"),
+    bins: int = Query(20, ge=1, le=1000),
+    range_min: Optional[float] = None,
+    range_max: Optional[float] = None,
+    conditions: list = Depends(patient_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    etag = await current_etag_async(db, "json")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    async def build():
+        try:
+            with phase("hydrate"):
+                result = await run_in_threadpool(
+                    columnar.answer, columnar.histogram, column, bins, conditions, range_min, range_max
+                )
+                if result is None:
+                    result = await run_histogram_async(db, column, bins, conditions, range_min, range_max)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(result)
+
+    return await cached_response_async(request, etag, build)
@@ -0,0 +1,35 @@
+"""
+Async engine and sessions for MEDINTEL_DB_ASYNC mode (aiosqlite locally).
+
+Imported only when async mode is enabled, so the async driver stays optional.
+"""
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from .config import (
+    ASYNC_DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+from .database import apply_sqlite_pragmas, is_sqlite
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,  # aiosqlite would otherwise default to NullPool
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=not is_sqlite,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+if is_sqlite:
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
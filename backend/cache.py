@@ -0,0 +1,339 @@
+"""
+Cache of rendered JSON results for /aggregate, /kpis, /histogram and paged
+/patients projections.
+
+Entries are looked up by the request's normalized query string and its ETag. The
+ETag carries the data version, so any write makes older entries unreachable; they
+age out through the LRU, byte limit and TTL. Stored values are the response body
+and the headers that go with it (paging links). The body is what gets counted
+against the byte limit, and a hit is served without touching the database or the
+serializer.
+
+Two backends share one interface, `get(key, etag)` / `set(key, etag, value, size)`:
+
+  memory  an LRU dict private to the process (default)
+  sqlite  a SQLite file shared by every worker on the host, so a result computed
+          by one `uvicorn --workers N` process serves the others. Each request
+          keeps one row; a store only replaces it with the same or a newer data
+          version, checked in the upsert itself. Its lookups block, so the async
+          handlers make them from the threadpool.
+
+GET /metrics/cache reports hits, misses, evictions and current size.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import APIRouter, Response
+from starlette.concurrency import run_in_threadpool
+
+from .config import (
+    QUERY_CACHE_BACKEND, QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_MAX_ITEM_BYTES, QUERY_CACHE_PATH,
+    QUERY_CACHE_TTL,
+)
+from .metrics import register_collector
+from .versioning import stale_reads, tag_response
+
+CACHED_HEADERS = ("link", "x-next-after")
+ENTRY_OVERHEAD = 256  # rough bytes per entry for the key, headers and bookkeeping
+
+router = APIRouter()
+
+
+class LRUCache:
+    blocking = False
+
+    def __init__(self, max_bytes, ttl, max_item_bytes):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_item_bytes = max_item_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.stores = self.evictions = self.expirations = self.rejected = 0
+
+    def get(self, key, etag):
+        key = f"{etag}|{key}"
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self.remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, etag, value, size):
+        key = f"{etag}|{key}"
+        size += ENTRY_OVERHEAD
+        if size > self.max_item_bytes:
+            self.rejected += 1
+            return
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, size)
+            self.bytes += size
+            self.stores += 1
+            while self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        self.bytes -= self.entries.pop(key)[2]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
+
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS query_cache (
+        key TEXT PRIMARY KEY,
+        epoch TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        expires REAL NOT NULL,
+        used REAL NOT NULL,
+        size INTEGER NOT NULL,
+        headers TEXT NOT NULL,
+        body BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_query_cache_used ON query_cache (used, size);
+    CREATE INDEX IF NOT EXISTS ix_query_cache_expires ON query_cache (expires);
+"""
+
+# Keep the row for a request unless it holds a newer version of the same database
+SQLITE_UPSERT = """
+    INSERT INTO query_cache (key, epoch, version, expires, used, size, headers, body)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        epoch = excluded.epoch, version = excluded.version, expires = excluded.expires,
+        used = excluded.used, size = excluded.size, headers = excluded.headers, body = excluded.body
+    WHERE query_cache.epoch != excluded.epoch OR query_cache.version <= excluded.version
+"""
+
+# Hits refresh the LRU timestamp at most this often, so warm reads rarely write
+TOUCH_INTERVAL = 1.0
+
+
+def split_etag(etag):
+    epoch, version, _variant = etag.strip('"').split(".", 2)
+    return epoch, int(version)
+
+
+class SQLiteCache:
+    blocking = True
+
+    def __init__(self, path, max_bytes, ttl, max_item_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_item_bytes = max_item_bytes
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.stores = self.evictions = self.expirations = self.rejected = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection().executescript(SQLITE_SCHEMA)
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = OFF")
+            self.local.connection = connection
+        return connection
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key, etag):
+        epoch, version = split_etag(etag)
+        connection = self.connection()
+        row = connection.execute(
+            "SELECT expires, used, headers, body FROM query_cache WHERE key = ? AND epoch = ? AND version = ?",
+            (key, epoch, version),
+        ).fetchone()
+        now = time.time()
+        if row is not None and row[0] <= now:
+            connection.execute("DELETE FROM query_cache WHERE key = ? AND version = ?", (key, version))
+            self.count("expirations")
+            row = None
+        if row is None:
+            self.count("misses")
+            return None
+        if now - row[1] > TOUCH_INTERVAL:
+            connection.execute("UPDATE query_cache SET used = ? WHERE key = ?", (now, key))
+        self.count("hits")
+        return row[3], json.loads(row[2])
+
+    def set(self, key, etag, value, size):
+        size += ENTRY_OVERHEAD
+        if size > self.max_item_bytes:
+            self.count("rejected")
+            return
+        epoch, version = split_etag(etag)
+        body, headers = value
+        now = time.time()
+        connection = self.connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                SQLITE_UPSERT, (key, epoch, version, now + self.ttl, now, size, json.dumps(headers), body)
+            )
+            connection.execute("DELETE FROM query_cache WHERE expires <= ?", (now,))
+            excess = connection.execute("SELECT total(size) FROM query_cache").fetchone()[0] - self.max_bytes
+            evicted = 0
+            if excess > 0:
+                # Oldest first until the running total of their sizes covers the excess
+                for (victim, victim_size) in connection.execute(
+                    "SELECT key, size FROM query_cache ORDER BY used LIMIT 1000"
+                ).fetchall():
+                    if excess <= 0:
+                        break
+                    connection.execute("DELETE FROM query_cache WHERE key = ?", (victim,))
+                    excess -= victim_size
+                    evicted += 1
+        with self.lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def stats(self):
+        entries, size = self.connection().execute("SELECT count(*), total(size) FROM query_cache").fetchone()
+        with self.lock:
+            lookups = self.hits + self.misses
+            # Counters are this worker's; entries and bytes are the shared file's
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "entries": entries,
+                "bytes": int(size),
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
+
+
+def make_cache(backend=QUERY_CACHE_BACKEND, path=QUERY_CACHE_PATH):
+    if backend == "sqlite":
+        return SQLiteCache(path, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL, QUERY_CACHE_MAX_ITEM_BYTES)
+    return LRUCache(QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL, QUERY_CACHE_MAX_ITEM_BYTES)
+
+
+query_cache = make_cache() if QUERY_CACHE_ENABLED else None
+
+
+def cache_samples():
+    stats = query_cache.stats()
+    labels = (("backend", stats["backend"]),)
+    return [
+        (f"medintel_query_cache_{name}_total", "counter", f"Query cache {name}", [(labels, stats[name])])
+        for name in ("hits", "misses", "evictions", "expirations", "rejected")
+    ] + [
+        ("medintel_query_cache_entries", "gauge", "Query cache entries", [(labels, stats["entries"])]),
+        ("medintel_query_cache_bytes", "gauge", "Query cache size in bytes", [(labels, stats["bytes"])]),
+    ]
+
+
+if query_cache is not None:
+    register_collector(cache_samples)
+
+
+def request_key(request):
+    # Parameter order is irrelevant, but the order of repeated values is not (group_by)
+    params = sorted(parse_qsl(request.url.query, keep_blank_values=True), key=lambda item: item[0])
+    return f"{request.url.path}?{urlencode(params)}"
+
+
+def cached_entry(response):
+    return response.body, {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+
+
+def entry_response(entry, etag):
+    body, headers = entry
+    return tag_response(Response(body, media_type="application/json", headers=headers), etag)
+
+
+def uncacheable(response):
+    # Answered from a snapshot older than `etag`: neither this cache nor the client may keep it
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def cached_response(request, etag, build):
+    """The JSON response `build()` returns, served from the cache while the data version holds."""
+    key = request_key(request) if query_cache is not None and etag is not None else None
+    entry = query_cache.get(key, etag) if key is not None else None
+    if entry is None:
+        reads = []
+        token = stale_reads.set(reads)
+        try:
+            response = build()
+        finally:
+            stale_reads.reset(token)
+        if reads:
+            return uncacheable(response)
+        if key is None:
+            return tag_response(response, etag)
+        entry = cached_entry(response)
+        query_cache.set(key, etag, entry, len(entry[0]))
+    return entry_response(entry, etag)
+
+
+async def off_loop(method, *args):
+    return await run_in_threadpool(method, *args) if query_cache.blocking else method(*args)
+
+
+async def cached_response_async(request, etag, build):
+    """`cached_response` for an async `build()`."""
+    key = request_key(request) if query_cache is not None and etag is not None else None
+    entry = await off_loop(query_cache.get, key, etag) if key is not None else None
+    if entry is None:
+        reads = []
+        token = stale_reads.set(reads)
+        try:
+            response = await build()
+        finally:
+            stale_reads.reset(token)
+        if reads:
+            return uncacheable(response)
+        if key is None:
+            return tag_response(response, etag)
+        entry = cached_entry(response)
+        await off_loop(query_cache.set, key, etag, entry, len(entry[0]))
+    return entry_response(entry, etag)
+
+
+@router.get("/metrics/cache")
+def get_cache_metrics():
+    return query_cache.stats() if query_cache is not None else {"backend": None}
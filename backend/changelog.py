@@ -0,0 +1,206 @@
+"""
+Append-only log of patient inserts, updates and deletes, written by SQLite triggers,
+and GET /patients/changes?since=<seq> for incremental sync.
+
+A delta page lists the patients touched after `since` as their current rows
+(`upserts`) or as ids that no longer exist (`deletes`), plus the `seq` to pass as
+`since` next time. Applying pages in order converges even if a row changed again
+mid-sync, because each page carries current values.
+
+When the entries after `since` are gone, the response is a snapshot instead
+(`snapshot: true`). That happens after compaction, on a fresh client (since=0),
+and before the log was installed. Snapshots are paged by id like /patients: while
+`has_more` is true, request `since=<seq>&after=<after>` with the values from the
+page. `seq` stays pinned to the log position the snapshot started at, so once the
+last page is in, deltas from `seq` replay whatever changed while it was read.
+
+Every 1000th entry, a trigger drops entries older than MEDINTEL_CHANGE_LOG_RETENTION.
+Compact by hand with:
+
+    python -m backend.changelog --compact [--keep N]
+"""
+import argparse
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import delete, event, func, select, text
+from sqlalchemy.orm import Session
+
+from .config import CHANGE_LOG_ENABLED, CHANGE_LOG_RETENTION, CHANGES_PAGE_SIZE, PAGE_SIZE_MAX
+from .database import Base, get_db
+from .formats import FastJSONResponse
+from .models import AppMeta, Patient, PatientChange
+from .queries import page_fields, patient_rows, row_dicts, select_fields
+from .schemas import PatientChanges
+
+COMPACTED_THROUGH = "changes_compacted_through"
+
+
+def log_entry(row, op):
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS patient_changes_{op} AFTER {op.upper()} ON patients
+        BEGIN
+            INSERT INTO patient_changes (patient_id, op) VALUES ({row}.id, '{op}');
+        END
+    """
+
+
+CHANGE_LOG_TRIGGERS = {
+    "patient_changes_insert": log_entry("NEW", "insert"),
+    "patient_changes_update": log_entry("NEW", "update"),
+    "patient_changes_delete": log_entry("OLD", "delete"),
+    # A row moved to a new id is gone from its old one
+    "patient_changes_rekey": """
+        CREATE TRIGGER IF NOT EXISTS patient_changes_rekey AFTER UPDATE OF id ON patients
+        WHEN OLD.id <> NEW.id
+        BEGIN
+            INSERT INTO patient_changes (patient_id, op) VALUES (OLD.id, 'delete');
+        END
+    """,
+}
+
+COMPACT_EVERY = 1000
+
+
+def compaction_trigger(retention):
+    return f"""
+        CREATE TRIGGER patient_changes_compact AFTER INSERT ON patient_changes
+        WHEN NEW.seq % {COMPACT_EVERY} = 0 AND NEW.seq - {retention} > (
+            SELECT CAST(value AS INTEGER) FROM app_meta WHERE key = '{COMPACTED_THROUGH}'
+        )
+        BEGIN
+            DELETE FROM patient_changes WHERE seq <= NEW.seq - {retention};
+            UPDATE app_meta SET value = NEW.seq - {retention} WHERE key = '{COMPACTED_THROUGH}';
+        END
+    """
+
+
+router = APIRouter()
+
+
+def set_compacted_through(connection, seq):
+    connection.execute(delete(AppMeta).where(AppMeta.key == COMPACTED_THROUGH))
+    if seq is not None:
+        connection.execute(AppMeta.__table__.insert().values(key=COMPACTED_THROUGH, value=str(seq)))
+
+
+def install_change_log(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    # Recreated on every start so it follows MEDINTEL_CHANGE_LOG_RETENTION
+    connection.execute(text("DROP TRIGGER IF EXISTS patient_changes_compact"))
+    if not CHANGE_LOG_ENABLED:
+        for name in CHANGE_LOG_TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(PatientChange.__table__.delete())
+        set_compacted_through(connection, None)
+        return
+    installed = connection.execute(
+        text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'patient_changes_%'")
+    ).scalar()
+    if installed < len(CHANGE_LOG_TRIGGERS):
+        for ddl in CHANGE_LOG_TRIGGERS.values():
+            connection.execute(text(ddl))
+        # Earlier writes were never logged: start from a marker every client must sync past
+        marker = connection.execute(
+            PatientChange.__table__.insert().values(patient_id=0, op="reset")
+        ).inserted_primary_key[0]
+        set_compacted_through(connection, marker)
+    if CHANGE_LOG_RETENTION > 0:
+        connection.execute(text(compaction_trigger(CHANGE_LOG_RETENTION)))
+
+
+event.listen(Base.metadata, "after_create", install_change_log)
+
+
+def log_bounds(db):
+    """(latest seq, oldest `since` still answerable from the log); (None, None) without a log."""
+    compacted = db.scalar(select(AppMeta.value).where(AppMeta.key == COMPACTED_THROUGH))
+    if compacted is None:
+        return None, None
+    head = db.scalar(select(func.max(PatientChange.seq)))
+    return max(head or 0, int(compacted)), int(compacted)
+
+
+def compact_changes(connection, keep):
+    """Drop all but the newest `keep` entries; returns the number removed."""
+    head = connection.scalar(select(func.max(PatientChange.seq)))
+    compacted = connection.scalar(select(AppMeta.value).where(AppMeta.key == COMPACTED_THROUGH))
+    if head is None or compacted is None or head - keep <= int(compacted):
+        return 0
+    removed = connection.execute(delete(PatientChange).where(PatientChange.seq <= head - keep)).rowcount
+    set_compacted_through(connection, head - keep)
+    return removed
+
+
+def changes_response(since, seq, snapshot, has_more, rows, deletes, fields, after=None):
+    return FastJSONResponse({
+        "since": since,
+        "seq": seq,
+        "snapshot": snapshot,
+        "has_more": has_more,
+        "after": after,
+        "upserts": row_dicts(rows, fields),
+        "deletes": deletes,
+    })
+
+
+def snapshot_page(db, since, seq, after, limit, fields):
+    rows = db.execute(patient_rows(after, limit, fields)).all()
+    has_more = len(rows) == limit
+    return changes_response(since, seq, True, has_more, rows, [], fields, rows[-1].id if has_more else None)
+
+
+@router.get("/patients/changes", response_model=PatientChanges)
+def get_patient_changes(
+    since: int = Query(..., ge=0),
+    after: int = Query(0, ge=0),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=PAGE_SIZE_MAX),
+    fields: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    fields = page_fields(select_fields(fields), limit)
+    if after:
+        # A later page of the snapshot pinned at `since`
+        return snapshot_page(db, since, since, after, limit, fields)
+    # Bounds first, so the rows read after them are at least that new
+    head, oldest = log_bounds(db)
+    if head is None or since < oldest or since > head:
+        return snapshot_page(db, since, head or 0, 0, limit, fields)
+
+    changes = db.execute(
+        select(PatientChange.seq, PatientChange.patient_id)
+        .where(PatientChange.seq > since)
+        .order_by(PatientChange.seq)
+        .limit(limit)
+    ).all()
+    if not changes:
+        return changes_response(since, since, False, False, [], [], fields)
+    ids = list(dict.fromkeys(change.patient_id for change in changes))
+    rows = db.execute(patient_rows(0, fields=fields, conditions=[Patient.id.in_(ids)])).all()
+    present = {row.id for row in rows}
+    deletes = [patient_id for patient_id in ids if patient_id not in present]
+    return changes_response(since, changes[-1].seq, False, len(changes) == limit, rows, deletes, fields)
+
+
+def main():
+    from .database import engine
+    from .startup import init_database
+
+    parser = argparse.ArgumentParser(description="Inspect or compact the patient change log")
+    parser.add_argument("--compact", action="store_true", help="drop all but the newest --keep entries")
+    parser.add_argument("--keep", type=int, default=CHANGE_LOG_RETENTION)
+    args = parser.parse_args()
+
+    init_database(engine)
+    with engine.begin() as connection:
+        if args.compact:
+            print(f"Removed {compact_changes(connection, max(args.keep, 0)):,} entries")
+        entries, oldest, head = connection.execute(
+            select(func.count(), func.min(PatientChange.seq), func.max(PatientChange.seq))
+        ).one()
+    print(f"{entries:,} change log entries (seq {oldest}..{head})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Optional in-memory columnar snapshot of `patients` (MEDINTEL_COLUMNAR_CACHE).
+
+Categorical columns are dictionary-encoded into int32 code arrays. Age and cost
+are float64 arrays, with NaN standing in for NULL. Before each read the snapshot
+compares `data_version` with the version it was built at. If the version moved
+by exactly the number of rows past its max id, only inserts happened and just
+those rows are appended. Otherwise it reloads.
+
+/aggregate, /kpis and /histogram are answered with np.bincount / ufunc.at over
+the arrays, with the same semantics as the SQL paths. Requests the rollup or KPI
+summary tables already answer cheaply, and filters the snapshot cannot evaluate,
+fall back to SQL.
+"""
+import math
+import threading
+
+import numpy as np
+from sqlalchemy import BindParameter, Column, func, select
+from sqlalchemy.sql import operators
+
+from .aggregate import (
+    AGE_BAND_OVERFLOW, AGE_BAND_RANGE, AGE_BANDS, DIMENSIONS, build_rollup_query, histogram_edges, histogram_response, metric_label,
+    split_metric,
+)
+from .config import COLUMNAR_CACHE_ENABLED, KPI_SUMMARY_ENABLED
+from .database import engine, is_sqlite
+from .models import Patient
+from .summary import kpi_response
+from .versioning import version_query
+
+CATEGORICAL = ["department", "gender", "outcome", "readmission"]
+NUMERIC = ["age", "treatment_cost"]
+INTEGRAL = {"age", "readmitted"}
+BAND_UPPERS = np.array([upper for upper, _ in AGE_BANDS], dtype=float)
+BAND_LABELS = [label for _, label in AGE_BANDS] + [AGE_BAND_OVERFLOW, None]
+
+COMPARISONS = {
+    operators.eq: np.equal,
+    operators.ge: np.greater_equal,
+    operators.le: np.less_equal,
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+class Dictionary:
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, values):
+        for value in set(values) - self.codes.keys():
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+        return np.array([self.codes[value] for value in values], dtype=np.int32)
+
+
+class PatientColumns:
+    """One immutable generation of the snapshot; appends return a new instance."""
+
+    def __init__(self, dictionaries, codes, numbers, max_id):
+        self.dictionaries = dictionaries
+        self.codes = codes
+        self.numbers = numbers
+        self.max_id = max_id
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            {name: Dictionary() for name in CATEGORICAL},
+            {name: np.empty(0, dtype=np.int32) for name in CATEGORICAL},
+            {name: np.empty(0, dtype=float) for name in NUMERIC},
+            0,
+        )
+
+    def __len__(self):
+        return len(self.numbers["age"])
+
+    def append(self, rows):
+        if not rows:
+            return self
+        ids, *columns = zip(*rows)
+        values = dict(zip(CATEGORICAL + NUMERIC, columns))
+        codes = {
+            name: np.concatenate([self.codes[name], self.dictionaries[name].encode(values[name])])
+            for name in CATEGORICAL
+        }
+        numbers = {
+            name: np.concatenate([self.numbers[name], np.array(values[name], dtype=float)])
+            for name in NUMERIC
+        }
+        return PatientColumns(self.dictionaries, codes, numbers, max(ids))
+
+    def readmitted(self):
+        return (self.codes["readmission"] == self.dictionaries["readmission"].codes.get("Yes", -1)).astype(float)
+
+    def measure(self, name):
+        return self.readmitted() if name == "readmitted" else self.numbers[name]
+
+    def condition_mask(self, condition):
+        left, right = getattr(condition, "left", None), getattr(condition, "right", None)
+        if not (isinstance(left, Column) and left.table is Patient.__table__ and isinstance(right, BindParameter)):
+            raise Unsupported
+        name, value = left.key, right.effective_value
+        if name in CATEGORICAL:
+            lookup = self.dictionaries[name].codes
+            if condition.operator is operators.in_op:
+                return np.isin(self.codes[name], [lookup[item] for item in value if item in lookup])
+            if condition.operator is operators.eq:
+                return self.codes[name] == lookup.get(value, -1)
+        elif name in NUMERIC and condition.operator in COMPARISONS:
+            with np.errstate(invalid="ignore"):
+                return COMPARISONS[condition.operator](self.numbers[name], value)
+        raise Unsupported
+
+    def mask(self, conditions):
+        mask = np.ones(len(self), dtype=bool)
+        for condition in conditions:
+            mask &= self.condition_mask(condition)
+        return mask
+
+    def dimension(self, name, mask):
+        """(codes, labels) for a group_by dimension over the masked rows."""
+        if name in CATEGORICAL:
+            return self.codes[name][mask], self.dictionaries[name].values
+        if name == "age_band":
+            age = self.numbers["age"][mask]
+            codes = np.searchsorted(BAND_UPPERS, age, side="left")
+            # NULL ages and ages outside the banded range get the None label, as in the SQL CASE
+            with np.errstate(invalid="ignore"):
+                codes[~((age > AGE_BAND_RANGE[0]) & (age <= AGE_BAND_RANGE[1]))] = len(BAND_LABELS) - 1
+            return codes, BAND_LABELS
+        labels, codes = np.unique(self.numbers[name][mask], return_inverse=True)
+        return codes, [None if math.isnan(label) else int(label) for label in labels]
+
+
+def reduce_measure(name, values, groups, size):
+    valid = ~np.isnan(values)
+    # Weighted bincount of an empty selection comes back as int64, which cannot hold NaN
+    present = np.bincount(groups, weights=valid, minlength=size).astype(float)
+    if name in ("min", "max"):
+        out = np.full(size, np.inf if name == "min" else -np.inf)
+        (np.fmin if name == "min" else np.fmax).at(out, groups[valid], values[valid])
+    else:
+        clean = np.where(valid, values, 0.0)
+        total = np.bincount(groups, weights=clean, minlength=size).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = total if name == "sum" else total / present
+            if name == "std":
+                squares = np.bincount(groups, weights=clean * clean, minlength=size).astype(float) / present
+                out = np.sqrt(np.maximum(squares - out * out, 0.0))
+    out[present == 0] = np.nan
+    return out
+
+
+def output_value(value, integral):
+    if math.isnan(value):
+        return None
+    return int(round(value)) if integral else float(value)
+
+
+def aggregate(frame, group_by, metrics, conditions):
+    unknown = [dim for dim in group_by if dim not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension(s): {', '.join(unknown)}")
+    if not metrics:
+        raise ValueError("At least one metric is required")
+    keys = [split_metric(metric) for metric in metrics]
+    if build_rollup_query(group_by, metrics, conditions) is not None:
+        # A few hundred rollup cells beat a scan of the arrays
+        raise Unsupported
+    mask = frame.mask(conditions)
+    if group_by and not mask.any():
+        return []
+
+    dimensions = [frame.dimension(dim, mask) for dim in group_by]
+    if dimensions:
+        flat = np.ravel_multi_index([codes for codes, _ in dimensions], [len(labels) for _, labels in dimensions])
+        cells, groups = np.unique(flat, return_inverse=True)
+        coordinates = np.unravel_index(cells, [len(labels) for _, labels in dimensions])
+        size = len(cells)
+    else:
+        groups, coordinates, size = np.zeros(int(mask.sum()), dtype=np.intp), [], 1
+
+    columns = {}
+    for name, measure in keys:
+        label = metric_label(name, measure)
+        if measure is None:
+            columns[label] = [int(count) for count in np.bincount(groups, minlength=size)]
+            continue
+        values = reduce_measure(name, frame.measure(measure)[mask], groups, size)
+        integral = measure in INTEGRAL and name in ("sum", "min", "max")
+        columns[label] = [output_value(value, integral) for value in values]
+
+    rows = []
+    for index in range(size):
+        row = {dim: labels[coordinate[index]] for dim, (_, labels), coordinate in zip(group_by, dimensions, coordinates)}
+        row.update((label, values[index]) for label, values in columns.items())
+        rows.append(row)
+    # Match the SQL ORDER BY: NULLs first, then ascending
+    rows.sort(key=lambda row: [(row[dim] is not None, row[dim]) for dim in group_by])
+    return rows
+
+
+def kpis(frame):
+    if KPI_SUMMARY_ENABLED:
+        # The trigger-maintained summary row is a cheaper read
+        raise Unsupported
+    cost = frame.numbers["treatment_cost"]
+    return kpi_response(len(frame), float(np.nansum(cost)) if len(cost) else 0, int(frame.readmitted().sum()))
+
+
+def histogram(frame, column, bins, conditions, low=None, high=None):
+    values = frame.numbers[column][frame.mask(conditions)]
+    values = values[~np.isnan(values)]
+    if low is None and len(values):
+        low = float(values.min())
+    if high is None and len(values):
+        high = float(values.max())
+    if low is None or high is None:
+        return histogram_response(column, [], [])
+    if low > high:
+        raise ValueError("range_min must not exceed range_max")
+    edges = histogram_edges(float(low), float(high), bins)
+    counts, _ = np.histogram(values, bins=np.array(edges))
+    return histogram_response(column, edges, counts.tolist())
+
+
+class ColumnarSnapshot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.frame = None
+        self.reloads = 0
+        self.appends = 0
+
+    def load(self, connection, after):
+        stmt = (
+            select(Patient.id, *[getattr(Patient, name) for name in CATEGORICAL + NUMERIC])
+            .where(Patient.id > after)
+            .order_by(Patient.id)
+        )
+        return connection.execute(stmt).all()
+
+    def refresh(self, connection, version):
+        frame = self.frame
+        if frame is not None and version[0] == self.version[0]:
+            new_rows = connection.execute(select(func.count()).where(Patient.id > frame.max_id)).scalar()
+            if version[1] - self.version[1] == new_rows:
+                self.frame = frame.append(self.load(connection, frame.max_id))
+                self.version = version
+                self.appends += 1
+                return
+        self.frame = PatientColumns.empty().append(self.load(connection, 0))
+        self.version = version
+        self.reloads += 1
+
+    def current(self):
+        with engine.connect() as connection:
+            version = tuple(connection.execute(version_query).first() or ())
+            if version != self.version:
+                with self.lock:
+                    if version != self.version:
+                        self.refresh(connection, version)
+        return self.frame
+
+
+# Freshness relies on the SQLite data_version triggers
+snapshot = ColumnarSnapshot() if COLUMNAR_CACHE_ENABLED and is_sqlite else None
+
+
+def answer(compute, *args):
+    """`compute(frame, *args)` on the current snapshot, or None when disabled or unsupported."""
+    if snapshot is None:
+        return None
+    try:
+        return compute(snapshot.current(), *args)
+    except Unsupported:
+        return None
@@ -0,0 +1,156 @@
+"""
+Response compression middleware with Accept-Encoding negotiation.
+
+zstd is preferred when the client accepts it and `zstandard` is installed,
+otherwise gzip. Complete bodies below `minimum_size` are sent as-is. Streaming
+bodies (NDJSON, Arrow) are compressed chunk by chunk and flushed after each one,
+so large exports are never buffered whole in memory.
+"""
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class GzipStream:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class ZstdStream:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, algorithms=("zstd", "gzip"), gzip_level=6, zstd_level=3,
+                 exclude_media_types=()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.algorithms = [name for name in algorithms if name != "zstd" or zstandard is not None]
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level}
+        self.exclude_media_types = tuple(exclude_media_types)
+
+    def choose_encoding(self, header):
+        accepted = parse_accept_encoding(header)
+        for name in self.algorithms:
+            if accepted.get(name, 0) > 0:
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.level = middleware.levels[encoding]
+        self.downstream = send
+        self.start_message = None
+        self.stream = None
+        self.passthrough = False
+
+    def compress_once(self, body):
+        if self.encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(body)
+        return gzip.compress(body, compresslevel=self.level)
+
+    def should_skip(self, headers):
+        return (
+            self.start_message["status"] in (204, 304)
+            or "content-encoding" in headers
+            or headers.get("content-type", "").startswith(self.middleware.exclude_media_types)
+        )
+
+    def weaken_etag(self, headers):
+        # The encoded bytes differ from the identity ones, so the validator is only weakly equal
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    def encoded_headers(self, headers):
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        self.weaken_etag(headers)
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None:
+            headers = MutableHeaders(scope=self.start_message)
+            if self.should_skip(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                if self.start_message["status"] == 304:
+                    self.weaken_etag(headers)
+                await self.downstream(self.start_message)
+                await self.downstream(message)
+                return
+
+            self.encoded_headers(headers)
+            if not more_body:
+                body = self.compress_once(body)
+                headers["Content-Length"] = str(len(body))
+                await self.downstream(self.start_message)
+                await self.downstream({"type": "http.response.body", "body": body})
+                return
+
+            del headers["Content-Length"]
+            self.stream = ZstdStream(self.level) if self.encoding == "zstd" else GzipStream(self.level)
+            await self.downstream(self.start_message)
+
+        chunk = self.stream.compress(body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,132 @@
+"""
+MedIntel X - Backend Configuration
+"""
+import os
+
+
+def env_flag(name, default):
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def admission_limit(name, default):
+    concurrency, _, queue = os.getenv(name, default).partition(":")
+    return int(concurrency), int(queue or 0)
+
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+
+def async_url(url):
+    scheme, rest = url.split(":", 1)
+    return ASYNC_DRIVERS.get(scheme, scheme) + ":" + rest
+
+
+# Database Settings
+DATABASE_URL = os.getenv("MEDINTEL_DATABASE_URL", "sqlite:///./data/medintel.db")
+DB_POOL_SIZE = int(os.getenv("MEDINTEL_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("MEDINTEL_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("MEDINTEL_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("MEDINTEL_DB_POOL_RECYCLE", "3600"))
+
+# Serve /patients, /kpis and /aggregate from `async def` handlers on an async engine
+DB_ASYNC = env_flag("MEDINTEL_DB_ASYNC", "false")
+ASYNC_DATABASE_URL = os.getenv("MEDINTEL_ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+
+# Applied to every new SQLite connection; WAL lets readers proceed while a writer commits
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("MEDINTEL_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("MEDINTEL_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("MEDINTEL_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("MEDINTEL_SQLITE_CACHE_SIZE", str(-64 * 1024))),  # negative = KiB
+    "busy_timeout": int(os.getenv("MEDINTEL_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+# Engine for the read-only analytics queries (/aggregate, /histogram); writes stay on DATABASE_URL.
+# "sqlite" runs them on the main database, "duckdb" scans medintel.db through DuckDB's sqlite
+# extension, "duckdb-parquet" scans a Parquet export refreshed when the data version moves.
+ANALYTICS_ENGINE = os.getenv("MEDINTEL_ANALYTICS_ENGINE", "sqlite").strip().lower()
+ANALYTICS_PARQUET_PATH = os.getenv("MEDINTEL_ANALYTICS_PARQUET_PATH", "./data/patients.parquet")
+DUCKDB_THREADS = int(os.getenv("MEDINTEL_DUCKDB_THREADS", "0"))  # 0 = DuckDB default
+
+# Startup
+SEED_DEMO_DATA = env_flag("MEDINTEL_SEED_DEMO_DATA", "false")
+SEED_ROWS = int(os.getenv("MEDINTEL_SEED_ROWS", "500"))
+STARTUP_LOCK_TIMEOUT = float(os.getenv("MEDINTEL_STARTUP_LOCK_TIMEOUT", "600"))
+
+# API Settings
+PAGE_SIZE_MAX = int(os.getenv("MEDINTEL_PAGE_SIZE_MAX", "10000"))
+STREAM_BATCH_SIZE = int(os.getenv("MEDINTEL_STREAM_BATCH_SIZE", "1000"))
+
+# Bulk Ingest (POST /patients/bulk): rows per executemany and per committed transaction
+BULK_BATCH_SIZE = int(os.getenv("MEDINTEL_BULK_BATCH_SIZE", "5000"))
+BULK_TRANSACTION_ROWS = int(os.getenv("MEDINTEL_BULK_TRANSACTION_ROWS", "50000"))
+BULK_MAX_ERRORS = int(os.getenv("MEDINTEL_BULK_MAX_ERRORS", "20"))
+
+# Live KPI stream (GET /stream/kpis): data_version poll interval, per-client queue, keepalive
+SSE_POLL_INTERVAL = float(os.getenv("MEDINTEL_SSE_POLL_INTERVAL", "1.0"))
+SSE_QUEUE_SIZE = int(os.getenv("MEDINTEL_SSE_QUEUE_SIZE", "16"))
+SSE_HEARTBEAT = float(os.getenv("MEDINTEL_SSE_HEARTBEAT", "15"))
+
+# Report Jobs (POST /jobs/reports): builder threads per process and where artifacts are kept
+JOB_WORKERS = int(os.getenv("MEDINTEL_JOB_WORKERS", "2"))
+REPORT_DIR = os.getenv("MEDINTEL_REPORT_DIR", "./data/reports")
+# Queued/running jobs older than this are taken as abandoned by a crashed or restarted worker
+JOB_STALE_AFTER = float(os.getenv("MEDINTEL_JOB_STALE_AFTER", "1800"))
+# Job rows and artifacts are removed this long after they were created
+JOB_RETENTION = float(os.getenv("MEDINTEL_JOB_RETENTION", str(7 * 24 * 3600)))
+
+# Admission Control: "concurrency:queue" per route class and process. Requests beyond
+# the queue, or queued longer than the timeout, get 503 with Retry-After.
+ADMISSION_ENABLED = env_flag("MEDINTEL_ADMISSION", "true")
+ADMISSION_LIMITS = {
+    "bulk": admission_limit("MEDINTEL_ADMISSION_BULK", "2:4"),
+    "aggregate": admission_limit("MEDINTEL_ADMISSION_AGGREGATE", "8:32"),
+    "read": admission_limit("MEDINTEL_ADMISSION_READ", "32:128"),
+}
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("MEDINTEL_ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_RETRY_AFTER = int(os.getenv("MEDINTEL_ADMISSION_RETRY_AFTER", "2"))
+
+# Query-result cache for /aggregate, /kpis, /histogram and JSON /patients pages. Entries are
+# keyed by the data version, so writes invalidate them; single results over the item limit
+# are not cached.
+QUERY_CACHE_ENABLED = env_flag("MEDINTEL_QUERY_CACHE", "true")
+QUERY_CACHE_MAX_BYTES = int(os.getenv("MEDINTEL_QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_MAX_ITEM_BYTES = int(os.getenv("MEDINTEL_QUERY_CACHE_MAX_ITEM_BYTES", str(8 * 1024 * 1024)))
+QUERY_CACHE_TTL = float(os.getenv("MEDINTEL_QUERY_CACHE_TTL", "300"))
+# "memory" keeps a cache per process; "sqlite" shares one file between all workers on the
+# host (put it on tmpfs, e.g. /dev/shm, to keep it in RAM)
+QUERY_CACHE_BACKEND = os.getenv("MEDINTEL_QUERY_CACHE_BACKEND", "memory").strip().lower()
+QUERY_CACHE_PATH = os.getenv("MEDINTEL_QUERY_CACHE_PATH", "./data/query_cache.db")
+
+# Prometheus metrics at GET /metrics
+METRICS_ENABLED = env_flag("MEDINTEL_METRICS", "true")
+
+# Server-Timing header (sql / hydrate / serialize) and the slow-statement log; 0 ms disables the log
+SERVER_TIMING_ENABLED = env_flag("MEDINTEL_SERVER_TIMING", "true")
+SLOW_QUERY_MS = float(os.getenv("MEDINTEL_SLOW_QUERY_MS", "250"))
+SLOW_QUERY_LOG = os.getenv("MEDINTEL_SLOW_QUERY_LOG", "./data/slow_queries.log")
+SLOW_QUERY_LOG_BYTES = int(os.getenv("MEDINTEL_SLOW_QUERY_LOG_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("MEDINTEL_SLOW_QUERY_LOG_BACKUPS", "5"))
+
+# Response Compression (zstd needs the optional `zstandard` package, else gzip is used)
+COMPRESSION_ENABLED = env_flag("MEDINTEL_COMPRESSION", "true")
+COMPRESSION_MIN_SIZE = int(os.getenv("MEDINTEL_COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_ALGORITHMS = [
+    name.strip() for name in os.getenv("MEDINTEL_COMPRESSION_ALGORITHMS", "zstd,gzip").split(",") if name.strip()
+]
+GZIP_LEVEL = int(os.getenv("MEDINTEL_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("MEDINTEL_ZSTD_LEVEL", "3"))
+
+# Summary Tables
+KPI_SUMMARY_ENABLED = env_flag("MEDINTEL_KPI_SUMMARY", "true")
+ROLLUP_ENABLED = env_flag("MEDINTEL_ROLLUP", "true")
+
+# Patient change log behind GET /patients/changes. A trigger keeps the newest RETENTION
+# entries (checked every 1000 writes); 0 leaves compaction to `python -m backend.changelog`.
+CHANGE_LOG_ENABLED = env_flag("MEDINTEL_CHANGE_LOG", "true")
+CHANGE_LOG_RETENTION = int(os.getenv("MEDINTEL_CHANGE_LOG_RETENTION", "1000000"))
+CHANGES_PAGE_SIZE = int(os.getenv("MEDINTEL_CHANGES_PAGE_SIZE", "5000"))
+
+# In-process NumPy snapshot of patients serving /aggregate, /kpis and /histogram
+COLUMNAR_CACHE_ENABLED = env_flag("MEDINTEL_COLUMNAR_CACHE", "false")
@@ -1,8 +1,70 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from .config import (
+    ANALYTICS_ENGINE,
+    ANALYTICS_PARQUET_PATH,
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DUCKDB_THREADS,
+    SQLITE_PRAGMAS,
+)
 
-DATABASE_URL = "sqlite:///./data/medintel.db"
+ANALYTICS_ENGINES = ("sqlite", "duckdb", "duckdb-parquet")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+is_sqlite = DATABASE_URL.startswith("sqlite")
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if is_sqlite else {},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=not is_sqlite,
+)
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+if is_sqlite:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+_analytics_engine = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics_engine():
+    """The DuckDB engine for read-only analytics, or None to run them on `engine`."""
+    global _analytics_engine
+    if ANALYTICS_ENGINE not in ANALYTICS_ENGINES:
+        raise ValueError(f"MEDINTEL_ANALYTICS_ENGINE must be one of {', '.join(ANALYTICS_ENGINES)}")
+    if ANALYTICS_ENGINE == "sqlite":
+        return None
+    with _analytics_lock:
+        if _analytics_engine is None:
+            if not is_sqlite:
+                raise ValueError("The DuckDB analytics engines read a SQLite DATABASE_URL")
+            from .analytics import DuckDBEngine
+
+            _analytics_engine = DuckDBEngine(ANALYTICS_ENGINE, engine, ANALYTICS_PARQUET_PATH, DUCKDB_THREADS)
+    return _analytics_engine
@@ -0,0 +1,188 @@
+"""
+Server-Sent Events feed of KPI and per-department deltas: GET /stream/kpis.
+
+One poller per process watches `data_version`. When it moves, the poller
+re-reads the KPI summary and the department rollup and publishes only the values
+that changed. Writes that land within one poll interval coalesce into one event.
+Each client has a bounded queue. When a slow client's queue is full, its pending
+deltas are merged into a single event instead of being dropped.
+
+The first event on a connection is a full `snapshot`; later ones are `delta` events
+holding only the changed keys (a removed department is sent as null). Event ids are
+data versions: a client reconnecting with a Last-Event-ID equal to the current
+version skips the snapshot and only gets the deltas after it.
+"""
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from .aggregate import run_aggregate
+from .config import SSE_HEARTBEAT, SSE_POLL_INTERVAL, SSE_QUEUE_SIZE
+from .database import SessionLocal
+from .summary import read_kpis
+from .versioning import version_query
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM = "text/event-stream"
+DEPARTMENT_METRICS = ["count", "sum:treatment_cost", "mean:readmitted"]
+
+router = APIRouter()
+
+
+def read_version():
+    db = SessionLocal()
+    try:
+        return tuple(db.execute(version_query).first() or ())
+    finally:
+        db.close()
+
+
+def read_snapshot():
+    # Version first, so the values read after it are at least that new
+    db = SessionLocal()
+    try:
+        version = tuple(db.execute(version_query).first() or ())
+        kpis = read_kpis(db)
+        departments = {
+            row["department"]: {
+                "patients": row["count"],
+                "revenue": round(row["sum_treatment_cost"] or 0.0, 2),
+                "readmission_rate": round((row["mean_readmitted"] or 0.0) * 100, 2),
+            }
+            for row in run_aggregate(db, ["department"], DEPARTMENT_METRICS, [])
+        }
+    finally:
+        db.close()
+    kpis = {
+        "total_patients": kpis["total_patients"],
+        "total_revenue": round(kpis["total_revenue"] or 0.0, 2),
+        "readmission_rate": round(kpis["readmission_rate"], 2),
+    }
+    return version, {"kpis": kpis, "departments": departments}
+
+
+def diff(old, new):
+    delta = {}
+    for key, value in new.items():
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            changed = diff(old[key], value)
+            if changed:
+                delta[key] = changed
+        elif old.get(key) != value:
+            delta[key] = value
+    for key in old.keys() - new.keys():
+        delta[key] = None
+    return delta
+
+
+def merge(base, delta):
+    """Apply `delta` onto `base` in place, copying nested dicts so published events stay untouched."""
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            base[key] = merge(base[key] if isinstance(base.get(key), dict) else {}, value)
+        else:
+            base[key] = value
+    return base
+
+
+def version_id(version):
+    return ".".join(str(part) for part in version)
+
+
+class Subscriber:
+    def __init__(self, size):
+        self.queue = asyncio.Queue(size)
+
+    def publish(self, kind, data):
+        try:
+            self.queue.put_nowait((kind, data))
+        except asyncio.QueueFull:
+            merged_kind, merged = "delta", {}
+            while not self.queue.empty():
+                queued_kind, queued = self.queue.get_nowait()
+                merged_kind = "snapshot" if "snapshot" in (merged_kind, queued_kind) else "delta"
+                merge(merged, queued)
+            self.queue.put_nowait((merged_kind, merge(merged, data)))
+
+
+class KpiBroadcaster:
+    def __init__(self, interval, queue_size):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = asyncio.Lock()
+        self.task = None
+        self.version = None
+        self.snapshot = {}
+
+    async def subscribe(self, last_event_id=None):
+        async with self.lock:
+            if self.task is None or self.task.done():
+                self.version, self.snapshot = await run_in_threadpool(read_snapshot)
+                self.task = asyncio.create_task(self.run())
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        # Older versions are not kept, so any other id needs the full state again
+        if last_event_id != version_id(self.version):
+            subscriber.publish("snapshot", {"version": version_id(self.version), **self.snapshot})
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def poll(self):
+        if await run_in_threadpool(read_version) == self.version:
+            return
+        version, snapshot = await run_in_threadpool(read_snapshot)
+        delta = diff(self.snapshot, snapshot)
+        self.version, self.snapshot = version, snapshot
+        if delta:
+            event = {"version": version_id(version), **delta}
+            for subscriber in list(self.subscribers):
+                subscriber.publish("delta", event)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.subscribers:
+                return
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("KPI stream poll failed")
+
+
+broadcaster = KpiBroadcaster(SSE_POLL_INTERVAL, SSE_QUEUE_SIZE)
+
+
+def format_event(kind, data):
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {data['version']}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+@router.get("/stream/kpis")
+async def stream_kpis(request: Request):
+    subscriber = await broadcaster.subscribe(request.headers.get("last-event-id"))
+
+    async def events():
+        try:
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(subscriber.queue.get(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(kind, data)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(), media_type=EVENT_STREAM, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,36 @@
+"""
+Query-string filters shared by the patient read endpoints.
+"""
+from typing import List, Optional
+from fastapi import Query
+from .models import Patient
+
+
+def patient_filters(
+    department: Optional[List[str]] = Query(None),
+    gender: Optional[List[str]] = Query(None),
+    outcome: Optional[List[str]] = Query(None),
+    readmission: Optional[List[str]] = Query(None),
+    age_min: Optional[int] = None,
+    age_max: Optional[int] = None,
+    cost_min: Optional[float] = None,
+    cost_max: Optional[float] = None,
+):
+    conditions = []
+    for column, values in (
+        (Patient.department, department),
+        (Patient.gender, gender),
+        (Patient.outcome, outcome),
+        (Patient.readmission, readmission),
+    ):
+        if values:
+            conditions.append(column == values[0] if len(values) == 1 else column.in_(values))
+    if age_min is not None:
+        conditions.append(Patient.age >= age_min)
+    if age_max is not None:
+        conditions.append(Patient.age <= age_max)
+    if cost_min is not None:
+        conditions.append(Patient.treatment_cost >= cost_min)
+    if cost_max is not None:
+        conditions.append(Patient.treatment_cost <= cost_max)
+    return conditions
@@ -0,0 +1,181 @@
+"""
+Response encodings for bulk patient reads: JSON, NDJSON, Arrow IPC stream and Parquet.
+
+Unpaged JSON is streamed too, as one array written a batch at a time.
+
+Streaming encoders are push-style: `encode(batch)` takes a list of Row tuples in
+column order and `finish()` flushes the trailer, each returning the bytes ready to
+send. `encode_stream` / `encode_stream_async` drive them from sync or async batch
+iterators so memory stays bounded by one batch.
+"""
+import io
+import json
+import time
+
+from fastapi.responses import JSONResponse
+
+from .metrics import count_rows, count_serialized
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NDJSON = "application/x-ndjson"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+MEDIA_TYPES = {
+    "ndjson": NDJSON,
+    "arrow": ARROW_STREAM,
+    "parquet": PARQUET,
+}
+
+# Arrow column types for the patients table
+ARROW_TYPES = {
+    "id": "int64",
+    "department": "string",
+    "gender": "string",
+    "age": "int64",
+    "treatment_cost": "float64",
+    "readmission": "string",
+    "outcome": "string",
+    "admission_date": "date32",
+}
+
+
+def negotiate_format(accept, requested=None):
+    if requested:
+        return requested
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        for name, candidate in MEDIA_TYPES.items():
+            if media_type == candidate:
+                return name
+    return "json"
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def dumps(value):
+    """JSON bytes via orjson when installed (dates as ISO strings either way)."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`; return it directly to also skip jsonable_encoder."""
+
+    def render(self, content):
+        started = time.perf_counter()
+        body = dumps(content)
+        count_serialized(len(body), time.perf_counter() - started)
+        return body
+
+
+def drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+class JsonArrayEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+        self.started = False
+
+    def encode(self, batch):
+        if not batch:
+            return b""
+        # One dumps per batch, without its brackets
+        items = dumps([dict(zip(self.columns, row)) for row in batch])[1:-1]
+        prefix = b"," if self.started else b"["
+        self.started = True
+        return prefix + items
+
+    def finish(self):
+        return b"]" if self.started else b"[]"
+
+
+class NdjsonEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def encode(self, batch):
+        return b"".join(dumps(dict(zip(self.columns, row))) + b"\n" for row in batch)
+
+    def finish(self):
+        return b""
+
+
+class ArrowEncoder:
+    def __init__(self, pa, columns):
+        self.pa = pa
+        self.schema = pa.schema([(name, ARROW_TYPES.get(name, "string")) for name in columns])
+        self.sink = io.BytesIO()
+        self.writer = self.open_writer()
+
+    def open_writer(self):
+        return self.pa.ipc.new_stream(self.sink, self.schema)
+
+    def record_batch(self, batch):
+        arrays = [
+            self.pa.array(values, type=field.type)
+            for values, field in zip(zip(*batch), self.schema)
+        ]
+        return self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def encode(self, batch):
+        if batch:
+            self.writer.write_batch(self.record_batch(batch))
+        return drain(self.sink)
+
+    def finish(self):
+        self.writer.close()
+        return drain(self.sink)
+
+
+class ParquetEncoder(ArrowEncoder):
+    def open_writer(self):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(self.sink, self.schema, compression="snappy")
+
+
+def make_encoder(fmt, columns):
+    """Return a streaming encoder for `fmt`, or None if its optional dependency is missing."""
+    if fmt == "json":
+        return JsonArrayEncoder(columns)
+    if fmt == "ndjson":
+        return NdjsonEncoder(columns)
+    pa = load_pyarrow()
+    if pa is None:
+        return None
+    return ArrowEncoder(pa, columns) if fmt == "arrow" else ParquetEncoder(pa, columns)
+
+
+def counted(chunk):
+    count_serialized(len(chunk))
+    return chunk
+
+
+def encode_stream(encoder, batches):
+    for batch in batches:
+        count_rows(len(batch))
+        yield counted(encoder.encode(batch))
+    yield counted(encoder.finish())
+
+
+async def encode_stream_async(encoder, batches):
+    async for batch in batches:
+        count_rows(len(batch))
+        yield counted(encoder.encode(batch))
+    yield counted(encoder.finish())
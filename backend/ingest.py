@@ -0,0 +1,352 @@
+"""
+POST /patients/bulk: stream a CSV or NDJSON body into the patients table.
+
+The body is decoded as it arrives and parsed into records: one csv.reader per
+request, so quoted fields may hold newlines, or one JSON object per line. Records
+are cut into batches of `batch_size`, and each batch is coerced and validated
+column-wise with NumPy. Valid rows are buffered and written with one executemany
+per `transaction_rows` rows, so no transaction stays open while the client is
+still sending. Invalid rows are skipped and reported by the line they start on.
+"""
+import codecs
+import csv
+import json
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from .config import BULK_BATCH_SIZE, BULK_MAX_ERRORS, BULK_TRANSACTION_ROWS
+from .database import engine
+from .formats import NDJSON
+from .generate import COLUMNS, insert_sql
+
+REQUIRED_COLUMNS = ["department", "gender", "age", "treatment_cost", "readmission", "outcome"]
+MAX_AGE = 130
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    NDJSON: "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+YES = ["yes", "y", "true", "1"]
+NO = ["no", "n", "false", "0"]
+MALE = ["m", "male"]
+FEMALE = ["f", "female"]
+
+router = APIRouter()
+
+
+async def iter_lines(chunks):
+    """Decoded lines, each ending in a newline but the last, in lists of what each chunk completed."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    tail = ""
+    first = True
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if first and text:
+            text, first = text.lstrip("\ufeff"), False
+        lines = (tail + text).split("\n")
+        tail = lines.pop()
+        if lines:
+            yield [line + "\n" for line in lines]
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield [tail]
+
+
+class MoreInput(Exception):
+    pass
+
+
+class LineFeed:
+    """Input of a csv.reader that is refilled between records; `taken` holds the lines of the current one."""
+
+    def __init__(self):
+        self.lines = deque()
+        self.taken = []
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            if self.closed:
+                raise StopIteration
+            raise MoreInput
+        line = self.lines.popleft()
+        self.taken.append(line)
+        return line
+
+
+async def iter_csv_records(lines):
+    """(line number, fields or csv.Error) for each CSV record, which may span several lines."""
+    feed = LineFeed()
+    reader = csv.reader(feed)
+    number = 1
+    async for chunk in lines:
+        feed.lines.extend(chunk)
+        while feed.lines:
+            feed.taken = []
+            try:
+                fields = next(reader)
+            except MoreInput:
+                # The reader starts each record afresh, so put its lines back and wait for the rest
+                feed.lines.extendleft(reversed(feed.taken))
+                break
+            except csv.Error as e:
+                fields = e
+            yield number, fields
+            number += len(feed.taken)
+    feed.closed = True
+    while True:
+        feed.taken = []
+        try:
+            fields = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            fields = e
+        yield number, fields
+        number += len(feed.taken)
+
+
+async def iter_ndjson_records(lines):
+    number = 1
+    async for chunk in lines:
+        for line in chunk:
+            yield number, line
+            number += 1
+
+
+async def iter_batches(records, size):
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_columns(header, records):
+    """Columns of parsed CSV records; rows with the wrong field count are returned as errors."""
+    positions = {name: index for index, name in enumerate(header)}
+    width = len(header)
+    rows, numbers, errors = [], [], []
+    for number, fields in records:
+        if isinstance(fields, csv.Error):
+            errors.append({"line": number, "error": f"invalid CSV: {fields}"})
+            continue
+        if not fields:
+            continue
+        if len(fields) != width:
+            errors.append({"line": number, "error": f"expected {width} fields, got {len(fields)}"})
+            continue
+        rows.append(fields)
+        numbers.append(number)
+    values = list(zip(*rows)) if rows else [()] * width
+    columns = {name: values[positions[name]] if name in positions else [None] * len(rows) for name in COLUMNS}
+    return columns, numbers, errors
+
+
+def ndjson_columns(lines):
+    records, numbers, errors = [], [], []
+    for number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append({"line": number, "error": f"invalid JSON: {e}"})
+            continue
+        if not isinstance(record, dict):
+            errors.append({"line": number, "error": "expected a JSON object"})
+            continue
+        records.append(record)
+        numbers.append(number)
+    columns = {name: [record.get(name) for record in records] for name in COLUMNS}
+    return columns, numbers, errors
+
+
+def text_column(values):
+    return np.char.strip(np.array(["" if value is None else str(value) for value in values], dtype=str))
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def number_column(values):
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([parse_float(value) for value in values], dtype=float)
+
+
+def parse_date(value):
+    try:
+        return np.datetime64(value[:10], "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def date_column(text):
+    try:
+        return text.astype("datetime64[D]")
+    except ValueError:
+        return np.array([parse_date(value) for value in text], dtype="datetime64[D]")
+
+
+def coerce_batch(columns, numbers):
+    """Vectorized type coercion and validation; returns (insert rows, per-line errors)."""
+    department = text_column(columns["department"])
+    outcome = text_column(columns["outcome"])
+    gender = text_column(columns["gender"])
+    lowered = np.char.lower(gender)
+    gender = np.where(np.isin(lowered, MALE), "Male", np.where(np.isin(lowered, FEMALE), "Female", np.char.title(gender)))
+    readmission = np.char.lower(text_column(columns["readmission"]))
+    readmission = np.where(np.isin(readmission, YES), "Yes", np.where(np.isin(readmission, NO), "No", ""))
+    age = number_column(columns["age"])
+    cost = number_column(columns["treatment_cost"])
+    date_text = text_column(columns["admission_date"])
+    dates = date_column(date_text)
+
+    with np.errstate(invalid="ignore"):
+        checks = {
+            "department": department != "",
+            "gender": gender != "",
+            "age": np.isfinite(age) & (age >= 0) & (age <= MAX_AGE),
+            "treatment_cost": np.isfinite(cost) & (cost >= 0),
+            "readmission": readmission != "",
+            "outcome": outcome != "",
+            "admission_date": ~np.isnat(dates) | (date_text == ""),
+        }
+    valid = np.logical_and.reduce(list(checks.values()))
+
+    errors = [
+        {"line": numbers[index], "error": "invalid " + ", ".join(name for name, ok in checks.items() if not ok[index])}
+        for index in np.flatnonzero(~valid)
+    ]
+    dates = dates[valid]
+    rows = list(zip(
+        department[valid].tolist(),
+        gender[valid].tolist(),
+        np.rint(age[valid]).astype(np.int64).tolist(),
+        cost[valid].tolist(),
+        readmission[valid].tolist(),
+        outcome[valid].tolist(),
+        np.where(np.isnat(dates), None, dates.astype(str)).tolist(),
+    ))
+    return rows, errors
+
+
+class BatchWriter:
+    """Buffers valid rows and writes each `transaction_rows` of them in one transaction and executemany."""
+
+    def __init__(self, transaction_rows):
+        self.connection = engine.connect()
+        self.sql = insert_sql(self.connection.dialect)
+        self.transaction_rows = transaction_rows
+        self.pending = []
+        self.transactions = 0
+
+    def write(self, rows):
+        self.pending.extend(rows)
+        if len(self.pending) >= self.transaction_rows:
+            self.commit()
+
+    def commit(self):
+        if self.pending:
+            with self.connection.begin():
+                self.connection.exec_driver_sql(self.sql, self.pending)
+            self.pending = []
+            self.transactions += 1
+
+    def close(self):
+        # Rows still buffered when the request fails are dropped, as a rollback would
+        self.connection.close()
+
+
+def resolve_ingest_format(request, requested):
+    if requested:
+        return requested
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson"
+        )
+    return CONTENT_TYPES[media_type]
+
+
+@router.post("/patients/bulk")
+async def bulk_ingest(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=100000),
+    transaction_rows: int = Query(BULK_TRANSACTION_ROWS, ge=1),
+):
+    fmt = resolve_ingest_format(request, format)
+    started = time.perf_counter()
+    received = inserted = batches = 0
+    errors = []
+    error_count = 0
+    header = None
+    lines = iter_lines(request.stream())
+    records = iter_csv_records(lines) if fmt == "csv" else iter_ndjson_records(lines)
+
+    writer = await run_in_threadpool(BatchWriter, transaction_rows)
+    try:
+        async for batch in iter_batches(records, batch_size):
+            if fmt == "csv":
+                if header is None:
+                    fields = batch[0][1]
+                    if isinstance(fields, csv.Error):
+                        raise HTTPException(status_code=400, detail=f"Invalid CSV header: {fields}")
+                    header = [name.strip().lower() for name in fields]
+                    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+                    if missing:
+                        raise HTTPException(status_code=400, detail=f"CSV header is missing: {', '.join(missing)}")
+                    batch = batch[1:]
+                    if not batch:
+                        continue
+                columns, numbers, parse_errors = csv_columns(header, batch)
+            else:
+                columns, numbers, parse_errors = ndjson_columns(batch)
+
+            rows, row_errors = await run_in_threadpool(coerce_batch, columns, numbers)
+            await run_in_threadpool(writer.write, rows)
+            received += len(numbers) + len(parse_errors)
+            inserted += len(rows)
+            batches += 1
+            error_count += len(parse_errors) + len(row_errors)
+            errors.extend((parse_errors + row_errors)[:BULK_MAX_ERRORS - len(errors)])
+        if fmt == "csv" and header is None:
+            # An empty body has no header line at all, so every column is missing
+            raise HTTPException(status_code=400, detail=f"CSV header is missing: {', '.join(REQUIRED_COLUMNS)}")
+        await run_in_threadpool(writer.commit)
+    finally:
+        await run_in_threadpool(writer.close)
+
+    seconds = time.perf_counter() - started
+    return {
+        "format": fmt,
+        "received": received,
+        "inserted": inserted,
+        "rejected": error_count,
+        "batches": batches,
+        "transactions": writer.transactions,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(inserted / seconds) if seconds else None,
+        "errors": sorted(errors, key=lambda error: error["line"]),
+    }
@@ -0,0 +1,367 @@
+"""
+Background report builds: POST /jobs/reports, GET /jobs/{id}, GET /jobs/{id}/artifact.
+
+A report spec (filters, admission-date range, group_by/metrics summary, optional
+patient rows, output format) is validated, then built by a per-process thread pool
+into REPORT_DIR. Job state lives in `report_jobs`, so any worker can answer a poll.
+
+Artifacts are keyed by a hash of the spec and the data version. Submitting a spec
+that was already built against the current data returns the finished job at once.
+A spec that is still queued or running returns that job instead of a second build.
+
+Jobs left queued or running by a worker that crashed or restarted are marked failed
+once they are JOB_STALE_AFTER old, and jobs cancelled at shutdown are marked failed
+then. `expire_jobs` runs at startup and on every submit; it also drops job rows and
+artifacts older than JOB_RETENTION.
+"""
+import csv
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, desc, func, or_, select
+from sqlalchemy.orm import Session
+
+from .aggregate import build_aggregate_query, run_aggregate
+from .config import JOB_RETENTION, JOB_STALE_AFTER, JOB_WORKERS, REPORT_DIR, STREAM_BATCH_SIZE
+from .database import SessionLocal, engine, get_db
+from .filters import patient_filters
+from .models import Patient, ReportJob
+from .queries import patient_rows, select_fields
+from .schemas import JobStatus
+from .versioning import version_query
+
+logger = logging.getLogger(__name__)
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MEDIA_TYPES = {"csv": "text/csv", "json": "application/json", "xlsx": XLSX, "pdf": "application/pdf"}
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes
+
+router = APIRouter()
+executor = None  # created by start_jobs for each application lifespan
+futures = {}  # job id -> Future, for the jobs this process has queued
+
+
+class ReportSpec(BaseModel):
+    format: Literal["csv", "json", "xlsx", "pdf"] = "csv"
+    # Admission date range; when given, patients without an admission date are left out
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    group_by: List[str] = ["department"]
+    metrics: List[str] = ["count", "sum:treatment_cost", "mean:readmitted"]
+    include_rows: bool = False
+    fields: Optional[List[str]] = None
+    department: Optional[List[str]] = None
+    gender: Optional[List[str]] = None
+    outcome: Optional[List[str]] = None
+    readmission: Optional[List[str]] = None
+    age_min: Optional[int] = None
+    age_max: Optional[int] = None
+    cost_min: Optional[float] = None
+    cost_max: Optional[float] = None
+
+
+def report_conditions(spec):
+    conditions = patient_filters(
+        spec.department, spec.gender, spec.outcome, spec.readmission,
+        spec.age_min, spec.age_max, spec.cost_min, spec.cost_max,
+    )
+    if spec.start_date is not None:
+        conditions.append(Patient.admission_date >= spec.start_date)
+    if spec.end_date is not None:
+        conditions.append(Patient.admission_date <= spec.end_date)
+    return conditions
+
+
+def spec_hash(spec, version):
+    canonical = json.dumps(spec.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    stamp = ".".join(str(part) for part in version)
+    return hashlib.sha256(f"{canonical}|{stamp}".encode()).hexdigest()[:32]
+
+
+def job_status(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": round(job.progress, 3),
+        "rows": job.rows,
+        "error": job.error,
+        "format": json.loads(job.spec)["format"],
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "artifact_url": f"/jobs/{job.id}/artifact" if job.status == "done" else None,
+    }
+
+
+def job_response(job, cached, status_code):
+    return JSONResponse(
+        jsonable_encoder({**job_status(job), "cached": cached}),
+        status_code=status_code,
+        headers={"Location": f"/jobs/{job.id}"},
+    )
+
+
+def update_job(job_id, **values):
+    with engine.begin() as connection:
+        connection.execute(ReportJob.__table__.update().where(ReportJob.id == job_id).values(**values))
+
+
+class Progress:
+    """Throttled writes of a job's progress fraction."""
+
+    def __init__(self, job_id, total):
+        self.job_id = job_id
+        self.total = total
+        self.done = 0
+        self.reported = 0.0
+
+    def advance(self, rows):
+        self.done += rows
+        if self.total and time.monotonic() - self.reported >= PROGRESS_INTERVAL:
+            self.reported = time.monotonic()
+            # Reading rows is most of the work; leave the last 10% for writing the file
+            update_job(self.job_id, progress=0.1 + 0.8 * min(self.done / self.total, 1.0))
+
+
+def row_batches(connection, spec, fields, conditions, progress):
+    if not spec.include_rows:
+        return
+    stmt = patient_rows(0, fields=fields, conditions=conditions).execution_options(yield_per=STREAM_BATCH_SIZE)
+    for batch in connection.execute(stmt).partitions():
+        progress.advance(len(batch))
+        yield batch
+
+
+def cell(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def write_csv(path, spec, summary, batches, fields):
+    with open(path, "w", newline="", encoding="utf-8") as sink:
+        writer = csv.writer(sink)
+        if spec.include_rows:
+            writer.writerow(fields)
+            for batch in batches:
+                writer.writerows(batch)
+        elif summary:
+            writer.writerow(summary[0].keys())
+            writer.writerows(row.values() for row in summary)
+
+
+def write_json(path, spec, summary, batches, fields):
+    header = {"spec": spec.model_dump(mode="json"), "generated_at": datetime.utcnow().isoformat(), "summary": summary}
+    with open(path, "w", encoding="utf-8") as sink:
+        sink.write(json.dumps(header)[:-1])
+        if spec.include_rows:
+            sink.write(', "rows": [')
+            first = True
+            for batch in batches:
+                for row in batch:
+                    sink.write(("" if first else ",") + json.dumps(dict(zip(fields, map(cell, row)))))
+                    first = False
+            sink.write("]")
+        sink.write("}")
+
+
+def write_xlsx(path, spec, summary, batches, fields):
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet("summary")
+    if summary:
+        sheet.append(list(summary[0].keys()))
+        for row in summary:
+            sheet.append(list(row.values()))
+    if spec.include_rows:
+        sheet = book.create_sheet("patients")
+        sheet.append(fields)
+        for batch in batches:
+            for row in batch:
+                sheet.append(list(row))
+    book.save(path)
+
+
+def write_pdf(path, spec, summary, batches, fields):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    lines = [
+        f"Generated: {datetime.utcnow().isoformat(timespec='seconds')} UTC",
+        f"Admissions: {spec.start_date or 'any'} to {spec.end_date or 'any'}",
+        "",
+    ]
+    if summary:
+        columns = list(summary[0].keys())
+        lines.append("  ".join(f"{name:>18}" for name in columns))
+        lines.extend("  ".join(f"{str(round(v, 2) if isinstance(v, float) else v):>18}" for v in row.values())
+                     for row in summary)
+    if spec.include_rows:
+        lines += ["", "Patient rows are not included in PDF reports; export CSV, JSON or Excel for the detail"]
+
+    pdf = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(40, height - 40, "MedIntel X Report")
+    y = height - 70
+    pdf.setFont("Courier", 8)
+    for line in lines:
+        if y < 40:
+            pdf.showPage()
+            pdf.setFont("Courier", 8)
+            y = height - 40
+        pdf.drawString(40, y, line)
+        y -= 11
+    pdf.save()
+
+
+WRITERS = {"csv": write_csv, "json": write_json, "xlsx": write_xlsx, "pdf": write_pdf}
+REQUIRES = {"xlsx": "openpyxl", "pdf": "reportlab"}
+
+
+def build_report(job_id):
+    db = SessionLocal()
+    try:
+        job = db.get(ReportJob, job_id)
+        spec = ReportSpec.model_validate_json(job.spec)
+        update_job(job_id, status="running", progress=0.0)
+        fields = select_fields(spec.fields)
+        conditions = report_conditions(spec)
+        summary = [{key: cell(value) for key, value in row.items()}
+                   for row in run_aggregate(db, spec.group_by, spec.metrics, conditions)]
+        total = db.scalar(select(func.count()).select_from(Patient).where(*conditions)) if spec.include_rows else 0
+        progress = Progress(job_id, total)
+        update_job(job_id, progress=0.1)
+
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        path = os.path.join(REPORT_DIR, f"{job.spec_hash}.{spec.format}")
+        staging = f"{path}.{job_id}.tmp"
+        with engine.connect() as connection:
+            WRITERS[spec.format](staging, spec, summary, row_batches(connection, spec, fields, conditions, progress), fields)
+        os.replace(staging, path)
+        update_job(job_id, status="done", progress=1.0, rows=total, artifact=path, finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.exception("Report job %s failed", job_id)
+        update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+    finally:
+        db.close()
+
+
+def expire_jobs(connection):
+    """Fail abandoned jobs and drop rows and artifacts past retention; returns (failed, removed)."""
+    now = datetime.utcnow()
+    failed = connection.execute(
+        ReportJob.__table__.update()
+        .where(
+            ReportJob.status.in_(("queued", "running")),
+            ReportJob.created_at < now - timedelta(seconds=JOB_STALE_AFTER),
+            ReportJob.id.not_in(list(futures)),
+        )
+        .values(status="failed", error="Abandoned: the worker building it stopped", finished_at=now)
+    ).rowcount
+    cutoff = now - timedelta(seconds=JOB_RETENTION)
+    removed = connection.execute(
+        delete(ReportJob).where(ReportJob.created_at < cutoff, ReportJob.status.in_(("done", "failed")))
+    ).rowcount
+    if os.path.isdir(REPORT_DIR):
+        for entry in os.scandir(REPORT_DIR):
+            if entry.is_file() and entry.stat().st_mtime < time.time() - JOB_RETENTION:
+                os.remove(entry.path)
+    return failed, removed
+
+
+def start_jobs():
+    global executor
+    executor = ThreadPoolExecutor(JOB_WORKERS, thread_name_prefix="report-job")
+    with engine.begin() as connection:
+        expire_jobs(connection)
+
+
+def shutdown_jobs():
+    # Cancelling a future runs its done callback, which drops it from `futures`
+    pending = list(futures.items())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for job_id in [job_id for job_id, future in pending if future.cancelled()]:
+        update_job(job_id, status="failed", error="Cancelled: the server shut down", finished_at=datetime.utcnow())
+
+
+def find_reusable_job(db, key):
+    job = db.scalars(
+        select(ReportJob)
+        .where(
+            ReportJob.spec_hash == key,
+            or_(
+                ReportJob.status == "done",
+                ReportJob.status.in_(("queued", "running"))
+                & (
+                    (ReportJob.created_at >= datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER))
+                    | ReportJob.id.in_(list(futures))
+                ),
+            ),
+        )
+        .order_by(desc(ReportJob.created_at))
+        .limit(1)
+    ).first()
+    if job is not None and job.status == "done" and not os.path.exists(job.artifact):
+        return None
+    return job
+
+
+@router.post("/jobs/reports", status_code=202)
+def submit_report(spec: ReportSpec, db: Session = Depends(get_db)):
+    # Reject bad specs now rather than as a failed job
+    required = REQUIRES.get(spec.format)
+    if required and importlib.util.find_spec(required) is None:
+        raise HTTPException(status_code=406, detail=f"{required} is required for {spec.format} reports")
+    select_fields(spec.fields)
+    try:
+        build_aggregate_query(spec.group_by, spec.metrics, report_conditions(spec))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with engine.begin() as connection:
+        expire_jobs(connection)
+    key = spec_hash(spec, tuple(db.execute(version_query).first() or ()))
+    job = find_reusable_job(db, key)
+    if job is not None:
+        return job_response(job, True, 200 if job.status == "done" else 202)
+    job = ReportJob(id=uuid.uuid4().hex, spec_hash=key, spec=spec.model_dump_json(), status="queued", progress=0.0)
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    future = futures[job_id] = executor.submit(build_report, job_id)
+    future.add_done_callback(lambda _: futures.pop(job_id, None))
+    return job_response(job, False, 202)
+
+
+def get_job_or_404(db, job_id):
+    job = db.get(ReportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    return job_status(get_job_or_404(db, job_id))
+
+
+@router.get("/jobs/{job_id}/artifact")
+def get_job_artifact(job_id: str, db: Session = Depends(get_db)):
+    job = get_job_or_404(db, job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not os.path.exists(job.artifact):
+        raise HTTPException(status_code=410, detail="Report artifact is no longer available")
+    fmt = json.loads(job.spec)["format"]
+    return FileResponse(job.artifact, media_type=MEDIA_TYPES[fmt], filename=f"report-{job.id[:8]}.{fmt}")
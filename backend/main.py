@@ -1,48 +1,194 @@
-from fastapi import FastAPI
-from .database import engine, SessionLocal
-from .models import Base, Patient
-import random
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from .database import engine, get_db, SessionLocal
+from .config import (
+    ADMISSION_ENABLED, ADMISSION_LIMITS, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER, COMPRESSION_ALGORITHMS,
+    COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, DB_ASYNC, GZIP_LEVEL, METRICS_ENABLED, PAGE_SIZE_MAX, SEED_DEMO_DATA,
+    SEED_ROWS, SERVER_TIMING_ENABLED, STREAM_BATCH_SIZE, ZSTD_LEVEL,
+)
+from .summary import read_kpis
+from .filters import patient_filters
+from .aggregate import run_aggregate, run_histogram
+from . import columnar
+from .startup import init_database
+from .formats import PARQUET, FastJSONResponse, encode_stream
+from .compression import CompressionMiddleware
+from .admission import AdmissionMiddleware
+from .cache import cached_response, router as cache_router
+from .metrics import MetricsMiddleware, router as metrics_router
+from .profiling import ServerTimingMiddleware, phase
+from .ingest import router as ingest_router
+from .events import EVENT_STREAM, router as events_router
+from .changelog import router as changes_router
+from .jobs import router as jobs_router, shutdown_jobs, start_jobs
+from .schemas import AggregateRow, Histogram, Kpis, PatientRecord
+from .versioning import current_etag, not_modified, tag_response
+from .queries import (
+    PATIENT_COLUMN_NAMES, add_next_page_links, page_fields, patient_rows, resolve_format, row_dicts, select_fields,
+    streaming_response,
+)
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app):
+    init_database(engine, seed_rows=SEED_ROWS if SEED_DEMO_DATA else 0)
+    start_jobs()
+    yield
+    shutdown_jobs()
+    if DB_ASYNC:
+        from .async_database import async_engine
+        await async_engine.dispose()
 
-app = FastAPI(title="MedIntel X API")
+app = FastAPI(title="MedIntel X API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
-def seed_data():
-    db = SessionLocal()
-    if db.query(Patient).count() == 0:
-        departments = ["Cardiology","Neurology","Orthopedics","Oncology"]
-        genders = ["Male","Female"]
-        outcomes = ["Recovered","Deceased"]
-        for i in range(500):
-            patient = Patient(
-                department=random.choice(departments),
-                gender=random.choice(genders),
-                age=random.randint(20,80),
-                treatment_cost=random.randint(10000,100000),
-                readmission=random.choice(["Yes","No"]),
-                outcome=random.choice(outcomes)
-            )
-            db.add(patient)
-        db.commit()
-    db.close()
-
-seed_data()
-
-@app.get("/patients")
-def get_patients():
-    db = SessionLocal()
-    data = db.query(Patient).all()
-    return data
+if COMPRESSION_ENABLED:
+    # Parquet pages are already snappy-compressed; SSE events are too small to gain
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        algorithms=COMPRESSION_ALGORITHMS,
+        gzip_level=GZIP_LEVEL,
+        zstd_level=ZSTD_LEVEL,
+        exclude_media_types=(PARQUET, EVENT_STREAM),
+    )
+
+if ADMISSION_ENABLED:
+    # Added after compression so it is outside it: shed requests never reach the rest of the stack
+    app.add_middleware(
+        AdmissionMiddleware,
+        limits=ADMISSION_LIMITS,
+        timeout=ADMISSION_QUEUE_TIMEOUT,
+        retry_after=ADMISSION_RETRY_AFTER,
+    )
+
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+if METRICS_ENABLED:
+    # Outermost, so 503s and time queued for admission are counted too
+    app.add_middleware(MetricsMiddleware)
 
-@app.get("/kpis")
-def get_kpis():
+router = APIRouter()
+
+def iter_patient_batches(after, limit=None, fields=PATIENT_COLUMN_NAMES, conditions=()):
     db = SessionLocal()
-    data = db.query(Patient).all()
-    total = len(data)
-    revenue = sum(p.treatment_cost for p in data)
-    readmission_rate = sum(1 for p in data if p.readmission=="Yes") / total * 100
-    return {
-        "total_patients": total,
-        "total_revenue": revenue,
-        "readmission_rate": readmission_rate
-    }
+    try:
+        stmt = patient_rows(after, limit, fields, conditions).execution_options(yield_per=STREAM_BATCH_SIZE)
+        yield from db.execute(stmt).partitions()
+    finally:
+        db.close()
+
+@router.get("/patients", response_model=List[PatientRecord])
+def get_patients(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    after: int = Query(0, ge=0),
+    stream: bool = False,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|arrow|parquet)$"),
+    fields: Optional[List[str]] = Query(None),
+    conditions: list = Depends(patient_filters),
+    db: Session = Depends(get_db),
+):
+    fmt = resolve_format(request, stream, format)
+    fields = select_fields(fields)
+    etag = current_etag(db, fmt)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    if fmt != "json" or limit is None:
+        batches = iter_patient_batches(after, limit, fields, conditions)
+        return tag_response(streaming_response(fmt, encode_stream, batches, fields), etag)
+
+    def build():
+        columns = page_fields(fields, limit)
+        with phase("hydrate"):
+            rows = db.execute(patient_rows(after, limit, columns, conditions)).all()
+            content = row_dicts(rows, fields, columns)
+        # Returned directly so FastAPI skips jsonable_encoder over every row
+        response = FastJSONResponse(content)
+        add_next_page_links(request, response, rows, limit)
+        return response
+
+    return cached_response(request, etag, build)
+
+@router.get("/kpis", response_model=Kpis)
+def get_kpis(request: Request, db: Session = Depends(get_db)):
+    etag = current_etag(db, "json")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    def build():
+        with phase("hydrate"):
+            result = columnar.answer(columnar.kpis)
+            if result is None:
+                result = read_kpis(db)
+        return FastJSONResponse(result)
+
+    return cached_response(request, etag, build)
+
+@router.get("/aggregate", response_model=List[AggregateRow])
+def get_aggregate(
+    request: Request,
+    group_by: List[str] = Query([]),
+    metrics: List[str] = Query(["count"]),
+    conditions: list = Depends(patient_filters),
+    db: Session = Depends(get_db),
+):
+    etag = current_etag(db, "json")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    def build():
+        try:
+            with phase("hydrate"):
+                result = columnar.answer(columnar.aggregate, group_by, metrics, conditions)
+                if result is None:
+                    result = run_aggregate(db, group_by, metrics, conditions)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(result)
+
+    return cached_response(request, etag, build)
+
+@router.get("/histogram", response_model=Histogram)
+def get_histogram(
+    request: Request,
+    column: str = Query(..., pattern="^(age|treatment_cost)$"),
+    bins: int = Query(20, ge=1, le=1000),
+    range_min: Optional[float] = None,
+    range_max: Optional[float] = None,
+    conditions: list = Depends(patient_filters),
+    db: Session = Depends(get_db),
+):
+    etag = current_etag(db, "json")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    def build():
+        try:
+            with phase("hydrate"):
+                result = columnar.answer(columnar.histogram, column, bins, conditions, range_min, range_max)
+                if result is None:
+                    result = run_histogram(db, column, bins, conditions, range_min, range_max)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(result)
+
+    return cached_response(request, etag, build)
+
+if DB_ASYNC:
+    from .async_api import router as async_router
+    app.include_router(async_router)
+else:
+    app.include_router(router)
+app.include_router(ingest_router)
+app.include_router(events_router)
+app.include_router(changes_router)
+app.include_router(jobs_router)
+app.include_router(cache_router)
+if METRICS_ENABLED:
+    app.include_router(metrics_router)
@@ -0,0 +1,264 @@
+"""
+Prometheus text-format metrics behind GET /metrics.
+
+Counters and histogram buckets are kept in per-thread shards: the hot path
+increments its own thread's dict without a lock, and a scrape sums the shards.
+Series are labelled with the route template (`/jobs/{job_id}`, not the raw path)
+so cardinality stays bounded.
+
+  medintel_http_requests_total               route, method, status
+  medintel_http_request_duration_seconds     route (histogram, includes admission wait)
+  medintel_http_requests_in_flight
+  medintel_http_response_bytes_total         route (bytes sent, after compression)
+  medintel_serialized_bytes_total            route (JSON / NDJSON / Arrow / Parquet encoding)
+  medintel_rows_total                        route (patient rows encoded into responses)
+  medintel_db_query_duration_seconds         route (histogram, SQLAlchemy and DuckDB statements)
+
+Other modules add point-in-time samples (query cache, admission queues) through
+`register_collector`.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from fastapi import APIRouter, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from .config import METRICS_ENABLED, SERVER_TIMING_ENABLED
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+METRICS = {
+    "medintel_http_requests_total": ("counter", "HTTP requests by route, method and status", None),
+    "medintel_http_request_duration_seconds": ("histogram", "HTTP request latency in seconds", LATENCY_BUCKETS),
+    "medintel_http_requests_started_total": ("counter", "HTTP requests started", None),
+    "medintel_http_response_bytes_total": ("counter", "Response body bytes sent", None),
+    "medintel_serialized_bytes_total": ("counter", "Bytes produced by the response encoders", None),
+    "medintel_rows_total": ("counter", "Patient rows encoded into responses", None),
+    "medintel_db_query_duration_seconds": ("histogram", "Database statement time in seconds", QUERY_BUCKETS),
+}
+
+router = APIRouter()
+
+local = threading.local()
+shards = []
+shards_lock = threading.Lock()
+collectors = []
+route_paths = {}
+
+current_request = ContextVar("medintel_request", default=None)
+
+
+def shard():
+    values = getattr(local, "values", None)
+    if values is None:
+        values = local.values = {}
+        with shards_lock:
+            shards.append(values)
+    return values
+
+
+def inc(name, labels=(), amount=1):
+    values = shard()
+    key = (name, labels)
+    values[key] = values.get(key, 0) + amount
+
+
+def observe(name, labels, value):
+    values = shard()
+    key = (name, labels)
+    series = values.get(key)
+    if series is None:
+        # One slot per bucket plus +Inf, then the running sum
+        series = values[key] = [0] * (len(METRICS[name][2]) + 2)
+    series[bisect_left(METRICS[name][2], value)] += 1
+    series[-1] += value
+
+
+def register_collector(collect):
+    """Add a callable returning [(name, type, help, [(labels, value), ...]), ...] at scrape time."""
+    collectors.append(collect)
+
+
+def route_label(scope):
+    app = scope.get("app")
+    endpoint = scope.get("endpoint")
+    if app is None:
+        return "unmatched"
+    if endpoint is not None:
+        paths = route_paths.get(id(app))
+        if paths is None:
+            paths = route_paths[id(app)] = {
+                route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")
+            }
+        if endpoint in paths:
+            return paths[endpoint]
+    # Not routed (yet): admission rejections and 404s
+    for route in app.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetrics:
+    """Per-request state, reachable from anywhere in the request through `current_request`."""
+
+    __slots__ = ("scope", "route", "db_seconds", "db_queries", "timings")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.route = None
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.timings = {}
+
+    def labels(self):
+        if self.route is None:
+            route = route_label(self.scope)
+            # Only remember the label once routing has happened
+            if "endpoint" not in self.scope:
+                return (("route", route),)
+            self.route = route
+        return (("route", self.route),)
+
+
+def request_labels():
+    request = current_request.get()
+    return request.labels() if request is not None else (("route", "background"),)
+
+
+def record_query(seconds):
+    request = current_request.get()
+    if request is not None:
+        request.db_seconds += seconds
+        request.db_queries += 1
+    observe("medintel_db_query_duration_seconds", request_labels(), seconds)
+
+
+def count_rows(rows):
+    inc("medintel_rows_total", request_labels(), rows)
+
+
+def count_serialized(size, seconds=0.0):
+    request = current_request.get()
+    if request is not None and seconds:
+        request.timings["serialize"] = request.timings.get("serialize", 0.0) + seconds
+    inc("medintel_serialized_bytes_total", request_labels(), size)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("medintel_query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record_query(time.perf_counter() - conn.info["medintel_query_started"].pop())
+
+
+# Statement time also feeds the Server-Timing header (backend.profiling)
+if METRICS_ENABLED or SERVER_TIMING_ENABLED:
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestMetrics(scope)
+        token = current_request.set(request)
+        status = 500
+        sent = 0
+
+        async def send_counted(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        inc("medintel_http_requests_started_total")
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            elapsed = time.perf_counter() - started
+            labels = request.labels()
+            inc("medintel_http_requests_total", labels + (("method", scope["method"]), ("status", str(status))))
+            observe("medintel_http_request_duration_seconds", labels, elapsed)
+            inc("medintel_http_response_bytes_total", labels, sent)
+            current_request.reset(token)
+
+
+def merged():
+    totals = {}
+    with shards_lock:
+        snapshot = [list(values.items()) for values in shards]
+    for items in snapshot:
+        for key, value in items:
+            if isinstance(value, list):
+                total = totals.get(key)
+                totals[key] = list(value) if total is None else [a + b for a, b in zip(total, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}" if labels else ""
+
+
+def render():
+    totals = merged()
+    started = sum(value for (name, _), value in totals.items() if name == "medintel_http_requests_started_total")
+    finished = sum(
+        series[-2] + sum(series[:-2])
+        for (name, _), series in totals.items()
+        if name == "medintel_http_request_duration_seconds"
+    )
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if name == "medintel_http_requests_started_total":
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for (series_name, labels), value in sorted(totals.items(), key=lambda item: item[0][1]):
+            if series_name != name:
+                continue
+            if kind == "counter":
+                lines.append(f"{name}{format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+    lines += [
+        "# HELP medintel_http_requests_in_flight HTTP requests being served",
+        "# TYPE medintel_http_requests_in_flight gauge",
+        f"medintel_http_requests_in_flight {started - finished}",
+    ]
+    for collect in collectors:
+        for name, kind, help_text, samples in collect():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{format_labels(labels)} {value}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(render(), media_type=CONTENT_TYPE)
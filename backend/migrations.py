@@ -0,0 +1,115 @@
+"""
+Versioned, in-place schema migrations for existing databases.
+
+`Base.metadata.create_all` only creates missing tables, so anything added to an
+existing table (indexes, columns) is applied here. Each migration runs once and is
+recorded in `schema_migrations`. Run manually with:
+
+    python -m backend.migrations [--list]
+"""
+import argparse
+from sqlalchemy import inspect, select
+from .models import Patient, PatientRollup, SchemaMigration
+from . import changelog, rollup, summary, versioning  # noqa: F401  (register their triggers on create_all)
+
+
+def create_indexes(*names):
+    def migrate(connection):
+        indexes = {index.name: index for index in Patient.__table__.indexes}
+        for name in names:
+            indexes[name].create(connection, checkfirst=True)
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql("ANALYZE patients")
+    return migrate
+
+
+def add_column(name, table=Patient.__table__):
+    def migrate(connection):
+        existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        if name not in existing:
+            column = table.c[name]
+            column_type = column.type.compile(connection.dialect)
+            default = "" if column.nullable else f" NOT NULL DEFAULT {column.default.arg}"
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}{default}")
+    return migrate
+
+
+def reinstall_rollup(connection):
+    """Recreate the rollup triggers from the current definitions and rebuild every cell."""
+    if connection.dialect.name == "sqlite":
+        for trigger in rollup.ROLLUP_TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        rollup.install_rollup(PatientRollup.metadata, connection)
+
+
+def add_rollup_columns(*names):
+    def migrate(connection):
+        for name in names:
+            add_column(name, PatientRollup.__table__)(connection)
+        # Triggers created before the columns existed leave them at zero
+        reinstall_rollup(connection)
+    return migrate
+
+
+MIGRATIONS = [
+    (
+        1,
+        "Secondary and covering indexes on patients",
+        create_indexes(
+            "ix_patients_department_outcome",
+            "ix_patients_department_cost",
+            "ix_patients_department_gender_cost",
+            "ix_patients_age_cost",
+            "ix_patients_outcome_readmission",
+        ),
+    ),
+    (2, "Admission date on patients", add_column("admission_date")),
+    (3, "Age count and sum in the patient rollup", add_rollup_columns("age_count", "age_sum")),
+    (4, "No rollup age band for NULL ages or ages outside (0, 100]", reinstall_rollup),
+]
+
+
+def applied_versions(connection):
+    SchemaMigration.__table__.create(connection, checkfirst=True)
+    return set(connection.scalars(select(SchemaMigration.version)))
+
+
+def run_migrations(connection):
+    applied = applied_versions(connection)
+    ran = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(connection)
+        connection.execute(
+            SchemaMigration.__table__.insert().values(version=version, description=description)
+        )
+        ran.append((version, description))
+    return ran
+
+
+def main():
+    from .database import engine
+    from .startup import init_database
+
+    parser = argparse.ArgumentParser(description="Apply pending MedIntel X schema migrations")
+    parser.add_argument("--list", action="store_true", help="show migration status and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        with engine.begin() as connection:
+            applied = applied_versions(connection)
+        for version, description, _ in MIGRATIONS:
+            status = "applied" if version in applied else "pending"
+            print(f"{version:>4}  {status:<8} {description}")
+        return
+
+    ran, _ = init_database(engine)
+    for version, description in ran:
+        print(f"Applied {version}: {description}")
+    if not ran:
+        print("Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, String, Text, func
 from .database import Base
 
 class Patient(Base):
@@ -11,3 +11,83 @@ class Patient(Base):
     treatment_cost = Column(Float)
     readmission = Column(String)
     outcome = Column(String)
+    admission_date = Column(Date)
+
+    # Matched to the dashboard access patterns; existing databases get them via backend.migrations
+    __table_args__ = (
+        Index("ix_patients_department_outcome", "department", "outcome"),
+        Index("ix_patients_department_cost", "department", "treatment_cost"),
+        Index("ix_patients_department_gender_cost", "department", "gender", "treatment_cost"),
+        Index("ix_patients_age_cost", "age", "treatment_cost"),
+        Index("ix_patients_outcome_readmission", "outcome", "readmission"),
+    )
+
+class KpiSummary(Base):
+    __tablename__ = "kpi_summary"
+
+    id = Column(Integer, primary_key=True)
+    total_patients = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Float, nullable=False, default=0)
+    readmissions = Column(Integer, nullable=False, default=0)
+
+class PatientRollup(Base):
+    __tablename__ = "patient_rollup"
+
+    # NULL dimension values are stored as '' so every cell has a usable primary key
+    department = Column(String, primary_key=True)
+    outcome = Column(String, primary_key=True)
+    gender = Column(String, primary_key=True)
+    age_band = Column(String, primary_key=True)
+    patients = Column(Integer, nullable=False, default=0)
+    cost_count = Column(Integer, nullable=False, default=0)
+    cost_sum = Column(Float, nullable=False, default=0)
+    cost_sumsq = Column(Float, nullable=False, default=0)
+    cost_min = Column(Float)
+    cost_max = Column(Float)
+    readmissions = Column(Integer, nullable=False, default=0)
+    age_count = Column(Integer, nullable=False, default=0)
+    age_sum = Column(Integer, nullable=False, default=0)
+
+class PatientChange(Base):
+    __tablename__ = "patient_changes"
+    # AUTOINCREMENT so compaction never lets a sequence number be handed out twice
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+
+    id = Column(String, primary_key=True)
+    spec_hash = Column(String, nullable=False, index=True)
+    spec = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0)
+    rows = Column(Integer)
+    error = Column(String)
+    artifact = Column(String)
+    created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+    finished_at = Column(DateTime)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class AppMeta(Base):
+    __tablename__ = "app_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    epoch = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=0)
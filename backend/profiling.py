@@ -0,0 +1,143 @@
+"""
+Per-request timing breakdown and the slow-statement log.
+
+Every response gets a Server-Timing header, which browser dev tools show under the
+request's Timing tab:
+
+  sql        statement execution as seen by SQLAlchemy's cursor events
+  hydrate    fetching result rows and building Python objects from them (with
+             SQLite, stepping through the rows after the first happens here)
+  serialize  rendering the body to JSON
+  app        everything until the headers were sent
+
+Streamed bodies are encoded after the headers are sent, so their encoding time
+only reaches /metrics.
+
+Statements slower than MEDINTEL_SLOW_QUERY_MS are written, with their
+EXPLAIN QUERY PLAN, as JSON lines to a size-rotated log.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+from .config import (
+    DB_ASYNC, SLOW_QUERY_LOG, SLOW_QUERY_LOG_BACKUPS, SLOW_QUERY_LOG_BYTES, SLOW_QUERY_MS,
+)
+from .database import engine
+from .metrics import RequestMetrics, current_request, request_labels
+
+PARAMETERS_LOGGED = 20  # bound logged parameter lists; bulk inserts are not logged with theirs
+
+slow_log = logging.getLogger("medintel.slow_query")
+slow_log.propagate = False
+
+
+@contextmanager
+def phase(name):
+    """Add the wall time of the block, minus statement time inside it, to the request's `name` timing."""
+    request = current_request.get()
+    if request is None:
+        yield
+        return
+    started = time.perf_counter()
+    sql_before = request.db_seconds
+    try:
+        yield
+    finally:
+        spent = time.perf_counter() - started - (request.db_seconds - sql_before)
+        request.timings[name] = request.timings.get(name, 0.0) + spent
+
+
+def server_timing(request, elapsed):
+    timings = request.timings
+    statements = "statement" if request.db_queries == 1 else "statements"
+    parts = [f'sql;dur={request.db_seconds * 1000:.1f};desc="{request.db_queries} {statements}"']
+    parts += [f"{name};dur={timings[name] * 1000:.1f}" for name in ("hydrate", "serialize") if name in timings]
+    parts.append(f"app;dur={elapsed * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = current_request.get()
+        token = None
+        if request is None:
+            # The metrics middleware normally sets it up
+            request = RequestMetrics(scope)
+            token = current_request.set(request)
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(request, time.perf_counter() - started)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if token is not None:
+                current_request.reset(token)
+
+
+def query_plan(conn, statement, parameters):
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"unavailable: {e}"]
+    finally:
+        cursor.close()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("medintel_slow_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["medintel_slow_started"].pop()
+    if elapsed * 1000 < SLOW_QUERY_MS:
+        return
+    entry = {
+        "ms": round(elapsed * 1000, 1),
+        "route": request_labels()[0][1],
+        "statement": statement,
+    }
+    if executemany:
+        entry["rows"] = len(parameters)
+    else:
+        values = parameters.values() if isinstance(parameters, dict) else parameters
+        entry["parameters"] = [str(value) for value in islice(values, PARAMETERS_LOGGED)]
+        if conn.dialect.name == "sqlite":
+            entry["plan"] = query_plan(conn, statement, parameters)
+    slow_log.warning(json.dumps(entry))
+
+
+def install_slow_log(target):
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    event.listen(target, "after_cursor_execute", after_cursor_execute)
+
+
+if SLOW_QUERY_MS > 0:
+    os.makedirs(os.path.dirname(os.path.abspath(SLOW_QUERY_LOG)), exist_ok=True)
+    handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_log.addHandler(handler)
+    install_slow_log(engine)
+    if DB_ASYNC:
+        from .async_database import async_engine
+
+        install_slow_log(async_engine.sync_engine)
@@ -0,0 +1,65 @@
+"""
+Statements and response helpers shared by the sync and async /patients handlers.
+"""
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from .formats import MEDIA_TYPES, make_encoder, negotiate_format
+from .metrics import count_rows
+from .models import Patient
+
+patient_columns = Patient.__table__.c
+PATIENT_COLUMN_NAMES = [column.name for column in patient_columns]
+
+
+def select_fields(fields):
+    """Column names for `fields=` (repeated or comma-separated); every column when omitted."""
+    if not fields:
+        return PATIENT_COLUMN_NAMES
+    names = [name.strip() for value in fields for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in patient_columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Choose from {', '.join(PATIENT_COLUMN_NAMES)}",
+        )
+    return list(dict.fromkeys(names))
+
+
+def page_fields(fields, limit):
+    # Paged reads need the id of the last row for the next-page cursor
+    return fields if limit is None or "id" in fields else ["id", *fields]
+
+
+def patient_rows(after, limit=None, fields=PATIENT_COLUMN_NAMES, conditions=()):
+    columns = [patient_columns[name] for name in fields]
+    return select(*columns).where(Patient.id > after, *conditions).order_by(Patient.id).limit(limit)
+
+
+def row_dicts(rows, fields, columns=None):
+    """Plain dicts of `fields` from row tuples selected as `columns` (default: `fields`)."""
+    count_rows(len(rows))
+    if columns is None or columns == fields:
+        return [dict(zip(fields, row)) for row in rows]
+    positions = [columns.index(name) for name in fields]
+    return [{name: row[position] for name, position in zip(fields, positions)} for row in rows]
+
+
+def resolve_format(request, stream, requested):
+    return "ndjson" if stream else negotiate_format(request.headers.get("accept"), requested)
+
+
+def streaming_response(fmt, stream_body, batches, fields=PATIENT_COLUMN_NAMES):
+    encoder = make_encoder(fmt, fields)
+    if encoder is None:
+        raise HTTPException(status_code=406, detail="pyarrow is required for Arrow and Parquet responses")
+    media_type = MEDIA_TYPES.get(fmt, "application/json")
+    return StreamingResponse(stream_body(encoder, batches), media_type=media_type)
+
+
+def add_next_page_links(request, response, rows, limit):
+    if limit is not None and len(rows) == limit:
+        next_after = rows[-1].id
+        next_url = request.url.include_query_params(after=next_after, limit=limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+        response.headers["X-Next-After"] = str(next_after)
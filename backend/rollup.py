@@ -0,0 +1,168 @@
+"""
+Patient rollup by (department, outcome, gender, age_band) kept current by SQLite triggers.
+
+Each cell holds count, cost sum / sum of squares / min / max, readmissions and age
+count / sum, so /aggregate over those dimensions reads a few hundred cells instead of
+every patient.
+Deleting or moving a row that held a cell's min or max re-reads that one cell. Rebuild
+from scratch (e.g. after bulk edits with triggers disabled) with:
+
+    python -m backend.rollup --rebuild
+"""
+import argparse
+from sqlalchemy import event, func, select, text
+from .database import Base
+from .config import ROLLUP_ENABLED
+from .aggregate import AGE_BAND_OVERFLOW, AGE_BAND_RANGE, AGE_BANDS, age_band, readmitted
+from .models import Patient, PatientRollup
+
+CELL_COLUMNS = ["department", "outcome", "gender"]
+READMITTED = "CASE WHEN {row}.readmission = 'Yes' THEN 1 ELSE 0 END"
+
+
+def band_sql(row):
+    low, high = AGE_BAND_RANGE
+    bands = " ".join(f"WHEN {row}.age <= {upper} THEN '{label}'" for upper, label in AGE_BANDS)
+    return (
+        f"CASE WHEN {row}.age IS NULL OR {row}.age <= {low} OR {row}.age > {high} THEN NULL"
+        f" {bands} ELSE '{AGE_BAND_OVERFLOW}' END"
+    )
+
+
+def cell_key(row):
+    return [f"COALESCE({row}.{column}, '')" for column in CELL_COLUMNS] + [f"COALESCE({band_sql(row)}, '')"]
+
+
+def cell_match(row):
+    columns = CELL_COLUMNS + ["age_band"]
+    return " AND ".join(f"{column} = {value}" for column, value in zip(columns, cell_key(row)))
+
+
+def cell_extreme(fn, row):
+    # IS (not =) so NULL dimensions match and the department/gender indexes stay usable
+    match = " AND ".join(f"p.{column} IS {row}.{column}" for column in CELL_COLUMNS)
+    return f"(SELECT {fn}(p.treatment_cost) FROM patients AS p WHERE {match} AND {band_sql('p')} IS {band_sql(row)})"
+
+
+def add_row(row):
+    cost, age = f"{row}.treatment_cost", f"{row}.age"
+    return f"""
+        INSERT INTO patient_rollup (
+            department, outcome, gender, age_band,
+            patients, cost_count, cost_sum, cost_sumsq, cost_min, cost_max, readmissions, age_count, age_sum
+        ) VALUES (
+            {", ".join(cell_key(row))},
+            1, {cost} IS NOT NULL, COALESCE({cost}, 0), COALESCE({cost} * {cost}, 0), {cost}, {cost},
+            {READMITTED.format(row=row)}, {age} IS NOT NULL, COALESCE({age}, 0)
+        )
+        ON CONFLICT (department, outcome, gender, age_band) DO UPDATE SET
+            patients = patients + 1,
+            cost_count = cost_count + excluded.cost_count,
+            cost_sum = cost_sum + excluded.cost_sum,
+            cost_sumsq = cost_sumsq + excluded.cost_sumsq,
+            cost_min = MIN(COALESCE(cost_min, excluded.cost_min), COALESCE(excluded.cost_min, cost_min)),
+            cost_max = MAX(COALESCE(cost_max, excluded.cost_max), COALESCE(excluded.cost_max, cost_max)),
+            readmissions = readmissions + excluded.readmissions,
+            age_count = age_count + excluded.age_count,
+            age_sum = age_sum + excluded.age_sum;
+    """
+
+
+def remove_row(row):
+    cost, age = f"{row}.treatment_cost", f"{row}.age"
+    return f"""
+        UPDATE patient_rollup SET
+            patients = patients - 1,
+            cost_count = cost_count - ({cost} IS NOT NULL),
+            cost_sum = cost_sum - COALESCE({cost}, 0),
+            cost_sumsq = cost_sumsq - COALESCE({cost} * {cost}, 0),
+            cost_min = CASE WHEN {cost} <= cost_min THEN {cell_extreme("MIN", row)} ELSE cost_min END,
+            cost_max = CASE WHEN {cost} >= cost_max THEN {cell_extreme("MAX", row)} ELSE cost_max END,
+            readmissions = readmissions - {READMITTED.format(row=row)},
+            age_count = age_count - ({age} IS NOT NULL),
+            age_sum = age_sum - COALESCE({age}, 0)
+        WHERE {cell_match(row)};
+        DELETE FROM patient_rollup WHERE {cell_match(row)} AND patients <= 0;
+    """
+
+
+ROLLUP_TRIGGERS = {
+    "patient_rollup_after_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS patient_rollup_after_insert AFTER INSERT ON patients
+        BEGIN {add_row("NEW")} END
+    """,
+    "patient_rollup_after_update": f"""
+        CREATE TRIGGER IF NOT EXISTS patient_rollup_after_update
+        AFTER UPDATE OF department, outcome, gender, age, treatment_cost, readmission ON patients
+        BEGIN {remove_row("OLD")} {add_row("NEW")} END
+    """,
+    "patient_rollup_after_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS patient_rollup_after_delete AFTER DELETE ON patients
+        BEGIN {remove_row("OLD")} END
+    """,
+}
+
+
+def rollup_cells():
+    cost, age = Patient.treatment_cost, Patient.age
+    cell = [func.coalesce(getattr(Patient, column), "") for column in CELL_COLUMNS] + [func.coalesce(age_band, "")]
+    return select(
+        *cell,
+        func.count(),
+        func.count(cost),
+        func.coalesce(func.sum(cost), 0),
+        func.coalesce(func.sum(cost * cost), 0),
+        func.min(cost),
+        func.max(cost),
+        func.sum(readmitted),
+        func.count(age),
+        func.coalesce(func.sum(age), 0),
+    ).group_by(*cell)
+
+
+def rebuild_rollup(connection):
+    table = PatientRollup.__table__
+    connection.execute(table.delete())
+    connection.execute(table.insert().from_select([column.name for column in table.columns], rollup_cells()))
+
+
+def install_rollup(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    if not ROLLUP_ENABLED:
+        for name in ROLLUP_TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(PatientRollup.__table__.delete())
+        return
+    installed = connection.execute(
+        text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'patient_rollup_%'")
+    ).scalar()
+    if installed < len(ROLLUP_TRIGGERS):
+        for ddl in ROLLUP_TRIGGERS.values():
+            connection.execute(text(ddl))
+        rebuild_rollup(connection)
+
+
+event.listen(Base.metadata, "after_create", install_rollup)
+
+
+def main():
+    from .database import engine
+    from .startup import init_database
+
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the patient rollup table")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every cell from the patients table")
+    args = parser.parse_args()
+
+    init_database(engine)
+    with engine.begin() as connection:
+        if args.rebuild:
+            rebuild_rollup(connection)
+        cells, patients = connection.execute(
+            select(func.count(), func.coalesce(func.sum(PatientRollup.patients), 0))
+        ).one()
+    print(f"{cells} rollup cells covering {patients} patients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Response schemas for the OpenAPI docs.
+
+The read handlers return prebuilt JSON (a FastJSONResponse, a streamed array, or
+cached bytes from backend.cache), so these models document the responses rather
+than validate them. Every patient field is optional because `fields=` projects
+columns away.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class PatientRecord(BaseModel):
+    id: Optional[int] = None
+    department: Optional[str] = None
+    gender: Optional[str] = None
+    age: Optional[int] = None
+    treatment_cost: Optional[float] = None
+    readmission: Optional[str] = None
+    outcome: Optional[str] = None
+    admission_date: Optional[date] = None
+
+
+class Kpis(BaseModel):
+    total_patients: int
+    total_revenue: float
+    readmission_rate: float
+
+
+# One object per group: the group_by dimensions plus a `<fn>_<measure>` key per metric
+AggregateRow = Dict[str, Any]
+
+
+class Histogram(BaseModel):
+    column: str
+    edges: List[float]
+    counts: List[int]
+
+
+class PatientChanges(BaseModel):
+    since: int
+    seq: int
+    snapshot: bool
+    has_more: bool
+    after: Optional[int] = None
+    upserts: List[PatientRecord]
+    deletes: List[int]
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    progress: float
+    rows: Optional[int] = None
+    error: Optional[str] = None
+    format: str
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    artifact_url: Optional[str] = None
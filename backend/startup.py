@@ -0,0 +1,71 @@
+"""
+One-time database initialization, run from the API lifespan hook and the CLIs.
+
+Every step happens in a single transaction that first claims a lock row in
+`app_meta`, so concurrent uvicorn workers serialize instead of racing on DDL,
+migrations or seeding. Once initialized, each step is an O(1) no-op.
+"""
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.schema import CreateTable
+
+from .config import STARTUP_LOCK_TIMEOUT
+from .database import Base
+from .generate import generate_patients
+from .migrations import run_migrations
+from .models import AppMeta, Patient
+
+STARTUP_LOCK = "startup_lock"
+SEEDED = "seeded_at"
+
+
+def get_meta(connection, key):
+    return connection.scalar(select(AppMeta.value).where(AppMeta.key == key))
+
+
+def set_meta(connection, key, value):
+    connection.execute(delete(AppMeta).where(AppMeta.key == key))
+    connection.execute(AppMeta.__table__.insert().values(key=key, value=str(value)))
+
+
+def seed_once(connection, rows):
+    if get_meta(connection, SEEDED) is not None:
+        return 0
+    # Databases created before the marker existed may already hold data
+    if connection.scalar(select(Patient.id).limit(1)) is None:
+        generate_patients(connection, rows)
+    else:
+        rows = 0
+    set_meta(connection, SEEDED, datetime.utcnow().isoformat())
+    return rows
+
+
+def initialize(connection, seed_rows):
+    connection.execute(CreateTable(AppMeta.__table__, if_not_exists=True))
+    set_meta(connection, STARTUP_LOCK, f"pid {os.getpid()} at {datetime.utcnow().isoformat()}")
+    Base.metadata.create_all(bind=connection)
+    ran = run_migrations(connection)
+    seeded = seed_once(connection, seed_rows) if seed_rows else 0
+    return ran, seeded
+
+
+def init_database(engine, seed_rows=0):
+    deadline = time.monotonic() + STARTUP_LOCK_TIMEOUT
+    while True:
+        try:
+            with engine.begin() as connection:
+                return initialize(connection, seed_rows)
+        except (OperationalError, IntegrityError) as e:
+            # Another worker holds the startup lock; wait for it to commit
+            if time.monotonic() > deadline or not is_lock_conflict(e):
+                raise
+            time.sleep(0.25)
+
+
+def is_lock_conflict(error):
+    message = str(error.orig).lower()
+    return isinstance(error, IntegrityError) or "locked" in message or "already exists" in message
@@ -0,0 +1,100 @@
+"""
+KPI summary table kept current by SQLite triggers, so /kpis is a single-row read.
+"""
+from sqlalchemy import case, event, func, select, text
+from .database import Base
+from .config import KPI_SUMMARY_ENABLED
+from .models import KpiSummary, Patient
+
+READMITTED = "CASE WHEN {row}.readmission = 'Yes' THEN 1 ELSE 0 END"
+COST = "COALESCE({row}.treatment_cost, 0)"
+
+KPI_SUMMARY_TRIGGERS = {
+    "kpi_summary_after_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS kpi_summary_after_insert AFTER INSERT ON patients
+        BEGIN
+            UPDATE kpi_summary SET
+                total_patients = total_patients + 1,
+                total_revenue = total_revenue + {COST.format(row="NEW")},
+                readmissions = readmissions + {READMITTED.format(row="NEW")}
+            WHERE id = 1;
+        END
+    """,
+    "kpi_summary_after_update": f"""
+        CREATE TRIGGER IF NOT EXISTS kpi_summary_after_update
+        AFTER UPDATE OF treatment_cost, readmission ON patients
+        BEGIN
+            UPDATE kpi_summary SET
+                total_revenue = total_revenue + {COST.format(row="NEW")} - {COST.format(row="OLD")},
+                readmissions = readmissions + {READMITTED.format(row="NEW")} - {READMITTED.format(row="OLD")}
+            WHERE id = 1;
+        END
+    """,
+    "kpi_summary_after_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS kpi_summary_after_delete AFTER DELETE ON patients
+        BEGIN
+            UPDATE kpi_summary SET
+                total_patients = total_patients - 1,
+                total_revenue = total_revenue - {COST.format(row="OLD")},
+                readmissions = readmissions - {READMITTED.format(row="OLD")}
+            WHERE id = 1;
+        END
+    """,
+}
+
+
+def kpi_aggregates():
+    return select(
+        func.count(Patient.id),
+        func.coalesce(func.sum(Patient.treatment_cost), 0),
+        func.coalesce(func.sum(case((Patient.readmission == "Yes", 1), else_=0)), 0),
+    )
+
+
+def rebuild_kpi_summary(connection):
+    total, revenue, readmissions = connection.execute(kpi_aggregates()).one()
+    connection.execute(KpiSummary.__table__.delete())
+    connection.execute(
+        KpiSummary.__table__.insert().values(
+            id=1, total_patients=total, total_revenue=revenue, readmissions=readmissions
+        )
+    )
+
+
+def install_kpi_summary(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    if not KPI_SUMMARY_ENABLED:
+        for name in KPI_SUMMARY_TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(KpiSummary.__table__.delete())
+        return
+    if connection.execute(select(KpiSummary.id).where(KpiSummary.id == 1)).first() is None:
+        for ddl in KPI_SUMMARY_TRIGGERS.values():
+            connection.execute(text(ddl))
+        rebuild_kpi_summary(connection)
+
+
+event.listen(Base.metadata, "after_create", install_kpi_summary)
+
+
+def kpi_response(total, revenue, readmissions):
+    return {
+        "total_patients": total,
+        "total_revenue": revenue,
+        "readmission_rate": readmissions / total * 100 if total else 0.0,
+    }
+
+
+def read_kpis(db):
+    row = db.get(KpiSummary, 1) if KPI_SUMMARY_ENABLED else None
+    if row is not None:
+        return kpi_response(row.total_patients, row.total_revenue, row.readmissions)
+    return kpi_response(*db.execute(kpi_aggregates()).one())
+
+
+async def read_kpis_async(db):
+    row = await db.get(KpiSummary, 1) if KPI_SUMMARY_ENABLED else None
+    if row is not None:
+        return kpi_response(row.total_patients, row.total_revenue, row.readmissions)
+    return kpi_response(*(await db.execute(kpi_aggregates())).one())
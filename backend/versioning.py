@@ -0,0 +1,81 @@
+"""
+Monotonic data version, bumped by SQLite triggers on every patients write, and the
+ETag / If-None-Match handling built on it.
+
+The epoch is random per database so a rebuilt database never reuses old ETags.
+"""
+import uuid
+from contextvars import ContextVar
+from fastapi import Response
+from sqlalchemy import event, select, text
+from .database import Base
+from .models import DataVersion
+
+DATA_VERSION_TRIGGERS = {
+    f"data_version_after_{op.lower()}": f"""
+        CREATE TRIGGER IF NOT EXISTS data_version_after_{op.lower()} AFTER {op} ON patients
+        BEGIN
+            UPDATE data_version SET version = version + 1 WHERE id = 1;
+        END
+    """
+    for op in ("INSERT", "UPDATE", "DELETE")
+}
+
+
+def install_data_version(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    if connection.execute(select(DataVersion.id).where(DataVersion.id == 1)).first() is None:
+        connection.execute(
+            DataVersion.__table__.insert().values(id=1, epoch=uuid.uuid4().hex[:12], version=0)
+        )
+        for ddl in DATA_VERSION_TRIGGERS.values():
+            connection.execute(text(ddl))
+
+
+event.listen(Base.metadata, "after_create", install_data_version)
+
+version_query = select(DataVersion.epoch, DataVersion.version).where(DataVersion.id == 1)
+
+# Set around a response build; readers answering from an older snapshot append to it
+stale_reads = ContextVar("medintel_stale_reads", default=None)
+
+
+def mark_stale():
+    reads = stale_reads.get()
+    if reads is not None:
+        reads.append(True)
+
+
+def make_etag(row, variant):
+    if row is None:
+        return None
+    epoch, version = row
+    return f'"{epoch}.{version}.{variant}"'
+
+
+def current_etag(db, variant):
+    return make_etag(db.execute(version_query).first(), variant)
+
+
+async def current_etag_async(db, variant):
+    return make_etag((await db.execute(version_query)).first(), variant)
+
+
+def not_modified(request, etag):
+    """A 304 response if the client already holds `etag`, else None."""
+    if etag is None:
+        return None
+    # Weak comparison: the compression middleware marks encoded representations W/
+    candidates = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def tag_response(response, etag):
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept"
+    return response
@@ -0,0 +1,148 @@
+"""
+MedIntel X - Backend API helpers shared by the dashboard pages
+"""
+import io
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import requests
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from config import API_BASE_URL, FRAME_CACHE_ENTRIES
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Decoded frames keyed by request URL + Accept, revalidated with If-None-Match.
+# Least recently used first; shared by every session's script thread.
+_frame_cache = OrderedDict()
+_frame_cache_lock = threading.Lock()
+_session = requests.Session()
+
+
+def _get_frame(path, params, decode, headers=None, timeout=30):
+    """GET a resource as a DataFrame, reusing the cached frame when the server answers 304."""
+    headers = dict(headers or {})
+    url = requests.Request("GET", f"{API_BASE_URL}{path}", params=params).prepare().url
+    key = (url, headers.get("Accept"))
+
+    with _frame_cache_lock:
+        cached = _frame_cache.get(key)
+        if cached is not None:
+            _frame_cache.move_to_end(key)
+            headers["If-None-Match"] = cached[0]
+
+    response = _session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached is not None:
+        return cached[1].copy()
+    response.raise_for_status()
+
+    frame = decode(response)
+    etag = response.headers.get("ETag")
+    with _frame_cache_lock:
+        if etag:
+            _frame_cache[key] = (etag, frame)
+            _frame_cache.move_to_end(key)
+            while len(_frame_cache) > FRAME_CACHE_ENTRIES:
+                _frame_cache.popitem(last=False)
+        else:
+            _frame_cache.pop(key, None)
+    return frame.copy()
+
+
+def _decode_patients(response):
+    if response.headers.get("content-type", "").startswith(ARROW_STREAM):
+        return pa.ipc.open_stream(io.BytesIO(response.content)).read_pandas()
+    return pd.DataFrame(response.json())
+
+
+def fetch_patients(timeout=30, **params):
+    """Load patients as a DataFrame, preferring the columnar Arrow stream over JSON."""
+    headers = {"Accept": ARROW_STREAM} if pa is not None else {}
+    return _get_frame("/patients", params, _decode_patients, headers, timeout)
+
+
+def fetch_aggregate(group_by, metrics=("count",), timeout=10, **filters):
+    """Run a server-side GROUP BY and return the (small) result as a DataFrame."""
+    params = {"group_by": list(group_by), "metrics": list(metrics)}
+    params.update({key: value for key, value in filters.items() if value is not None})
+    return _get_frame("/aggregate", params, lambda response: pd.DataFrame(response.json()), timeout=timeout)
+
+
+def upload_patients(file, fmt="csv", timeout=600):
+    """Stream a CSV/NDJSON file into the backend database; returns the ingest report."""
+    response = _session.post(f"{API_BASE_URL}/patients/bulk", params={"format": fmt}, data=file, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def stream_kpis(timeout=60):
+    """Yield (event, data) pairs from the live KPI feed: a full snapshot, then deltas."""
+    url = f"{API_BASE_URL}/stream/kpis"
+    with _session.get(url, stream=True, timeout=timeout, headers={"Accept": "text/event-stream"}) as response:
+        response.raise_for_status()
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+
+
+def sync_patients(frame=None, seq=0, fields=None, timeout=30):
+    """Bring a cached patients frame up to date from /patients/changes; returns (frame, seq).
+
+    Pass the (frame, seq) from the previous call. Starting with seq=0, or after the
+    server compacted its change log, the server sends a paged snapshot instead.
+    """
+    params = {"fields": list(fields)} if fields else {}
+    after = None
+    while True:
+        query = {**params, "since": seq, **({"after": after} if after else {})}
+        response = _session.get(f"{API_BASE_URL}/patients/changes", params=query, timeout=timeout)
+        response.raise_for_status()
+        page = response.json()
+        upserts = pd.DataFrame(page["upserts"])
+        if (page["snapshot"] and not after) or frame is None:
+            frame = upserts.set_index("id", drop=False) if not upserts.empty else pd.DataFrame(columns=["id"])
+        elif page["snapshot"]:
+            # The last page of a snapshot can be empty when the table fills every page exactly
+            if not upserts.empty:
+                frame = pd.concat([frame, upserts.set_index("id", drop=False)])
+        else:
+            gone = set(page["deletes"]) | set(upserts["id"] if not upserts.empty else ())
+            frame = frame[~frame.index.isin(gone)]
+            if not upserts.empty:
+                frame = pd.concat([frame, upserts.set_index("id", drop=False)]).sort_index()
+        seq = page["seq"]
+        after = page.get("after")
+        if not page["has_more"]:
+            return frame, seq
+
+
+def submit_report(spec, timeout=30):
+    """Queue a server-side report build; returns the job status (already done when cached)."""
+    response = _session.post(f"{API_BASE_URL}/jobs/reports", json=spec, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_job(job_id, timeout=10):
+    response = _session.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def download_job_artifact(job_id, timeout=300):
+    response = _session.get(f"{API_BASE_URL}/jobs/{job_id}/artifact", timeout=timeout)
+    response.raise_for_status()
+    return response.content
@@ -8,6 +8,8 @@ import pandas as pd
 import requests
 from streamlit_option_menu import option_menu
 
+from api_client import sync_patients, upload_patients
+
 st.set_page_config(page_title="MedIntel X", layout="wide", initial_sidebar_state="expanded")
 
 # ---------- CSS / Theme ----------
@@ -318,10 +320,20 @@ with st.sidebar:
         except Exception as e:
             st.error(f"❌ Upload failed: {e}")
 
-    if st.button("🔄 Load Backend Sample Data", use_container_width=True, help="Fetch sample data from backend API"):
+        if st.button("💾 Save Upload to Database", use_container_width=True, help="Bulk-load this file into the backend for every user"):
+            try:
+                uploaded.seek(0)
+                report = upload_patients(uploaded)
+                st.success(f"✅ Inserted {report['inserted']:,} rows ({report['rejected']:,} rejected)")
+            except Exception as e:
+                st.error(f"❌ Backend error: {e}")
+
+    if st.button("🔄 Load Backend Sample Data", use_container_width=True, help="Fetch patients from the backend API; later clicks only fetch what changed"):
         try:
-            patients = requests.get("http://127.0.0.1:8000/patients", timeout=4).json()
-            st.session_state.data = pd.DataFrame(patients)
+            # (frame, change-log position) from the last load, so a refresh is a small delta
+            frame, seq = sync_patients(*st.session_state.get("backend_sync", (None, 0)))
+            st.session_state.backend_sync = (frame, seq)
+            st.session_state.data = frame.reset_index(drop=True)
             st.success("✅ Sample data loaded!")
         except Exception as e:
             st.error(f"❌ Backend error: {e}")
@@ -68,6 +68,7 @@ COLORS = {
 
 # Performance Settings
 CACHE_TTL = 3600  # Cache time to live in seconds
+FRAME_CACHE_ENTRIES = 16  # API responses kept decoded for If-None-Match revalidation
 MAX_ROWS_DISPLAY = 1000
 CHART_HEIGHT = 400
 CHART_WIDTH = "100%"
@@ -1,9 +1,9 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+from api_client import fetch_patients, stream_kpis
 
 st.set_page_config(page_title="Executive Command Center", layout="wide")
 
@@ -121,8 +121,7 @@ try:
         else:
             df = pd.DataFrame(session_data)
     else:
-        patients = requests.get("http://127.0.0.1:8000/patients").json()
-        df = pd.DataFrame(patients)
+        df = fetch_patients(fields=["department", "gender", "treatment_cost", "readmission", "outcome"])
 
     # ensure patient_id exists so aggregations work even for uploaded CSVs
     if 'patient_id' not in df.columns:
@@ -261,6 +260,32 @@ try:
     with st.expander("📊 View Data", expanded=True):
         st.dataframe(df.head(15), use_container_width=True, hide_index=True)
 
+    # Live KPIs: the backend sends a snapshot, then only the values that changed
+    st.markdown("<div class='section-title'>📡 Live Backend KPIs</div>", unsafe_allow_html=True)
+    if st.toggle("Follow live updates", help="Watch the backend's KPIs change as patients are written; runs while this page is open"):
+        tiles = [column.empty() for column in st.columns(3, gap="medium")]
+        kpis = {}
+        for event, data in stream_kpis():
+            if event == "snapshot":
+                kpis = dict(data["kpis"])
+            elif data.get("kpis"):
+                kpis.update(data["kpis"])
+            else:
+                continue
+            values = [
+                ("👥 Total Patients", f"{kpis['total_patients']:,}"),
+                ("💰 Total Revenue", f"₹{kpis['total_revenue']:,.0f}"),
+                ("🔄 Readmission Rate", f"{kpis['readmission_rate']:.1f}%"),
+            ]
+            for tile, (label, value) in zip(tiles, values):
+                tile.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-label">{label}</div>
+                    <div class="metric-value">{value}</div>
+                    <div class="metric-change">🟢 live · data version {data['version']}</div>
+                </div>
+                """, unsafe_allow_html=True)
+
 except Exception as e:
     st.error(f"❌ Error: {str(e)}")
     st.info("💡 Make sure the backend server is running on http://127.0.0.1:8000 or upload data in the sidebar")
@@ -4,8 +4,44 @@ import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
 
+from api_client import fetch_aggregate
+
 st.set_page_config(page_title="Patient Flow Sankey", layout="wide")
 
+
+def load_flow_cells():
+    """Department × outcome cells with patient counts and cost/age sums.
+
+    Uploaded data is grouped locally; backend data is grouped server-side so only
+    the cells are transferred instead of the full patient table.
+    """
+    if 'session_data' in globals() and session_data is not None:
+        if isinstance(session_data, pd.DataFrame):
+            df = session_data
+        else:
+            df = pd.DataFrame(session_data)
+        if "department" not in df.columns or "outcome" not in df.columns:
+            return None, df.columns
+        grouped = df.groupby(["department", "outcome"])
+        cells = grouped.size().rename("count").to_frame()
+        for column in ("treatment_cost", "age"):
+            if column in df.columns:
+                cells[f"sum_{column}"] = grouped[column].sum()
+        return cells.reset_index(), df.columns
+
+    cells = fetch_aggregate(["department", "outcome"], ["count", "sum:treatment_cost", "sum:age"])
+    return cells, cells.columns
+
+
+def department_stats(cells):
+    totals = cells.groupby("department").sum(numeric_only=True)
+    stats = pd.DataFrame({"Total Patients": totals["count"]})
+    if "sum_treatment_cost" in totals.columns:
+        stats["Avg Cost"] = totals["sum_treatment_cost"] / totals["count"]
+    if "sum_age" in totals.columns:
+        stats["Avg Age"] = totals["sum_age"] / totals["count"]
+    return stats.round(2)
+
 # Dark theme CSS
 st.markdown("""
 <style>
@@ -71,29 +107,13 @@ st.markdown("""
 
 try:
     # Load data
-    if 'session_data' in globals() and session_data is not None:
-        if isinstance(session_data, pd.DataFrame):
-            df = session_data.copy()
-        else:
-            df = pd.DataFrame(session_data)
-    else:
-        patients = requests.get("http://127.0.0.1:8000/patients").json()
-        df = pd.DataFrame(patients)
-
-    if 'patient_id' not in df.columns and 'id' in df.columns:
-        df['patient_id'] = df['id']
-    elif 'patient_id' not in df.columns:
-        df['patient_id'] = range(1, len(df) + 1)
+    cells, available_columns = load_flow_cells()
 
-    # Check for required columns
-    has_dept = "department" in df.columns
-    has_outcome = "outcome" in df.columns
-    
-    if has_dept and has_outcome:
-        flow = df.groupby(["department","outcome"]).size().reset_index(name="count")
+    if cells is not None:
+        flow = cells[["department", "outcome", "count"]]
         
-        departments = sorted(list(df["department"].unique()))
-        outcomes = sorted(list(df["outcome"].unique()))
+        departments = sorted(list(cells["department"].unique()))
+        outcomes = sorted(list(cells["outcome"].unique()))
         
         labels = departments + outcomes
         source = []
@@ -151,7 +171,7 @@ try:
         st.markdown("<div class='section-title'>📊 Flow Statistics</div>", unsafe_allow_html=True)
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Patients", len(df), "Active Records")
+            st.metric("Total Patients", int(cells["count"].sum()), "Active Records")
         with col2:
             st.metric("Departments", len(departments))
         with col3:
@@ -159,25 +179,18 @@ try:
         
         # Data tables
         st.markdown("<div class='section-title'>📈 Department-Outcome Matrix</div>", unsafe_allow_html=True)
-        pivot_table = df.groupby(["department", "outcome"]).size().unstack(fill_value=0)
+        pivot_table = cells.pivot_table(index="department", columns="outcome", values="count", aggfunc="sum", fill_value=0)
         st.dataframe(pivot_table, use_container_width=True)
         
         st.markdown("<div class='section-title'>📊 Department Statistics</div>", unsafe_allow_html=True)
-        dept_stats = df.groupby("department").agg({
-            "patient_id": "count",
-        }).round(2)
-        if "treatment_cost" in df.columns:
-            dept_stats["Avg Cost"] = df.groupby("department")["treatment_cost"].mean()
-        if "age" in df.columns:
-            dept_stats["Avg Age"] = df.groupby("department")["age"].mean()
-        dept_stats.columns = ["Total Patients"] + list(dept_stats.columns[1:])
+        dept_stats = department_stats(cells)
         st.dataframe(dept_stats, use_container_width=True)
     else:
         st.warning("⚠️ Missing required columns")
         st.info("""
         💡 This page requires 'department' and 'outcome' columns in your data.
         
-        **Available columns:**""" + ", ".join([f"`{c}`" for c in df.columns.tolist()[:10]]))
+        **Available columns:**""" + ", ".join([f"`{c}`" for c in list(available_columns)[:10]]))
         st.markdown("Please upload a healthcare dataset with department and patient outcome information.")
 
 except Exception as e:
@@ -185,24 +198,13 @@ except Exception as e:
     st.info("💡 Make sure the backend server is running or upload healthcare data in the sidebar")
 
 try:
-    if 'session_data' in globals() and session_data is not None:
-        if isinstance(session_data, pd.DataFrame):
-            df = session_data.copy()
-        else:
-            df = pd.DataFrame(session_data)
-    else:
-        patients = requests.get("http://127.0.0.1:8000/patients").json()
-        df = pd.DataFrame(patients)
-
-    if 'patient_id' not in df.columns:
-        df = df.copy()
-        df['patient_id'] = range(1, len(df) + 1)
+    cells, available_columns = load_flow_cells()
 
-    if "department" in df.columns and "outcome" in df.columns:
-        flow = df.groupby(["department","outcome"]).size().reset_index(name="count")
+    if cells is not None:
+        flow = cells[["department", "outcome", "count"]]
         
-        departments = sorted(list(df["department"].unique()))
-        outcomes = sorted(list(df["outcome"].unique()))
+        departments = sorted(list(cells["department"].unique()))
+        outcomes = sorted(list(cells["outcome"].unique()))
         
         labels = departments + outcomes
         source = []
@@ -261,7 +263,7 @@ try:
         
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.info(f"📊 Total Patients: **{len(df):,}**")
+            st.info(f"📊 Total Patients: **{int(cells['count'].sum()):,}**")
         with col2:
             st.success(f"🏥 Total Departments: **{len(departments)}**")
         with col3:
@@ -270,16 +272,11 @@ try:
         st.markdown("---")
         
         st.markdown("### 📈 Department-Outcome Matrix")
-        pivot_table = df.groupby(["department", "outcome"]).size().unstack(fill_value=0)
+        pivot_table = cells.pivot_table(index="department", columns="outcome", values="count", aggfunc="sum", fill_value=0)
         st.dataframe(pivot_table, use_container_width=True)
         
         st.markdown("### 📊 Department Statistics")
-        dept_stats = df.groupby("department").agg({
-            "patient_id": "count",
-            "treatment_cost": "mean",
-            "age": "mean"
-        }).round(2)
-        dept_stats.columns = ["Total Patients", "Avg Treatment Cost", "Avg Age"]
+        dept_stats = department_stats(cells).rename(columns={"Avg Cost": "Avg Treatment Cost"})
         st.dataframe(dept_stats, use_container_width=True)
     else:
         st.warning("Required columns (department, outcome) not found in data")
@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import requests
 import numpy as np
 import plotly.express as px
+from api_client import fetch_patients
 
 st.set_page_config(page_title="Doctor Performance Radar", layout="wide")
 
@@ -77,8 +77,7 @@ try:
         else:
             df = pd.DataFrame(session_data)
     else:
-        patients = requests.get("http://127.0.0.1:8000/patients").json()
-        df = pd.DataFrame(patients)
+        df = fetch_patients(fields=["department", "age", "treatment_cost", "readmission"])
 
     if 'patient_id' not in df.columns:
         df = df.copy()
@@ -1,9 +1,9 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+from api_client import fetch_patients
 
 st.set_page_config(page_title="Forecast Analytics", layout="wide")
 
@@ -77,8 +77,7 @@ try:
         else:
             df = pd.DataFrame(session_data)
     else:
-        patients = requests.get("http://127.0.0.1:8000/patients").json()
-        df = pd.DataFrame(patients)
+        df = fetch_patients(fields=["department"])
 
     if 'patient_id' not in df.columns:
         df = df.copy()
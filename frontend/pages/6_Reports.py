@@ -1,9 +1,13 @@
 import io
+import time
 from datetime import datetime, timedelta
 
 import pandas as pd
+import requests
 import streamlit as st
 
+from api_client import download_job_artifact, get_job, submit_report
+
 # Dark theme CSS
 st.markdown("""
 <style>
@@ -110,6 +114,64 @@ def _to_pdf_bytes(fig, summary_text: str = "") -> bytes:
         raise RuntimeError("PDF generation failed (reportlab missing or failed): " + str(e))
 
 
+SERVER_REPORT_MIMES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+
+def _server_report():
+    """Build a report from the backend's patient table as a background job and poll it."""
+    st.markdown("### Server-side report")
+    st.caption("Built by the backend from the full patient table; this page only polls for progress.")
+    with st.form("server_report"):
+        fmt = st.selectbox("Format", options=list(SERVER_REPORT_MIMES), index=0)
+        group_by = st.multiselect("Group by", options=["department", "gender", "outcome", "age_band"], default=["department"])
+        include_rows = st.checkbox("Include patient rows (CSV, JSON, Excel)")
+        # Off by default: a range leaves out every patient without an admission date
+        by_admission = st.checkbox("Only patients admitted in a date range")
+        today = datetime.now().date()
+        admitted_from = st.date_input("Admitted from", value=today - timedelta(days=365))
+        admitted_to = st.date_input("Admitted to", value=today)
+        submitted = st.form_submit_button("Build on server")
+
+    try:
+        if submitted:
+            spec = {
+                "format": fmt,
+                "group_by": group_by,
+                "include_rows": include_rows,
+            }
+            if by_admission:
+                spec["start_date"] = admitted_from.isoformat()
+                spec["end_date"] = admitted_to.isoformat()
+            st.session_state["report_job"] = submit_report(spec)["id"]
+
+        job_id = st.session_state.get("report_job")
+        if not job_id:
+            return
+        job = get_job(job_id)
+        if job["status"] in ("queued", "running"):
+            st.progress(job["progress"], text=f"Report {job['status']}…")
+            time.sleep(1)
+            rerun = getattr(st, "rerun", None) or getattr(st, "experimental_rerun")
+            rerun()
+        elif job["status"] == "done":
+            st.success(f"Report ready ({job['rows'] or 0:,} patient rows)")
+            st.download_button(
+                f"Download {job['format'].upper()}",
+                data=download_job_artifact(job_id),
+                file_name=f"report.{job['format']}",
+                mime=SERVER_REPORT_MIMES[job["format"]],
+            )
+        else:
+            st.error(f"Report failed: {job['error']}")
+    except requests.RequestException as e:
+        st.warning(f"Backend report service unavailable: {e}")
+
+
 def run():
     st.set_page_config(page_title="Reports — MedIntel X", layout="wide")
     st.markdown("**Reports & Exports — Timeline**")
@@ -237,6 +299,8 @@ def run():
         except Exception as e:
             col4.error(f"PDF error: {str(e)[:50]}")
 
+    _server_report()
+
 
 if __name__ == "__main__":
     run()
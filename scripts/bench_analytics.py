@@ -0,0 +1,114 @@
+"""
+Benchmark the dashboard's /aggregate and /histogram queries on SQLite and on the
+DuckDB analytics engines (backend.analytics) at one or more table sizes.
+
+    python scripts/bench_analytics.py --rows 1000000 10000000
+
+Each engine runs the same raw GROUP BY statements the API compiles (the rollup
+shortcut is bypassed). The `duckdb` (attached SQLite) engine needs DuckDB's
+sqlite extension and is skipped when it cannot be loaded.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import duckdb  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+from backend.aggregate import (  # noqa: E402
+    build_aggregate_query, histogram_edges, histogram_query, histogram_range_query, truncate_integer,
+)
+from backend.analytics import DuckDBEngine  # noqa: E402
+from backend.generate import generate_patients  # noqa: E402
+from backend.models import Patient  # noqa: E402
+from backend.startup import init_database  # noqa: E402
+
+# (group_by, metrics, conditions) as requested by the dashboard pages
+AGGREGATES = {
+    "admissions by department": (["department"], ["count"], []),
+    "revenue by department": (["department"], ["sum:treatment_cost"], []),
+    "sankey department x outcome": (["department", "outcome"], ["count"], []),
+    "heatmap department x gender": (["department", "gender"], ["mean:treatment_cost"], []),
+    "cost trend by age": (["age"], ["mean:treatment_cost", "count"], []),
+    "readmission by age band": (["age_band"], ["mean:readmitted"], []),
+    "cost spread by department": (["department"], ["std:treatment_cost", "min:age", "max:age"], []),
+    "filtered cardiology by gender": (["gender"], ["count", "mean:age"], [Patient.department == "Cardiology"]),
+}
+HISTOGRAM = ("treatment_cost", 40)
+
+
+def run_histogram(run, truncate):
+    column, bins = HISTOGRAM
+    low, high = run(histogram_range_query(column, []))[0]
+    return run(histogram_query(column, histogram_edges(float(low), float(high), bins), [], truncate))
+
+
+def time_queries(run, truncate, repeat):
+    queries = {
+        name: lambda spec=spec: run(build_aggregate_query(*spec)) for name, spec in AGGREGATES.items()
+    }
+    queries[f"histogram {HISTOGRAM[0]}"] = lambda: run_histogram(run, truncate)
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+        results[name] = min(timings)
+    return results
+
+
+def bench(rows, repeat, threads):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        init_database(engine)
+
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            generate_patients(connection, rows, batch_size=100_000, seed=42)
+        print(f"Loaded {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        timings = {}
+        with engine.connect() as connection:
+            timings["sqlite"] = time_queries(lambda stmt: connection.execute(stmt).all(), truncate_integer, repeat)
+
+        parquet = DuckDBEngine("duckdb-parquet", engine, os.path.join(tmp, "patients.parquet"), threads)
+        started = time.perf_counter()
+        parquet.refresh()
+        print(f"Exported Parquet snapshot in {time.perf_counter() - started:.1f}s")
+        timings["duckdb-parquet"] = time_queries(parquet.rows, DuckDBEngine.truncate, repeat)
+
+        try:
+            attached = DuckDBEngine("duckdb", engine, None, threads)
+        except duckdb.Error as e:
+            print(f"Skipping duckdb (attached SQLite): {str(e).splitlines()[0]}")
+        else:
+            timings["duckdb"] = time_queries(attached.rows, DuckDBEngine.truncate, repeat)
+        engine.dispose()
+
+    engines = list(timings)
+    print(f"\n{rows:,} rows (best of {repeat}, ms)")
+    print(f"  {'query':32}" + "".join(f"{name:>16}" for name in engines))
+    for name in timings["sqlite"]:
+        print(f"  {name:32}" + "".join(f"{timings[engine][name] * 1000:16.1f}" for engine in engines))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="DuckDB threads (0 = DuckDB default)")
+    args = parser.parse_args()
+    for rows in args.rows:
+        bench(rows, args.repeat, args.threads)
+
+
+if __name__ == "__main__":
+    main()
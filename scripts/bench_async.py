@@ -0,0 +1,132 @@
+"""
+Load test the sync (threadpool) and async (MEDINTEL_DB_ASYNC) API variants.
+
+Starts uvicorn once per mode against the same database, drives it with N
+concurrent keep-alive clients and prints throughput and p50/p99 latency:
+
+    python scripts/bench_async.py --clients 200 --duration 20 [--rows 200000]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+ENDPOINTS = [
+    "/kpis",
+    "/aggregate?group_by=department&group_by=outcome&metrics=count&metrics=mean:treatment_cost",
+    "/patients?limit=100&after=1000",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def wait_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/kpis")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"API at {base_url} did not become ready")
+
+
+async def drive(base_url, clients, duration):
+    latencies = {endpoint: [] for endpoint in ENDPOINTS}
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.monotonic() < deadline:
+                endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+                started = time.perf_counter()
+                try:
+                    response = await client.get(endpoint)
+                    response.raise_for_status()
+                    latencies[endpoint].append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+                i += 1
+
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+    return latencies, errors
+
+
+def run_mode(mode, database_url, clients, duration):
+    port = free_port()
+    env = dict(os.environ, MEDINTEL_DATABASE_URL=database_url, MEDINTEL_DB_ASYNC="1" if mode == "async" else "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_ready(base_url))
+        return asyncio.run(drive(base_url, clients, duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(mode, latencies, errors, duration):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{mode}: {total:,} requests, {total / duration:,.0f} req/s, {errors} errors")
+    for endpoint, values in latencies.items():
+        if values:
+            print(
+                f"  {endpoint[:60]:<60} n={len(values):>6}  "
+                f"p50={percentile(values, 50) * 1000:7.1f} ms  p99={percentile(values, 99) * 1000:7.1f} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--rows", type=int, default=200_000, help="synthetic rows when --database-url is not given")
+    parser.add_argument("--database-url", help="benchmark an existing database instead of a generated one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url
+        if database_url is None:
+            database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            subprocess.run(
+                [sys.executable, "-m", "backend.generate", "--rows", str(args.rows), "--seed", "7"],
+                cwd=ROOT,
+                env=dict(os.environ, MEDINTEL_DATABASE_URL=database_url),
+                check=True,
+            )
+
+        for mode in ("sync", "async"):
+            latencies, errors = run_mode(mode, database_url, args.clients, args.duration)
+            report(mode, latencies, errors, args.duration)
+
+
+if __name__ == "__main__":
+    main()
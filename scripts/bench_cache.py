@@ -0,0 +1,112 @@
+"""
+Benchmark of the per-process (memory) and shared (sqlite) query-result cache backends.
+
+    python scripts/bench_cache.py --workers 8 --keys 50 --compute-ms 100
+
+  lookup   single process: microseconds per hit and per store at a few body sizes
+  workers  --workers processes each request the same --keys results --rounds times,
+           computing (a --compute-ms sleep standing in for the query) on every miss,
+           like `uvicorn --workers N` behind a dashboard everyone opens
+
+The shared file is created in a temporary directory unless --path is given.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.cache import LRUCache, SQLiteCache  # noqa: E402
+
+ETAG = '"bench.1.json"'
+MAX_BYTES = 256 * 1024 * 1024
+TTL = 3600
+
+
+def make(backend, path):
+    if backend == "sqlite":
+        return SQLiteCache(path, MAX_BYTES, TTL, MAX_BYTES)
+    return LRUCache(MAX_BYTES, TTL, MAX_BYTES)
+
+
+def lookup(backend, path, size, repeat):
+    cache = make(backend, path)
+    body = b"x" * size
+    started = time.perf_counter()
+    for i in range(repeat):
+        cache.set(f"/aggregate?size={size}&i={i}", ETAG, (body, {}), size)
+    store = (time.perf_counter() - started) / repeat
+    started = time.perf_counter()
+    for i in range(repeat):
+        cache.get(f"/aggregate?size={size}&i={i}", ETAG)
+    hit = (time.perf_counter() - started) / repeat
+    return hit * 1e6, store * 1e6
+
+
+def worker(index, workers, backend, path, keys, rounds, compute_ms, body_size, results):
+    cache = make(backend, path)
+    # Each worker starts at a different view, as users do, rather than all missing in lockstep
+    order = [(key + index * keys // workers) % keys for key in range(keys)]
+    computed = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for key in order:
+            if cache.get(f"/aggregate?view={key}", ETAG) is None:
+                time.sleep(compute_ms / 1000)
+                cache.set(f"/aggregate?view={key}", ETAG, (b"x" * body_size, {}), body_size)
+                computed += 1
+    results.put((computed, time.perf_counter() - started))
+
+
+def run_workers(backend, path, args):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(index, args.workers, backend, path, args.keys, args.rounds, args.compute_ms, args.body_size, results),
+        )
+        for index in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - started
+    computed = sum(count for count, _ in outcomes)
+    return computed, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--compute-ms", type=float, default=100)
+    parser.add_argument("--body-size", type=int, default=16 * 1024)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--path", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("lookup (single process)")
+        for size in (1024, 16 * 1024, 256 * 1024):
+            for backend in ("memory", "sqlite"):
+                path = args.path or os.path.join(directory, f"lookup-{size}.db")
+                hit, store = lookup(backend, path, size, args.repeat)
+                print(f"  {backend:7} {size:>8,} B   hit {hit:8.1f} us   store {store:8.1f} us")
+
+        lookups = args.workers * args.keys * args.rounds
+        print(f"\nworkers: {args.workers} x {args.keys} keys x {args.rounds} rounds, {args.compute_ms:g} ms per miss")
+        for backend in ("memory", "sqlite"):
+            path = args.path or os.path.join(directory, "workers.db")
+            computed, wall = run_workers(backend, path, args)
+            print(f"  {backend:7} computed {computed:6,} of {lookups:,}   wall {wall:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark the dashboard queries against a legacy (id-only) patients table, then
+apply backend.migrations and run them again, printing each query plan and timing.
+
+    python scripts/bench_indexes.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine  # noqa: E402
+from backend.migrations import run_migrations  # noqa: E402
+
+# Schema as shipped before the secondary indexes existed
+LEGACY_SCHEMA = [
+    """CREATE TABLE patients (
+        id INTEGER NOT NULL,
+        department VARCHAR,
+        gender VARCHAR,
+        age INTEGER,
+        treatment_cost FLOAT,
+        readmission VARCHAR,
+        outcome VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_patients_id ON patients (id)",
+]
+
+DEPARTMENTS = ["Cardiology", "Neurology", "Orthopedics", "Oncology", "Pediatrics", "Emergency", "Radiology", "Surgery"]
+
+QUERIES = {
+    "sankey department x outcome": "SELECT department, outcome, count(*) FROM patients GROUP BY department, outcome",
+    "revenue by department": "SELECT department, sum(treatment_cost) FROM patients GROUP BY department",
+    "heatmap department x gender": "SELECT department, gender, avg(treatment_cost) FROM patients GROUP BY department, gender",
+    "cost trend by age": "SELECT age, avg(treatment_cost) FROM patients GROUP BY age",
+    "filtered department/outcome": "SELECT count(*), avg(treatment_cost) FROM patients WHERE department = 'Cardiology' AND outcome = 'Recovered'",
+    "department cost range": "SELECT id, treatment_cost FROM patients WHERE department = 'Oncology' AND treatment_cost BETWEEN 50000 AND 51000",
+    "readmissions by outcome": "SELECT outcome, count(*) FROM patients WHERE readmission = 'Yes' GROUP BY outcome",
+}
+
+
+def populate(connection, rows, batch_size=50000):
+    rng = random.Random(42)
+
+    def batch(n):
+        for _ in range(n):
+            yield (
+                rng.choice(DEPARTMENTS),
+                rng.choice(("Male", "Female")),
+                rng.randint(1, 95),
+                float(rng.randint(10000, 100000)),
+                rng.choice(("Yes", "No")),
+                rng.choice(("Recovered", "Deceased")),
+            )
+
+    for statement in LEGACY_SCHEMA:
+        connection.execute(statement)
+    for start in range(0, rows, batch_size):
+        connection.executemany(
+            "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome) VALUES (?, ?, ?, ?, ?, ?)",
+            batch(min(batch_size, rows - start)),
+        )
+    connection.commit()
+
+
+def measure(connection, repeat):
+    results = {}
+    for name, sql in QUERIES.items():
+        plan = "; ".join(row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            connection.execute(sql).fetchall()
+            timings.append(time.perf_counter() - started)
+        results[name] = (plan, min(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        connection = sqlite3.connect(path)
+
+        started = time.perf_counter()
+        populate(connection, args.rows)
+        print(f"Loaded {args.rows:,} rows in {time.perf_counter() - started:.1f}s\n")
+
+        before = measure(connection, args.repeat)
+
+        started = time.perf_counter()
+        engine = create_engine(f"sqlite:///{path}")
+        with engine.begin() as sa_connection:
+            run_migrations(sa_connection)
+        engine.dispose()
+        print(f"Migrations applied in {time.perf_counter() - started:.1f}s\n")
+
+        connection.close()
+        connection = sqlite3.connect(path)
+        after = measure(connection, args.repeat)
+        connection.close()
+
+    for name in QUERIES:
+        (plan_before, t_before), (plan_after, t_after) = before[name], after[name]
+        print(name)
+        print(f"  before {t_before * 1000:9.1f} ms  {plan_before}")
+        print(f"  after  {t_after * 1000:9.1f} ms  {plan_after}")
+        print(f"  speedup {t_before / t_after:6.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
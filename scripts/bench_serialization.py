@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the /patients JSON serialization paths, in rows per second.
+
+    python scripts/bench_serialization.py --rows 100000
+
+  orm + jsonable_encoder   Patient instances through FastAPI's default encoder
+  dicts + jsonable_encoder row dicts through the default encoder and json.dumps
+  pydantic TypeAdapter     validate and dump List[PatientRecord]
+  tuples + dumps           row tuples zipped to dicts and rendered by formats.dumps
+                           (orjson when installed), as /patients now does
+
+Rows are loaded once; only the conversion to JSON bytes is timed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend.database import Base  # noqa: E402
+from backend.formats import dumps, orjson  # noqa: E402
+from backend.generate import generate_patients  # noqa: E402
+from backend.models import Patient  # noqa: E402
+from backend.queries import PATIENT_COLUMN_NAMES, patient_rows, row_dicts  # noqa: E402
+from backend.schemas import PatientRecord  # noqa: E402
+
+
+def best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.tables["patients"].create(engine)
+    with engine.begin() as connection:
+        generate_patients(connection, args.rows, seed=42)
+    with Session(engine) as session:
+        instances = session.scalars(select(Patient).order_by(Patient.id)).all()
+        rows = session.execute(patient_rows(0)).all()
+        fields = PATIENT_COLUMN_NAMES
+        adapter = TypeAdapter(List[PatientRecord])
+
+        paths = {
+            "orm + jsonable_encoder": lambda: json.dumps(jsonable_encoder(instances)).encode(),
+            "dicts + jsonable_encoder": lambda: json.dumps(jsonable_encoder(row_dicts(rows, fields))).encode(),
+            "pydantic TypeAdapter": lambda: adapter.dump_json(adapter.validate_python(row_dicts(rows, fields))),
+            "tuples + dumps": lambda: dumps(row_dicts(rows, fields)),
+        }
+        print(f"{args.rows:,} rows, best of {args.repeat}; dumps backend: {'orjson' if orjson else 'json'}\n")
+        baseline = None
+        for name, fn in paths.items():
+            seconds = best(fn, args.repeat)
+            baseline = baseline or seconds
+            print(f"  {name:26} {args.rows / seconds:12,.0f} rows/s  {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
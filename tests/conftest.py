@@ -0,0 +1,108 @@
+"""
+Shared fixtures: one seeded SQLite database in a temporary directory per test run.
+
+Settings are read when `backend.config` is imported, so the environment is set
+here, before any test module imports the backend. Tests that need other settings,
+or a real socket (streamed responses, concurrent requests), start a uvicorn
+server in a subprocess with `live_server(**env)`.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+DATA_DIR = tempfile.mkdtemp(prefix="medintel-tests-")
+SEED_ROWS = 3000
+
+os.environ.update({
+    "MEDINTEL_DATABASE_URL": f"sqlite:///{os.path.join(DATA_DIR, 'medintel.db')}",
+    "MEDINTEL_SEED_DEMO_DATA": "true",
+    "MEDINTEL_SEED_ROWS": str(SEED_ROWS),
+    "MEDINTEL_ANALYTICS_PARQUET_PATH": os.path.join(DATA_DIR, "patients.parquet"),
+    "MEDINTEL_QUERY_CACHE_PATH": os.path.join(DATA_DIR, "query_cache.db"),
+    "MEDINTEL_REPORT_DIR": os.path.join(DATA_DIR, "reports"),
+    "MEDINTEL_SLOW_QUERY_LOG": os.path.join(DATA_DIR, "slow_queries.log"),
+})
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+import requests  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+Server = namedtuple("Server", "url directory")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, log_path, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            requests.get(f"{url}/openapi.json", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    with open(log_path) as log:
+        pytest.fail(f"server at {url} did not start:\n{log.read()}")
+
+
+@pytest.fixture(scope="session")
+def live_server(tmp_path_factory):
+    """`live_server(**env)` -> Server(url, directory), one uvicorn process per distinct env."""
+    servers = {}
+
+    def start(**env):
+        key = tuple(sorted(env.items()))
+        if key not in servers:
+            directory = str(tmp_path_factory.mktemp("server"))
+            port = free_port()
+            environment = {
+                **os.environ,
+                "MEDINTEL_DATABASE_URL": f"sqlite:///{os.path.join(directory, 'medintel.db')}",
+                "MEDINTEL_ANALYTICS_PARQUET_PATH": os.path.join(directory, "patients.parquet"),
+                "MEDINTEL_QUERY_CACHE_PATH": os.path.join(directory, "query_cache.db"),
+                "MEDINTEL_REPORT_DIR": os.path.join(directory, "reports"),
+                "MEDINTEL_SLOW_QUERY_LOG": os.path.join(directory, "slow_queries.log"),
+                "PYTHONPATH": ROOT,
+                **env,
+            }
+            log_path = os.path.join(directory, "server.log")
+            with open(log_path, "w") as log:
+                process = subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port)],
+                    cwd=directory, env=environment, stdout=log, stderr=subprocess.STDOUT,
+                )
+            url = f"http://127.0.0.1:{port}"
+            servers[key] = (process, Server(url, directory))
+            wait_until_ready(url, process, log_path)
+        return servers[key][1]
+
+    yield start
+    for process, _ in servers.values():
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            # Graceful shutdown waits for open streams, such as an SSE feed a failed test left open
+            process.kill()
+            process.wait()
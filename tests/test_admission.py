@@ -0,0 +1,101 @@
+import re
+import threading
+import time
+
+import pytest
+import requests
+
+from backend.admission import route_class
+
+HEADER = b"department,gender,age,treatment_cost,readmission,outcome\n"
+ROW = b"Admission,F,40,100,no,Recovered\n"
+
+
+@pytest.fixture(scope="module")
+def server(live_server):
+    # One bulk request at a time with one queued; a queued request waits up to 30 s
+    return live_server(
+        MEDINTEL_SEED_ROWS="200", MEDINTEL_ADMISSION_BULK="1:1", MEDINTEL_ADMISSION_QUEUE_TIMEOUT="30",
+        MEDINTEL_ADMISSION_RETRY_AFTER="7",
+    ).url
+
+
+def metric(url, name, labels=""):
+    text = requests.get(f"{url}/metrics", timeout=5).text
+    match = re.search(rf"^{name}{re.escape(labels)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+class HeldUpload(threading.Thread):
+    """A bulk upload that sends its header, then holds its admission slot until released."""
+
+    def __init__(self, url):
+        super().__init__(daemon=True)
+        self.url = url
+        self.release = threading.Event()
+        self.response = None
+
+    def body(self):
+        yield HEADER
+        self.release.wait(30)
+        yield ROW
+
+    def run(self):
+        self.response = requests.post(f"{self.url}/patients/bulk?format=csv", data=self.body(), timeout=60)
+
+    def finish(self):
+        self.release.set()
+        self.join(30)
+        return self.response
+
+
+@pytest.mark.parametrize("path,expected", [
+    ("/patients", "bulk"),
+    ("/patients?limit=10", "read"),
+    ("/patients/changes?since=0", "bulk"),
+    ("/patients/changes?since=5", "read"),
+    ("/patients/bulk", "bulk"),
+    ("/aggregate", "aggregate"),
+    ("/histogram", "aggregate"),
+    ("/kpis", "read"),
+    ("/metrics", None),
+    ("/stream/kpis", None),
+    ("/openapi.json", None),
+])
+def test_route_classes(path, expected):
+    path, _, query = path.partition("?")
+    assert route_class({"path": path, "query_string": query.encode()}) == expected
+
+
+def test_saturated_class_sheds_with_retry_after(server):
+    in_flight = metric(server, "medintel_http_requests_in_flight")
+    running = HeldUpload(server)
+    running.start()
+    wait_for(lambda: metric(server, "medintel_http_requests_in_flight") >= in_flight + 1)
+    queued = HeldUpload(server)
+    queued.start()
+    wait_for(lambda: metric(server, "medintel_admission_waiting", '{class="bulk"}') == 1)
+    try:
+        shed = requests.post(f"{server}/patients/bulk?format=csv", data=HEADER + ROW, timeout=10)
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "7"
+        assert "bulk" in shed.json()["detail"]
+        # Full-table reads share the bulk class; other classes and unlimited routes are unaffected
+        assert requests.get(f"{server}/patients", timeout=10).status_code == 503
+        assert requests.get(f"{server}/kpis", timeout=10).status_code == 200
+        assert requests.get(f"{server}/aggregate?metrics=count", timeout=10).status_code == 200
+        assert requests.get(f"{server}/metrics", timeout=10).status_code == 200
+        assert requests.get(f"{server}/openapi.json", timeout=10).status_code == 200
+        assert metric(server, "medintel_admission_rejected_total", '{class="bulk"}') == 2
+    finally:
+        responses = [running.finish(), queued.finish()]
+    # The queued upload ran once the first released its slot
+    assert [response.json()["inserted"] for response in responses] == [1, 1]
+    assert requests.get(f"{server}/patients", timeout=10).status_code == 200
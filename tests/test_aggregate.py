@@ -0,0 +1,24 @@
+import pandas as pd
+from sqlalchemy import text
+
+from backend.database import engine
+
+AGES = [None, 0, 1, 18, 19, 35, 36, 64, 65, 66, 100, 101, 120]
+
+
+def test_age_bands_match_the_dashboard_pd_cut(client):
+    with engine.begin() as connection:
+        for age in AGES:
+            connection.execute(text(
+                "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)"
+                " VALUES ('Age Bands', 'Female', :age, 1, 'No', 'Recovered')"
+            ), {"age": age})
+    response = client.get(
+        "/aggregate", params={"group_by": ["age", "age_band"], "metrics": ["count"], "department": "Age Bands"}
+    )
+    assert response.status_code == 200
+    bands = {row["age"]: row["age_band"] for row in response.json()}
+
+    expected = pd.cut(pd.Series(AGES, dtype=float), bins=[0, 18, 35, 50, 65, 100],
+                      labels=['<18', '18-35', '35-50', '50-65', '65+'])
+    assert bands == {age: None if pd.isna(band) else band for age, band in zip(AGES, expected)}
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import text
+
+duckdb = pytest.importorskip("duckdb")
+
+from backend import aggregate  # noqa: E402
+from backend.aggregate import run_aggregate, run_histogram  # noqa: E402
+from backend.analytics import DuckDBEngine  # noqa: E402
+from backend.database import SessionLocal, engine  # noqa: E402
+from backend.models import Patient  # noqa: E402
+
+METRICS = [
+    "count", "sum:treatment_cost", "mean:treatment_cost", "min:treatment_cost", "max:treatment_cost",
+    "std:treatment_cost", "sum:age", "mean:age", "min:age", "max:age", "sum:readmitted", "mean:readmitted",
+]
+
+FILTERS = {
+    "none": [],
+    "no match": [Patient.department == "Nope"],
+    "several departments": [Patient.department.in_(["Cardiology", "Oncology", "DuckDB Nulls"])],
+    "ranges": [Patient.age >= 30, Patient.treatment_cost <= 50000],
+}
+
+GROUP_BYS = [[], ["department"], ["gender", "age_band"], ["outcome", "readmission"], ["age"]]
+
+HISTOGRAMS = [("age", 10, None, None), ("treatment_cost", 7, None, None), ("age", 4, 20, 60)]
+
+
+@pytest.fixture(scope="module", params=["duckdb", "duckdb-parquet"])
+def duckdb_engine(request, client, tmp_path_factory):
+    with engine.begin() as connection:
+        connection.execute(text("""
+            INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)
+            SELECT 'DuckDB Nulls', NULL, NULL, NULL, NULL, NULL
+            WHERE NOT EXISTS (SELECT 1 FROM patients WHERE department = 'DuckDB Nulls')
+        """))
+    try:
+        return DuckDBEngine(request.param, engine, str(tmp_path_factory.mktemp("duckdb") / "patients.parquet"))
+    except duckdb.IOException as e:
+        # ATTACH ... (TYPE sqlite) installs the sqlite extension on first use
+        pytest.skip(f"DuckDB sqlite extension unavailable: {e}")
+
+
+@pytest.fixture
+def paths(duckdb_engine, monkeypatch):
+    """Run a query function on SQLite and then on DuckDB; rollup cells would bypass both."""
+    monkeypatch.setattr(aggregate, "build_rollup_query", lambda *args: None)
+
+    def run(function, *args):
+        with SessionLocal() as db:
+            monkeypatch.setattr(aggregate, "get_analytics_engine", lambda: None)
+            expected = function(db, *args)
+            monkeypatch.setattr(aggregate, "get_analytics_engine", lambda: duckdb_engine)
+            return function(db, *args), expected
+
+    return run
+
+
+@pytest.mark.parametrize("conditions", FILTERS.values(), ids=list(FILTERS))
+@pytest.mark.parametrize("group_by", GROUP_BYS, ids=["+".join(dims) or "total" for dims in GROUP_BYS])
+def test_aggregate_matches_sqlite(paths, group_by, conditions):
+    actual, expected = paths(run_aggregate, group_by, METRICS, conditions)
+    assert [[row[dim] for dim in group_by] for row in actual] == [[row[dim] for dim in group_by] for row in expected]
+    for got, want in zip(actual, expected):
+        assert got == pytest.approx(want, rel=1e-9), got
+
+
+@pytest.mark.parametrize("conditions", FILTERS.values(), ids=list(FILTERS))
+@pytest.mark.parametrize("column,bins,low,high", HISTOGRAMS)
+def test_histogram_matches_sqlite(paths, conditions, column, bins, low, high):
+    actual, expected = paths(run_histogram, column, bins, conditions, low, high)
+    assert actual == pytest.approx(expected)
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+from backend.database import engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend"))
+api_client = pytest.importorskip("api_client")
+
+
+class PagedSession:
+    """Routes the dashboard's requests to the test app with a fixed /patients/changes page size."""
+
+    def __init__(self, client, limit):
+        self.client, self.limit = client, limit
+
+    def get(self, url, params=None, timeout=None):
+        return self.client.get(url, params={**(params or {}), "limit": self.limit}, timeout=timeout)
+
+
+def patient_count():
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT count(*) FROM patients")).scalar()
+
+
+def current(client):
+    return {row["id"]: row for row in client.get("/patients").json()}
+
+
+@pytest.mark.parametrize("pages", [1, 3])
+def test_snapshot_filling_every_page_exactly(client, monkeypatch, pages):
+    total = patient_count()
+    if total % pages:
+        with engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)"
+                " SELECT department, gender, age, treatment_cost, readmission, outcome FROM patients LIMIT :rows"
+            ), {"rows": pages - total % pages})
+        total = patient_count()
+    monkeypatch.setattr(api_client, "API_BASE_URL", "")
+    monkeypatch.setattr(api_client, "_session", PagedSession(client, total // pages))
+
+    frame, seq = api_client.sync_patients()
+    assert sorted(frame["id"]) == sorted(current(client))
+    assert not frame.index.duplicated().any()
+
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM patients WHERE id = (SELECT max(id) FROM patients)"))
+    frame, _ = api_client.sync_patients(frame, seq)
+    assert sorted(frame["id"]) == sorted(current(client))
@@ -0,0 +1,60 @@
+import pytest
+import requests
+
+pytest.importorskip("aiosqlite")
+
+REQUESTS = {
+    "patients": ("/patients", {}),
+    "patients page": ("/patients", {"limit": 100, "after": 50, "department": ["Cardiology", "Neurology"]}),
+    "patients fields": ("/patients", {"limit": 20, "fields": ["id", "age"], "age_min": 60}),
+    "patients ndjson": ("/patients", {"format": "ndjson", "gender": "Female", "cost_max": 30000}),
+    "patients no match": ("/patients", {"department": "Nope"}),
+    "kpis": ("/kpis", {}),
+    "aggregate": ("/aggregate", {"group_by": ["department", "age_band"], "metrics": ["count", "mean:treatment_cost"]}),
+    "aggregate scan": ("/aggregate", {"group_by": "age", "metrics": ["count", "max:age", "std:treatment_cost"]}),
+    "aggregate no match": ("/aggregate", {"metrics": ["count", "sum:age"], "department": "Nope"}),
+    "histogram": ("/histogram", {"column": "treatment_cost", "bins": 12, "outcome": "Recovered"}),
+    "invalid": ("/aggregate", {"metrics": "median:age"}),
+}
+
+
+@pytest.fixture(scope="module")
+def servers(live_server):
+    """(sync, async) servers over one database, so their data versions and ETags agree."""
+    sync = live_server(MEDINTEL_SEED_ROWS="1500")
+    database = f"sqlite:///{sync.directory}/medintel.db"
+    return sync.url, live_server(MEDINTEL_DATABASE_URL=database, MEDINTEL_DB_ASYNC="true").url
+
+
+def get(url, path, params, **headers):
+    return requests.get(f"{url}{path}", params=params, headers=headers, timeout=30)
+
+
+def same_response(sync, asynchronous):
+    assert asynchronous.status_code == sync.status_code
+    assert asynchronous.content == sync.content
+    for header in ("content-type", "etag", "x-next-after"):
+        assert asynchronous.headers.get(header) == sync.headers.get(header), header
+
+
+@pytest.mark.parametrize("path,params", REQUESTS.values(), ids=list(REQUESTS))
+def test_async_responses_match_sync(servers, path, params):
+    sync_url, async_url = servers
+    same_response(get(sync_url, path, params), get(async_url, path, params))
+
+
+def test_etags_revalidate_across_both_and_move_together(servers):
+    sync_url, async_url = servers
+    path, params = REQUESTS["aggregate"]
+    etag = get(sync_url, path, params).headers["etag"]
+    for url in servers:
+        response = get(url, path, params, **{"If-None-Match": etag})
+        assert (response.status_code, response.content, response.headers["etag"]) == (304, b"", etag)
+
+    body = "department,gender,age,treatment_cost,readmission,outcome\nAsync Parity,F,30,10,no,Recovered\n"
+    assert requests.post(f"{async_url}/patients/bulk?format=csv", data=body, timeout=30).json()["inserted"] == 1
+
+    fresh = [get(url, path, params, **{"If-None-Match": etag}) for url in servers]
+    same_response(*fresh)
+    assert fresh[0].status_code == 200 and fresh[0].headers["etag"] != etag
+    assert any(row["department"] == "Async Parity" for row in fresh[0].json())
@@ -0,0 +1,99 @@
+import os
+import time
+
+from sqlalchemy import text
+
+from backend.cache import ENTRY_OVERHEAD, LRUCache, SQLiteCache
+from backend.database import engine
+
+ETAG = '"epoch.1.json"'
+NEWER = '"epoch.2.json"'
+
+
+def entry(body):
+    return body, {}
+
+
+def cache_counts(client):
+    stats = client.get("/metrics/cache").json()
+    return stats["hits"], stats["misses"]
+
+
+def test_lru_entries_are_per_data_version():
+    cache = LRUCache(1 << 20, 60, 1 << 20)
+    cache.set("/kpis?", ETAG, entry(b"old"), 3)
+    assert cache.get("/kpis?", ETAG) == entry(b"old")
+    assert cache.get("/kpis?", NEWER) is None
+    assert cache.get("/aggregate?", ETAG) is None
+
+
+def test_lru_evicts_least_recently_used_past_the_byte_limit():
+    cache = LRUCache(3 * (100 + ENTRY_OVERHEAD), 60, 1 << 20)
+    for key in "abc":
+        cache.set(key, ETAG, entry(b"x" * 100), 100)
+    cache.get("a", ETAG)
+    cache.set("d", ETAG, entry(b"x" * 100), 100)
+    assert [key for key in "abcd" if cache.get(key, ETAG) is not None] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries_and_rejects_oversized_ones():
+    cache = LRUCache(1 << 20, 0.01, 1000)
+    cache.set("a", ETAG, entry(b"x"), 1)
+    cache.set("big", ETAG, entry(b"x" * 1000), 1000)
+    time.sleep(0.02)
+    assert cache.get("a", ETAG) is None
+    assert cache.get("big", ETAG) is None
+    assert (cache.stats()["expirations"], cache.stats()["rejected"]) == (1, 1)
+
+
+def test_responses_are_cached_until_the_data_version_moves(client):
+    url = "/aggregate?metrics=count&group_by=outcome"
+    first = client.get(url)
+    hits, misses = cache_counts(client)
+    second = client.get(url + "&")  # same normalized query
+    assert second.content == first.content and second.headers["etag"] == first.headers["etag"]
+    assert cache_counts(client) == (hits + 1, misses)
+
+    assert client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)"
+            " VALUES ('Cache', 'Male', 40, 1, 'No', 'Cache Test Outcome')"
+        ))
+    third = client.get(url)
+    assert third.headers["etag"] != first.headers["etag"]
+    assert "Cache Test Outcome" in third.text
+    assert cache_counts(client)[1] == misses + 1
+    assert client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code == 200
+
+
+def sqlite_cache(tmp_path, max_bytes=1 << 20):
+    return SQLiteCache(os.path.join(tmp_path, "cache.db"), max_bytes, 60, 1 << 20)
+
+
+def test_sqlite_cache_is_shared_and_keeps_the_newest_version(tmp_path):
+    writer, reader = sqlite_cache(tmp_path), sqlite_cache(tmp_path)
+    writer.set("/kpis?", NEWER, entry(b"new"), 3)
+    assert reader.get("/kpis?", NEWER) == entry(b"new")
+
+    # A slower worker finishing an older build must not replace the newer result
+    writer.set("/kpis?", ETAG, entry(b"old"), 3)
+    assert reader.get("/kpis?", ETAG) is None
+    assert reader.get("/kpis?", NEWER) == entry(b"new")
+
+    # A rebuilt database starts a new epoch, whose versions restart from 1
+    writer.set("/kpis?", '"rebuilt.1.json"', entry(b"rebuilt"), 7)
+    assert reader.get("/kpis?", NEWER) is None
+    assert reader.get("/kpis?", '"rebuilt.1.json"') == entry(b"rebuilt")
+
+
+def test_sqlite_cache_evicts_least_recently_used_past_the_byte_limit(tmp_path):
+    cache = sqlite_cache(tmp_path, 3 * (100 + ENTRY_OVERHEAD))
+    for key in "abc":
+        cache.set(key, ETAG, entry(b"x" * 100), 100)
+        time.sleep(0.01)
+    cache.set("d", ETAG, entry(b"x" * 100), 100)
+    assert [key for key in "abcd" if cache.get(key, ETAG) is not None] == ["b", "c", "d"]
+    assert cache.stats()["entries"] == 3
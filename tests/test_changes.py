@@ -0,0 +1,117 @@
+from sqlalchemy import text
+
+from backend.changelog import CHANGE_LOG_RETENTION, COMPACT_EVERY, compact_changes, compaction_trigger
+from backend.database import engine
+
+LIMIT = 400
+
+
+def changes(client, **params):
+    response = client.get("/patients/changes", params={"limit": LIMIT, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def apply(rows, page, fresh):
+    if fresh:
+        rows = {}
+    for row in page["upserts"]:
+        rows[row["id"]] = row
+    for patient_id in page["deletes"]:
+        rows.pop(patient_id, None)
+    return rows
+
+
+def sync(client, rows=None, seq=0, between_pages=None):
+    """Follow /patients/changes from `seq` until has_more is false, as the dashboard does."""
+    rows, after, snapshot_ids = dict(rows or {}), None, []
+    while True:
+        page = changes(client, since=seq, **({"after": after} if after else {}))
+        if page["snapshot"]:
+            snapshot_ids += [row["id"] for row in page["upserts"]]
+        rows = apply(rows, page, page["snapshot"] and not after)
+        seq, after = page["seq"], page["after"]
+        if not page["has_more"]:
+            return rows, seq, snapshot_ids
+        if between_pages is not None:
+            between_pages()
+            between_pages = None
+
+
+def current(client):
+    return {row["id"]: row for row in client.get("/patients").json()}
+
+
+def write(*statements):
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def test_snapshot_pages_cover_the_table_once(client):
+    rows, seq, snapshot_ids = sync(client)
+    assert snapshot_ids == sorted(set(snapshot_ids))
+    assert rows == current(client)
+    assert changes(client, since=seq) == {
+        "since": seq, "seq": seq, "snapshot": False, "has_more": False, "after": None, "upserts": [], "deletes": [],
+    }
+
+
+def test_writes_during_a_snapshot_are_replayed_from_its_seq(client):
+    def mid_snapshot_writes():
+        write(
+            "UPDATE patients SET age = age + 1 WHERE id IN (SELECT id FROM patients ORDER BY id LIMIT 3)",
+            "UPDATE patients SET age = age + 1 WHERE id IN (SELECT id FROM patients ORDER BY id DESC LIMIT 3)",
+            "DELETE FROM patients WHERE id IN (SELECT id FROM patients ORDER BY id LIMIT 2)",
+            "DELETE FROM patients WHERE id IN (SELECT id FROM patients ORDER BY id DESC LIMIT 2)",
+            "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)"
+            " VALUES ('Mid Snapshot', 'Female', 30, 10, 'No', 'Recovered')",
+        )
+
+    rows, seq, _ = sync(client, between_pages=mid_snapshot_writes)
+    assert rows != current(client)
+    rows, _, _ = sync(client, rows, seq)
+    assert rows == current(client)
+
+
+def test_delta_pages_converge(client):
+    rows, seq, _ = sync(client)
+    write(
+        "UPDATE patients SET treatment_cost = treatment_cost + 1 WHERE id % 3 = 0",
+        "DELETE FROM patients WHERE id % 29 = 0",
+        "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)"
+        " SELECT department, gender, age, treatment_cost, readmission, outcome FROM patients LIMIT 50",
+        "UPDATE patients SET id = id + 1000000 WHERE id = (SELECT max(id) FROM patients)",
+    )
+    page = changes(client, since=seq)
+    assert not page["snapshot"] and page["has_more"]
+    rows, _, snapshot_ids = sync(client, rows, seq)
+    assert snapshot_ids == []
+    assert rows == current(client)
+
+
+def test_unknown_positions_get_a_snapshot(client):
+    _, seq, _ = sync(client)
+    assert changes(client, since=seq + 1)["snapshot"]
+
+    write("UPDATE patients SET age = age WHERE id % 2 = 0")
+    with engine.begin() as connection:
+        assert compact_changes(connection, 10) > 0
+    page = changes(client, since=seq)
+    assert page["snapshot"] and page["seq"] > seq
+    rows, _, _ = sync(client, seq=seq)
+    assert rows == current(client)
+
+
+def test_log_compacts_itself_past_retention(client):
+    write("DROP TRIGGER patient_changes_compact", compaction_trigger(10))
+    try:
+        _, seq, _ = sync(client)
+        # Enough single-row updates to cross a multiple of COMPACT_EVERY
+        write(*["UPDATE patients SET age = age WHERE id = (SELECT min(id) FROM patients)"] * (COMPACT_EVERY + 1))
+        with engine.connect() as connection:
+            oldest, head = connection.execute(text("SELECT min(seq), max(seq) FROM patient_changes")).one()
+        assert head - oldest < COMPACT_EVERY
+        assert changes(client, since=seq)["snapshot"]
+    finally:
+        write("DROP TRIGGER patient_changes_compact", compaction_trigger(CHANGE_LOG_RETENTION))
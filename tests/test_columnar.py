@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import text
+
+from backend import columnar
+from backend.aggregate import run_aggregate, run_histogram
+from backend.database import SessionLocal, engine
+from backend.models import Patient
+from backend.summary import kpi_aggregates, kpi_response
+
+METRICS = [
+    "count", "sum:treatment_cost", "mean:treatment_cost", "min:treatment_cost", "max:treatment_cost",
+    "std:treatment_cost", "sum:age", "mean:age", "min:age", "max:age", "sum:readmitted", "mean:readmitted",
+]
+
+FILTERS = {
+    "none": [],
+    "no match": [Patient.department == "Nope"],
+    "several departments": [Patient.department.in_(["Cardiology", "Oncology", "Columnar Nulls"])],
+    "ranges": [Patient.age >= 30, Patient.treatment_cost <= 5000],
+    "only null measures": [Patient.department == "Columnar Nulls"],
+}
+
+GROUP_BYS = [[], ["department"], ["gender", "age_band"], ["outcome", "readmission"], ["age"]]
+
+
+@pytest.fixture(scope="module")
+def frame(client):
+    with engine.begin() as connection:
+        connection.execute(text("""
+            INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome) VALUES
+                ('Columnar Nulls', 'Female', NULL, NULL, 'Yes', 'Recovered'),
+                ('Columnar Nulls', NULL, NULL, NULL, NULL, NULL),
+                (NULL, 'Male', 40, 120.5, 'No', NULL),
+                ('Columnar Nulls', 'Male', 0, 15.0, 'No', 'Recovered'),
+                ('Columnar Nulls', 'Male', 101, 25.0, 'No', 'Recovered')
+        """))
+    return columnar.ColumnarSnapshot().current()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Compare against the row scan, not the shortcuts the columnar path defers to
+    monkeypatch.setattr(columnar, "build_rollup_query", lambda *args: None)
+    monkeypatch.setattr(columnar, "KPI_SUMMARY_ENABLED", False)
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.mark.parametrize("conditions", FILTERS.values(), ids=list(FILTERS))
+@pytest.mark.parametrize("group_by", GROUP_BYS, ids=["+".join(dims) or "total" for dims in GROUP_BYS])
+def test_aggregate_matches_sql(frame, db, group_by, conditions):
+    expected = run_aggregate(db, group_by, METRICS, conditions)
+    actual = columnar.aggregate(frame, group_by, METRICS, conditions)
+    assert [list(row) for row in actual] == [list(row) for row in expected]
+    for got, want in zip(actual, expected):
+        assert got == pytest.approx(want, rel=1e-9, nan_ok=True)
+
+
+@pytest.mark.parametrize("conditions", FILTERS.values(), ids=list(FILTERS))
+@pytest.mark.parametrize("column,bins,low,high", [
+    ("age", 10, None, None),
+    ("treatment_cost", 7, None, None),
+    ("age", 4, 20, 60),
+    ("treatment_cost", 3, 100.0, 100.0),
+])
+def test_histogram_matches_sql(frame, db, conditions, column, bins, low, high):
+    expected = run_histogram(db, column, bins, conditions, low, high)
+    assert columnar.histogram(frame, column, bins, conditions, low, high) == pytest.approx(expected)
+
+
+def test_kpis_match_sql(frame, db):
+    expected = kpi_response(*db.execute(kpi_aggregates()).one())
+    assert columnar.kpis(frame) == pytest.approx(expected, rel=1e-9)
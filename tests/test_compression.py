@@ -0,0 +1,79 @@
+import gzip
+import json
+
+import pytest
+
+from backend.compression import CompressionMiddleware, zstandard
+from backend.config import COMPRESSION_MIN_SIZE
+
+needs_zstd = pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+
+
+def raw_get(client, url, accept_encoding, **headers):
+    """Response and its body exactly as sent, before any client-side decoding."""
+    with client.stream("GET", url, headers={"Accept-Encoding": accept_encoding, **headers}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def decode(encoding, body):
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+
+@pytest.mark.parametrize("accept_encoding,expected", [
+    ("gzip", "gzip"),
+    ("zstd", "zstd"),
+    ("gzip, zstd", "zstd"),
+    ("zstd;q=0, gzip", "gzip"),
+    ("br, gzip;q=0.5", "gzip"),  # br is not offered, so it never wins
+    ("br", None),
+    ("identity", None),
+    ("", None),
+])
+def test_encoding_is_negotiated(accept_encoding, expected):
+    middleware = CompressionMiddleware(None, algorithms=("zstd", "gzip"))
+    if expected == "zstd" and zstandard is None:
+        expected = "gzip" if "gzip" in accept_encoding else None
+    assert middleware.choose_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("encoding", ["gzip", pytest.param("zstd", marks=needs_zstd)])
+@pytest.mark.parametrize("url", ["/patients", "/patients?format=ndjson"], ids=["json", "ndjson-stream"])
+def test_encoded_body_decodes_to_the_identity_body(client, encoding, url):
+    plain, plain_body = raw_get(client, url, "identity")
+    assert "content-encoding" not in plain.headers
+
+    response, body = raw_get(client, url, f"br, {encoding}")
+    assert response.headers["content-encoding"] == encoding
+    assert len(body) < len(plain_body) / 3
+    assert decode(encoding, body) == plain_body
+
+
+def test_small_bodies_are_sent_as_is(client):
+    response, body = raw_get(client, "/kpis", "gzip, zstd")
+    assert len(body) < COMPRESSION_MIN_SIZE
+    assert "content-encoding" not in response.headers
+    assert json.loads(body)["total_patients"] > 0
+
+
+def test_encoded_responses_have_a_weak_etag_and_vary(client):
+    url = "/aggregate?metrics=count&group_by=department&group_by=outcome&group_by=gender"
+    plain, _ = raw_get(client, url, "identity")
+    strong = plain.headers["etag"]
+    assert not strong.startswith("W/")
+
+    encoded, _ = raw_get(client, url, "gzip")
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["etag"] == f"W/{strong}"
+    assert "accept-encoding" in encoded.headers["vary"].lower()
+
+    # Either validator revalidates either representation
+    for etag in (strong, encoded.headers["etag"]):
+        for accept_encoding in ("identity", "gzip"):
+            response, body = raw_get(client, url, accept_encoding, **{"If-None-Match": etag})
+            assert (response.status_code, body) == (304, b"")
+    not_modified, _ = raw_get(client, url, "gzip", **{"If-None-Match": strong})
+    assert not_modified.headers["etag"] == f"W/{strong}"
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+import requests
+
+HEADER = "department,gender,age,treatment_cost,readmission,outcome\n"
+
+
+@pytest.fixture(scope="module")
+def server(live_server):
+    # TestClient buffers a streamed response until it ends, so the feed is read over a real socket
+    return live_server(MEDINTEL_SEED_ROWS="300", MEDINTEL_SSE_POLL_INTERVAL="0.05", MEDINTEL_SSE_HEARTBEAT="0.5").url
+
+
+class Feed:
+    """An open /stream/kpis connection; the subscription exists once the headers are back."""
+
+    def __init__(self, url, last_event_id=None):
+        headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+        self.response = requests.get(f"{url}/stream/kpis", headers=headers, stream=True, timeout=10)
+        assert self.response.headers["content-type"].startswith("text/event-stream")
+        self.lines = self.response.iter_lines(decode_unicode=True)
+
+    def next_event(self):
+        fields = {}
+        for line in self.lines:
+            if line.startswith(":"):
+                continue
+            if line:
+                name, _, value = line.partition(": ")
+                fields[name] = value
+            elif fields:
+                data = json.loads(fields["data"])
+                assert fields["id"] == data["version"]
+                return fields["event"], data
+        raise AssertionError("feed ended")
+
+    def close(self):
+        self.response.close()
+
+
+def admit(url, department, cost):
+    body = HEADER + f"{department},F,50,{cost},yes,Recovered\n"
+    response = requests.post(f"{url}/patients/bulk?format=csv", data=body, timeout=10)
+    assert response.json()["inserted"] == 1
+
+
+def test_writes_arrive_as_deltas_and_resume_skips_the_snapshot(server):
+    feed = Feed(server)
+    kind, snapshot = feed.next_event()
+    assert kind == "snapshot"
+    assert snapshot["kpis"]["total_patients"] == 300
+    assert "Live Feed" not in snapshot["departments"]
+
+    admit(server, "Live Feed", 1000)
+    kind, delta = feed.next_event()
+    feed.close()
+    assert kind == "delta" and delta["version"] != snapshot["version"]
+    assert delta["kpis"]["total_patients"] == 301
+    assert delta["kpis"]["total_revenue"] == pytest.approx(snapshot["kpis"]["total_revenue"] + 1000)
+    assert delta["departments"] == {"Live Feed": {"patients": 1, "revenue": 1000.0, "readmission_rate": 100.0}}
+
+    # Up to date: nothing but keepalives until the next write, which comes as a delta
+    feed = Feed(server, last_event_id=delta["version"])
+    assert next(feed.lines) == ": keepalive"
+    admit(server, "Live Feed", 500)
+    kind, resumed = feed.next_event()
+    feed.close()
+    assert kind == "delta"
+    assert resumed["kpis"]["total_patients"] == 302
+    assert resumed["departments"] == {"Live Feed": {"patients": 2, "revenue": 1500.0}}
+
+    # A version the server no longer has the state for gets a fresh snapshot
+    feed = Feed(server, last_event_id=snapshot["version"])
+    kind, fresh = feed.next_event()
+    feed.close()
+    assert kind == "snapshot" and fresh["version"] == resumed["version"]
+    assert fresh["departments"]["Live Feed"]["patients"] == 2
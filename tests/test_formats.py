@@ -0,0 +1,61 @@
+import datetime
+import io
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from backend.formats import ARROW_STREAM, ARROW_TYPES, PARQUET  # noqa: E402
+
+QUERIES = {
+    "all": {},
+    "filtered": {"department": ["Cardiology", "Oncology"], "age_min": 30, "cost_max": 60000},
+    "fields": {"fields": ["id", "age", "admission_date"], "gender": "Female"},
+    "page": {"limit": 250, "after": 400},
+    "no match": {"department": "Nope"},
+}
+
+
+def ndjson_rows(client, params):
+    response = client.get("/patients", params={**params, "format": "ndjson"})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def plain(rows):
+    return [
+        {name: value.isoformat() if isinstance(value, datetime.date) else value for name, value in row.items()}
+        for row in rows
+    ]
+
+
+def assert_schema(schema, rows):
+    if rows:
+        assert schema.names == list(rows[0])
+    for field in schema:
+        assert field.type == pa.type_for_alias(ARROW_TYPES.get(field.name, "string")), field
+
+
+@pytest.mark.parametrize("params", QUERIES.values(), ids=list(QUERIES))
+def test_arrow_stream_matches_ndjson(client, params):
+    expected = ndjson_rows(client, params)
+    assert bool(expected) == (params is not QUERIES["no match"])
+    response = client.get("/patients", params=params, headers={"Accept": ARROW_STREAM})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW_STREAM
+    table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert_schema(table.schema, expected)
+    assert plain(table.to_pylist()) == expected
+
+
+@pytest.mark.parametrize("params", QUERIES.values(), ids=list(QUERIES))
+def test_parquet_matches_ndjson(client, params):
+    expected = ndjson_rows(client, params)
+    response = client.get("/patients", params={**params, "format": "parquet"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PARQUET
+    table = pq.read_table(io.BytesIO(response.content))
+    assert_schema(table.schema, expected)
+    assert plain(table.to_pylist()) == expected
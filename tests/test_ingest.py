@@ -0,0 +1,101 @@
+import pytest
+
+from backend.config import BULK_MAX_ERRORS
+
+HEADER = "﻿department,gender,age,treatment_cost,readmission,outcome,admission_date\r\n"
+
+
+def chunks(body, size):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def ingest(client, body, size=None, **params):
+    content = body if size is None else chunks(body, size)
+    response = client.post("/patients/bulk", params={"format": "csv", **params}, content=content)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def stored(client, department):
+    return client.get("/patients", params={"department": department}).json()
+
+
+@pytest.mark.parametrize("size", [None, 1, 7, 64])
+def test_quoted_newlines_stay_inside_their_record(client, size):
+    department = f"Neuro\nlogy {size}"
+    body = (
+        HEADER
+        + f'"{department}",F,50,200,yes,Recovered,\r\n'
+        + f'"{department}",M,40,100,no,"Recovered, ""fully""",2024-01-02\r\n'
+        + f'"{department}",F,30,300,no,Recovered,\n'
+        + f'"{department}",M,20,400,no,Recovered,'
+    ).encode()
+    report = ingest(client, body, size)
+    assert (report["received"], report["inserted"], report["rejected"]) == (4, 4, 0)
+    rows = stored(client, department)
+    assert [row["age"] for row in rows] == [50, 40, 30, 20]
+    assert rows[1]["outcome"] == 'Recovered, "fully"'
+    assert rows[1]["admission_date"] == "2024-01-02"
+
+
+def test_errors_are_counted_and_reported_by_starting_line(client):
+    body = (
+        HEADER
+        + '"Ingest\nErrors",F,50,200,yes,Recovered,\r\n'  # lines 2-3
+        + "Ingest Errors,F,500,1,no,Recovered,\r\n"  # line 4: age out of range
+        + "Ingest Errors,F,20\r\n"  # line 5: too few fields
+        + "\r\n"  # blank, skipped
+        + "Ingest Errors,X,3,-5,maybe,Recovered,2024-02-30\r\n"  # line 7: several invalid values
+        + "Ingest Errors,Male,3,5,n,Recovered,2024-02-03\r\n"
+    ).encode()
+    report = ingest(client, body, batch_size=2)
+    assert (report["received"], report["inserted"], report["rejected"]) == (5, 2, 3)
+    assert report["errors"] == [
+        {"line": 4, "error": "invalid age"},
+        {"line": 5, "error": "expected 7 fields, got 3"},
+        {"line": 7, "error": "invalid treatment_cost, readmission, admission_date"},
+    ]
+    assert len(stored(client, "Ingest Errors")) == 1
+
+
+def test_error_list_is_capped_but_every_rejection_is_counted(client):
+    rejected = BULK_MAX_ERRORS + 5
+    body = (HEADER + "Capped,F,-1,1,no,Recovered,\r\n" * rejected + "Capped,F,1,1,no,Recovered,\r\n").encode()
+    report = ingest(client, body, batch_size=7)
+    assert (report["received"], report["inserted"], report["rejected"]) == (rejected + 1, 1, rejected)
+    assert len(report["errors"]) == BULK_MAX_ERRORS
+
+
+def test_rows_are_committed_per_transaction_rows(client):
+    body = (HEADER + "Transactions,F,1,1,no,Recovered,\r\n" * 5).encode()
+    report = ingest(client, body, batch_size=1, transaction_rows=2)
+    assert (report["inserted"], report["batches"], report["transactions"]) == (5, 5, 3)
+
+
+def test_missing_required_column_is_rejected(client):
+    response = client.post("/patients/bulk?format=csv", content=b"department,gender\nA,F\n")
+    assert response.status_code == 400
+    assert "age" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("body", [b"", b"\r\n\n", "\ufeff".encode()])
+def test_body_without_a_header_is_rejected(client, body):
+    response = client.post("/patients/bulk?format=csv", content=body)
+    assert response.status_code == 400
+    assert "age" in response.json()["detail"]
+
+
+def test_unknown_content_type_is_rejected(client):
+    response = client.post("/patients/bulk", content=b"{}", headers={"content-type": "application/json"})
+    assert response.status_code == 415
+
+
+def test_ndjson_skips_blank_lines_and_reports_bad_ones(client):
+    record = '{"department": "NDJSON", "gender": "f", "age": 1, "treatment_cost": 1, "readmission": "no", "outcome": "x"}'
+    body = f"{record}\n\nnot json\n[1]\r\n{record}".encode()
+    response = client.post("/patients/bulk", content=chunks(body, 5), headers={"content-type": "application/x-ndjson"})
+    report = response.json()
+    assert (report["format"], report["received"], report["inserted"], report["rejected"]) == ("ndjson", 4, 2, 2)
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert len(stored(client, "NDJSON")) == 2
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from backend import jobs
+from backend.config import REPORT_DIR
+from backend.database import engine
+
+
+def submit(client, **spec):
+    response = client.post("/jobs/reports", json={"format": "csv", **spec})
+    assert response.status_code in (200, 202), response.text
+    return response.json()
+
+
+def wait(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def job_row(job_id):
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT status, error, artifact FROM report_jobs WHERE id = :id"), {"id": job_id}
+        ).one()
+
+
+def test_same_spec_and_data_reuse_the_built_report(client):
+    first = submit(client, department=["Oncology"])
+    assert not first["cached"]
+    assert wait(client, first["id"])["status"] == "done"
+
+    again = submit(client, department=["Oncology"])
+    assert (again["id"], again["cached"], again["status"]) == (first["id"], True, "done")
+    assert client.get(f"/jobs/{first['id']}/artifact").status_code == 200
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome)"
+            " VALUES ('Oncology', 'Female', 50, 10, 'No', 'Recovered')"
+        ))
+    assert submit(client, department=["Oncology"])["id"] != first["id"]
+
+
+def test_missing_artifact_is_rebuilt(client):
+    first = submit(client, department=["Radiology"])
+    assert wait(client, first["id"])["status"] == "done"
+    os.remove(job_row(first["id"]).artifact)
+    rebuilt = submit(client, department=["Radiology"])
+    assert rebuilt["id"] != first["id"] and not rebuilt["cached"]
+    assert wait(client, rebuilt["id"])["status"] == "done"
+
+
+def test_abandoned_jobs_are_failed_and_not_reused(client):
+    first = submit(client, department=["Emergency"])
+    assert wait(client, first["id"])["status"] == "done"
+    # As left behind by a worker that died mid-build
+    with engine.begin() as connection:
+        connection.execute(
+            text("UPDATE report_jobs SET status = 'running', created_at = datetime('now', '-1 day') WHERE id = :id"),
+            {"id": first["id"]},
+        )
+    second = submit(client, department=["Emergency"])
+    assert second["id"] != first["id"]
+    status, error, _ = job_row(first["id"])
+    assert status == "failed" and error.startswith("Abandoned")
+    assert wait(client, second["id"])["status"] == "done"
+
+
+def test_jobs_cancelled_at_shutdown_are_failed(client, monkeypatch):
+    release = threading.Event()
+    pool = ThreadPoolExecutor(1)
+    pool.submit(release.wait)  # keeps the only worker busy so submitted jobs stay queued
+    monkeypatch.setattr(jobs, "executor", pool)
+    queued = [submit(client, department=[department])["id"] for department in ("Pediatrics", "Neurology")]
+    jobs.shutdown_jobs()
+    release.set()
+    for job_id in queued:
+        status, error, _ = job_row(job_id)
+        assert status == "failed" and error.startswith("Cancelled")
+
+
+def test_old_jobs_and_artifacts_are_expired(client):
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO report_jobs (id, spec_hash, spec, status, progress, created_at)"
+            " VALUES ('expired', 'expired', '{}', 'done', 1, datetime('now', '-400 days'))"
+        ))
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    old, recent = os.path.join(REPORT_DIR, "old.csv"), os.path.join(REPORT_DIR, "recent.csv")
+    for path in (old, recent):
+        open(path, "w").close()
+    os.utime(old, (0, 0))
+
+    with engine.begin() as connection:
+        jobs.expire_jobs(connection)
+    assert client.get("/jobs/expired").status_code == 404
+    assert not os.path.exists(old) and os.path.exists(recent)
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+
+from backend.database import engine
+from backend.summary import kpi_aggregates, kpi_response
+
+# Applied in order; the summary must equal a full recount after each one
+WRITES = {
+    "insert": """
+        INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome) VALUES
+            ('Cardiology', 'Female', 70, 1000.5, 'Yes', 'Recovered'),
+            ('Oncology', 'Male', 40, NULL, 'No', 'Deceased'),
+            (NULL, NULL, NULL, NULL, NULL, NULL)
+    """,
+    "update cost and readmission": """
+        UPDATE patients SET
+            treatment_cost = treatment_cost * 2,
+            readmission = CASE readmission WHEN 'Yes' THEN 'No' ELSE 'Yes' END
+        WHERE id % 7 = 0
+    """,
+    "update cost to null": "UPDATE patients SET treatment_cost = NULL WHERE id % 11 = 0",
+    "update unrelated column": "UPDATE patients SET admission_date = '2024-01-01' WHERE id % 3 = 0",
+    "delete": "DELETE FROM patients WHERE id % 13 = 0",
+}
+
+
+@pytest.mark.parametrize("statement", WRITES.values(), ids=list(WRITES))
+def test_kpi_summary_matches_a_full_recount(client, statement):
+    with engine.begin() as connection:
+        connection.execute(text(statement))
+    with engine.connect() as connection:
+        total, revenue, readmissions = connection.execute(
+            text("SELECT total_patients, total_revenue, readmissions FROM kpi_summary WHERE id = 1")
+        ).one()
+        expected = connection.execute(kpi_aggregates()).one()
+
+    assert (total, readmissions) == (expected[0], expected[2])
+    assert revenue == pytest.approx(expected[1])
+    assert client.get("/kpis").json() == pytest.approx(kpi_response(*expected))
@@ -0,0 +1,88 @@
+import math
+import re
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+SUFFIXES = {"histogram": ("_bucket", "_sum", "_count"), "counter": ("",), "gauge": ("",)}
+
+
+def parse(text):
+    """{(name, frozenset(labels)): value}, checking the text exposition format on the way."""
+    assert text.endswith("\n")
+    types, samples = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split(" ")
+            assert family not in types and kind in SUFFIXES, line
+            types[family] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.group(1), LABEL.findall(match.group(2) or ""), float(match.group(3))
+        family = next(
+            (name[:len(name) - len(suffix)] for suffix in ("_bucket", "_sum", "_count", "")
+             if name.endswith(suffix) and name[:len(name) - len(suffix)] in types),
+            None,
+        )
+        assert family is not None, f"{name} has no TYPE line before it"
+        assert name[len(family):] in SUFFIXES[types[family]], line
+        key = (name, frozenset(labels))
+        assert key not in samples, line
+        samples[key] = value
+    return samples
+
+
+def scrape(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return parse(response.text)
+
+
+def value(samples, name, **labels):
+    return samples.get((name, frozenset(labels.items())), 0.0)
+
+
+def test_histograms_are_cumulative(client):
+    client.get("/kpis")
+    samples = scrape(client)
+    buckets = {}
+    for (name, labels), count in samples.items():
+        if name.endswith("_bucket"):
+            labels = dict(labels)
+            bound = labels.pop("le")
+            buckets.setdefault((name, frozenset(labels.items())), []).append((float(bound), count))
+    assert buckets
+    for (name, labels), series in buckets.items():
+        counts = [count for _, count in sorted(series)]
+        assert counts == sorted(counts), name
+        assert sorted(series)[-1][0] == math.inf
+        assert value(samples, name[:-len("_bucket")] + "_count", **dict(labels)) == counts[-1]
+
+
+def test_requests_latency_and_cache_series_move(client):
+    route = {"route": "/histogram"}
+    url = "/histogram?column=age&bins=13"
+    before = scrape(client)
+    for _ in range(3):
+        assert client.get(url).status_code == 200
+    assert client.get("/histogram?column=nope").status_code == 422
+    after = scrape(client)
+
+    def delta(name, **labels):
+        return value(after, name, **labels) - value(before, name, **labels)
+
+    assert delta("medintel_http_requests_total", method="GET", status="200", **route) == 3
+    assert delta("medintel_http_requests_total", method="GET", status="422", **route) == 1
+    assert delta("medintel_http_request_duration_seconds_count", **route) == 4
+    assert delta("medintel_http_request_duration_seconds_bucket", le="+Inf", **route) == 4
+    assert delta("medintel_http_request_duration_seconds_sum", **route) > 0
+    assert delta("medintel_http_response_bytes_total", **route) > 0
+    # The first build runs SQL and is cached; the repeats are hits
+    assert delta("medintel_db_query_duration_seconds_count", **route) >= 1
+    assert delta("medintel_query_cache_misses_total", backend="memory") == 1
+    assert delta("medintel_query_cache_hits_total", backend="memory") == 2
+    # Only the scrape itself is in flight
+    assert value(after, "medintel_http_requests_in_flight") == 1
@@ -0,0 +1,54 @@
+import json
+
+
+def page_through(client, limit, **params):
+    """Every page of /patients from the start, following X-Next-After; returns (rows, pages)."""
+    rows, pages, after = [], 0, 0
+    while True:
+        response = client.get("/patients", params={**params, "limit": limit, "after": after})
+        assert response.status_code == 200
+        page = response.json()
+        rows += page
+        pages += 1
+        if "x-next-after" not in response.headers:
+            assert len(page) < limit
+            return rows, pages
+        assert len(page) == limit
+        after = int(response.headers["x-next-after"])
+
+
+def test_after_paging_returns_every_row_once(client):
+    everything = client.get("/patients", params={"fields": "id"}).json()
+    rows, pages = page_through(client, 700)
+    ids = [row["id"] for row in rows]
+    assert ids == sorted(set(ids))
+    assert ids == [row["id"] for row in everything]
+    assert pages == len(ids) // 700 + 1
+
+
+def test_paging_with_filters_and_projection(client):
+    filters = {"department": "Cardiology", "fields": ["age", "treatment_cost"]}
+    everything = client.get("/patients", params=filters).json()
+    rows, _ = page_through(client, 250, **filters)
+    assert rows == everything
+    assert all(set(row) == {"age", "treatment_cost"} for row in rows)
+
+
+def test_limit_dividing_the_table_ends_on_an_empty_page(client):
+    total = len(client.get("/patients", params={"fields": "id"}).json())
+    rows, pages = page_through(client, total)
+    assert len(rows) == total
+    assert pages == 2
+
+
+def test_unpaged_json_streams_the_same_rows_as_ndjson(client):
+    response = client.get("/patients", params={"department": "Oncology"})
+    assert response.headers["content-type"].startswith("application/json")
+    streamed = client.get("/patients", params={"department": "Oncology", "format": "ndjson"})
+    assert response.json() == [json.loads(line) for line in streamed.text.splitlines()]
+
+
+def test_unpaged_json_with_no_match_is_an_empty_array(client):
+    response = client.get("/patients", params={"department": "No such department"})
+    assert response.status_code == 200
+    assert response.text == "[]"
@@ -0,0 +1,45 @@
+import json
+import os
+import re
+
+from backend import profiling
+from backend.config import SLOW_QUERY_LOG
+
+TIMING = re.compile(r'^(\w+);dur=(\d+\.\d)(?:;desc="([^"]*)")?$')
+
+
+def server_timings(response):
+    timings = {}
+    for part in response.headers["server-timing"].split(", "):
+        match = TIMING.match(part)
+        assert match, part
+        timings[match.group(1)] = (float(match.group(2)), match.group(3))
+    return timings
+
+
+def test_server_timing_breaks_down_the_request(client):
+    timings = server_timings(client.get("/aggregate?metrics=count&metrics=mean:age&group_by=gender&age_min=7"))
+    assert list(timings) == ["sql", "hydrate", "serialize", "app"]
+    assert re.fullmatch(r"\d+ statements?", timings["sql"][1])
+    # The phases happen inside the app time (each rounded to 0.1 ms)
+    inner = sum(timings[name][0] for name in ("sql", "hydrate", "serialize"))
+    assert inner <= timings["app"][0] + 0.3
+
+
+def test_statements_over_the_threshold_are_logged_with_their_plan(client, monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_QUERY_MS", 0)
+    start = os.path.getsize(SLOW_QUERY_LOG) if os.path.exists(SLOW_QUERY_LOG) else 0
+    response = client.get("/patients", params={"department": "Cardiology", "age_min": 41, "limit": 5})
+    assert response.status_code == 200
+    assert "server-timing" in response.headers
+
+    for handler in profiling.slow_log.handlers:
+        handler.flush()
+    with open(SLOW_QUERY_LOG) as log:
+        log.seek(start)
+        entries = [json.loads(line.split(" ", 2)[2]) for line in log]
+    query = next(entry for entry in entries if "FROM patients" in entry["statement"])
+    assert query["route"] == "/patients"
+    assert query["ms"] >= 0
+    assert "Cardiology" in query["parameters"] and "41" in query["parameters"]
+    assert any(step.startswith(("SEARCH", "SCAN")) for step in query["plan"]), query["plan"]
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import select, text
+
+from backend.aggregate import build_aggregate_query, build_rollup_query
+from backend.database import engine
+from backend.models import PatientRollup
+from backend.rollup import rollup_cells
+
+# Applied in order; every cell must equal a rebuild from the patients table after each one
+WRITES = {
+    "insert": """
+        INSERT INTO patients (department, gender, age, treatment_cost, readmission, outcome) VALUES
+            ('Cardiology', 'Female', 17, 2500.0, 'Yes', 'Recovered'),
+            ('Cardiology', 'Female', 17, NULL, 'No', 'Recovered'),
+            ('New Unit', 'Male', 101, 10.0, 'No', 'Deceased'),
+            ('New Unit', 'Male', 0, 20.0, 'No', 'Deceased'),
+            (NULL, NULL, NULL, NULL, NULL, NULL)
+    """,
+    "move rows between cells": """
+        UPDATE patients SET department = 'Radiology', age = age + 30, outcome = 'Deceased' WHERE id % 5 = 0
+    """,
+    "lower the largest costs": """
+        UPDATE patients SET treatment_cost = 1.0
+        WHERE id IN (SELECT id FROM patients WHERE treatment_cost IS NOT NULL ORDER BY treatment_cost DESC LIMIT 5)
+    """,
+    "null a cost": "UPDATE patients SET treatment_cost = NULL WHERE id % 17 = 0",
+    "delete the smallest costs": """
+        DELETE FROM patients
+        WHERE id IN (SELECT id FROM patients WHERE treatment_cost IS NOT NULL ORDER BY treatment_cost LIMIT 5)
+    """,
+    "empty a department": "DELETE FROM patients WHERE department = 'New Unit'",
+}
+
+METRICS = [
+    "count", "sum:treatment_cost", "mean:treatment_cost", "min:treatment_cost", "max:treatment_cost",
+    "std:treatment_cost", "sum:readmitted", "mean:readmitted", "sum:age", "mean:age",
+]
+
+# frontend/pages/2_Patient_Flow_Sankey.py load_flow_cells
+SANKEY_GROUP_BY = ["department", "outcome"]
+SANKEY_METRICS = ["count", "sum:treatment_cost", "sum:age"]
+
+
+def by_cell(rows, width):
+    return {tuple(row[:width]): tuple(row[width:]) for row in rows}
+
+
+def assert_same_cells(actual, expected):
+    assert actual.keys() == expected.keys()
+    for cell, values in expected.items():
+        # Running sums keep float rounding residue (e.g. 1e-11 for a cell whose costs are all gone)
+        assert actual[cell] == pytest.approx(values, rel=1e-9, abs=1e-3), cell
+
+
+@pytest.mark.parametrize("statement", WRITES.values(), ids=list(WRITES))
+def test_rollup_matches_a_rebuild(client, statement):
+    with engine.begin() as connection:
+        connection.execute(text(statement))
+    with engine.connect() as connection:
+        stored = connection.execute(select(*PatientRollup.__table__.columns)).all()
+        rebuilt = connection.execute(rollup_cells()).all()
+        assert_same_cells(by_cell(stored, 4), by_cell(rebuilt, 4))
+
+        group_by = ["department", "age_band"]
+        from_rollup = connection.execute(build_rollup_query(group_by, METRICS, [])).all()
+        from_rows = connection.execute(build_aggregate_query(group_by, METRICS, [])).all()
+        assert_same_cells(by_cell(from_rollup, 2), by_cell(from_rows, 2))
+
+
+def test_sankey_cells_are_answered_from_the_rollup(client):
+    assert build_rollup_query(SANKEY_GROUP_BY, SANKEY_METRICS, []) is not None
+    with engine.connect() as connection:
+        from_rollup = connection.execute(build_rollup_query(SANKEY_GROUP_BY, SANKEY_METRICS, [])).all()
+        from_rows = connection.execute(build_aggregate_query(SANKEY_GROUP_BY, SANKEY_METRICS, [])).all()
+    assert_same_cells(by_cell(from_rollup, 2), by_cell(from_rows, 2))